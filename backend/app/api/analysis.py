@@ -1,4 +1,5 @@
 from fastapi import APIRouter, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from app.services.analysis_service import AnalysisService
 import logging
 
@@ -16,7 +17,7 @@ async def analyze_data():
         Statistical analysis + AI-generated insights
     """
     try:
-        result = analysis_service.analyze_dataset()
+        result = await run_in_threadpool(analysis_service.analyze_dataset)
         return result
         
     except Exception as e:
@@ -4,9 +4,11 @@ Handles AI-powered data chat functionality
 """
 
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Optional, List
 import logging
+import json
 
 from app.services.data_chat_service import data_chat_service
 
@@ -40,7 +42,7 @@ async def send_message(request: ChatMessage):
     try:
         logger.info(f"Chat message received: {request.message[:50]}...")
         
-        result = data_chat_service.chat(request.message)
+        result = await data_chat_service.chat_async(request.message)
         
         return ChatResponse(**result)
         
@@ -49,6 +51,32 @@ async def send_message(request: ChatMessage):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/stream")
+async def stream_message(request: ChatMessage):
+    """
+    Send a message and stream the reply as Server-Sent Events.
+    
+    Events:
+    - token: {"text"} for each piece of the reply as it is generated
+    - code: {"code"} as soon as the first Python block is complete
+    - output: {"output", "visualization"} once that code has run
+    - done: the full ChatResponse payload
+    
+    Code starts executing while the rest of the reply is still streaming.
+    """
+    logger.info(f"Streaming chat message received: {request.message[:50]}...")
+    
+    async def event_stream():
+        async for event in data_chat_service.chat_stream(request.message):
+            yield f"event: {event['event']}\ndata: {json.dumps(event['data'], default=str)}\n\n"
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.get("/suggestions")
 async def get_visualization_suggestions():
     """
@@ -4,19 +4,30 @@ Handles data upload, analysis, and ML operations
 """
 
 from fastapi import APIRouter, File, UploadFile, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, FileResponse
+from pydantic import BaseModel
 import logging
 import pandas as pd
 import numpy as np
 from pathlib import Path
 import tempfile
 import os
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 import json
 from app.services.data_service import DataService
+from app.config import settings
+from app.core.sessions import SessionDatasetView, SessionQuotaError
+from app.services.analysis_service import AnalysisService
+from app.services.report_service import report_service
+from ml_engine.engines.profiler import DASHBOARD_PROFILE
+from ml_engine.engines.feature_engine import engineer
+from ml_engine.engines.feature_synthesis import synthesize_features
+from ml_engine.engines.outliers import detect_outliers as find_outliers, iqr_bounds, univariate_mask
 
 # Initialize DataService singleton to sync with MLService
 data_service = DataService()
+analysis_service = AnalysisService()
 
 # Configure logging
 logging.basicConfig(
@@ -30,13 +41,9 @@ router = APIRouter(
     tags=["data"]
 )
 
-# Global storage for current dataset (in production, use proper database)
-current_dataset = {
-    "df": None,
-    "info": None,
-    "history": [], # Stack of (df, info) tuples
-    "future": []   # Stack of (df, info) tuples
-}
+# Current dataset of the calling session: "df", "info" and the "history" /
+# "future" undo stacks of (df, info) tuples
+current_dataset = SessionDatasetView()
 
 
 @router.post("/upload")
@@ -68,14 +75,14 @@ async def upload_file(file: UploadFile = File(...)):
             # Read CSV with pandas
             df = pd.read_csv(temp_path)
             
-            # Store in global variable (in production, use database)
-            current_dataset["df"] = df
-            
             # IMPORTANT: Also sync to DataService for MLService to access
-            DataService._dataframe = df
-            DataService._filename = file.filename
+            # (first, so a dataset over the session quota is rejected)
+            DataService().set_dataframe(df, file.filename)
             logger.info("✓ DataFrame synced to DataService for MLService access")
             
+            # Store in the session's dataset
+            current_dataset["df"] = df
+            
             # Helper function to make values JSON-safe
             def make_json_safe(val):
                 if pd.isna(val):
@@ -115,6 +122,8 @@ async def upload_file(file: UploadFile = File(...)):
         raise HTTPException(status_code=400, detail="The CSV file is empty")
     except pd.errors.ParserError as e:
         raise HTTPException(status_code=400, detail=f"Failed to parse CSV: {str(e)}")
+    except SessionQuotaError as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         logger.error(f"Upload error: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
@@ -154,284 +163,20 @@ async def analyze_data():
         raise HTTPException(status_code=404, detail="No dataset loaded. Please upload a file first.")
     
     try:
-        df = current_dataset["df"]
-        rows, cols = df.shape
-        
-        # Identify column types
-        numeric_cols = df.select_dtypes(include=[np.number]).columns.tolist()
-        categorical_cols = df.select_dtypes(include=['object', 'category']).columns.tolist()
-        
-        # ========== 1. Basic Info ==========
-        basic_info = {
-            "num_rows": rows,
-            "num_columns": cols,
-            "numeric_columns": len(numeric_cols),
-            "categorical_columns": len(categorical_cols),
-            "column_names": df.columns.tolist(),
-            "column_types": {col: str(dtype) for col, dtype in df.dtypes.items()}
-        }
-        
-        # ========== 2. Missing Values Analysis ==========
-        missing_per_col = df.isnull().sum()
-        total_missing = int(missing_per_col.sum())
+        # Shares the dataset profile (and its cache) with /api/analysis/analyze
+        profile = await run_in_threadpool(analysis_service.profile, DASHBOARD_PROFILE)
         
-        missing_values = {
-            "total_missing": total_missing,
-            "missing_percentage": round((total_missing / (rows * cols)) * 100, 2) if rows * cols > 0 else 0,
-            "per_column": {col: int(count) for col, count in missing_per_col.items() if count > 0}
-        }
-        
-        # ========== 3. Data Quality Scoring ==========
-        # Start with 100 and deduct for issues
-        quality_score = 100
-        issues = []
-        
-        # Check for missing values
-        if total_missing > 0:
-            missing_pct = (total_missing / (rows * cols)) * 100
-            if missing_pct > 20:
-                quality_score -= 30
-                issues.append(f"High missing values: {missing_pct:.1f}% of data is missing")
-            elif missing_pct > 5:
-                quality_score -= 15
-                issues.append(f"Moderate missing values: {missing_pct:.1f}% of data is missing")
-            else:
-                quality_score -= 5
-                issues.append(f"Low missing values: {missing_pct:.1f}% of data is missing")
-        
-        # Check for duplicates
-        duplicate_count = int(df.duplicated().sum())
-        if duplicate_count > 0:
-            dup_pct = (duplicate_count / rows) * 100
-            if dup_pct > 10:
-                quality_score -= 20
-                issues.append(f"High duplicates: {duplicate_count} duplicate rows ({dup_pct:.1f}%)")
-            else:
-                quality_score -= 10
-                issues.append(f"{duplicate_count} duplicate rows found ({dup_pct:.1f}%)")
-        
-        # Check for columns with single value
-        for col in df.columns:
-            if df[col].nunique() == 1:
-                quality_score -= 5
-                issues.append(f"Column '{col}' has only one unique value")
-        
-        quality_score = max(0, quality_score)  # Don't go below 0
-        
-        data_quality = {
-            "quality_score": quality_score,
-            "issues": issues,
-            "duplicate_rows": duplicate_count,
-            "completeness": round(100 - (total_missing / (rows * cols) * 100), 2) if rows * cols > 0 else 100
-        }
-
-        # ========== 3b. Descriptive Statistics ==========
-        descriptive_stats = {}
-        if len(numeric_cols) > 0:
-            try:
-                # Basic describe
-                desc = df[numeric_cols].describe().T
-                
-                # Skewness and Kurtosis
-                skew = df[numeric_cols].skew()
-                kurt = df[numeric_cols].kurtosis()
-                
-                for col in numeric_cols:
-                    stats_dict = desc.loc[col].to_dict()
-                    stats_dict['skew'] = round(skew.get(col, 0), 4)
-                    stats_dict['kurtosis'] = round(kurt.get(col, 0), 4)
-                for col in numeric_cols:
-                    stats_dict = desc.loc[col].to_dict()
-                    stats_dict['skew'] = round(skew.get(col, 0), 4)
-                    stats_dict['kurtosis'] = round(kurt.get(col, 0), 4)
-                    
-                    # Round other values
-                    for k, v in stats_dict.items():
-                        if isinstance(v, float):
-                            stats_dict[k] = round(v, 4)
-                    descriptive_stats[col] = stats_dict
-
-            except Exception as e:
-                logger.warning(f"Could not calculate descriptive stats: {e}")
-        
-        # ========== 4. Generate Chart Data ==========
-        chart_data = {}
-        
-        # Helper function to make values JSON-safe
-        def safe_float(val):
-            if pd.isna(val) or val != val or val == float('inf') or val == float('-inf'):
-                return None
-            return float(val)
-        
-        def safe_list(arr):
-            return [safe_float(x) for x in arr]
-        
-        # 4a. Distribution charts for numeric columns
-        distributions = []
-        for col in numeric_cols[:8]:  # Limit to 8 columns
-            try:
-                col_data = df[col].dropna()
-                if len(col_data) > 0:
-                    hist_counts, bin_edges = np.histogram(col_data, bins=20)
-                    distributions.append({
-                        "column": col,
-                        "bins": safe_list(bin_edges[:-1]),  # Left edges of bins
-                        "counts": [int(c) for c in hist_counts],
-                        "mean": safe_float(col_data.mean()),
-                        "median": safe_float(col_data.median())
-                    })
-            except Exception as e:
-                logger.warning(f"Could not generate distribution for {col}: {e}")
-        chart_data["distributions"] = distributions
-        
-        # 4b. Categorical value counts
-        categorical_counts = []
-        for col in categorical_cols[:8]:  # Limit to 8 columns
-            try:
-                value_counts = df[col].value_counts().head(10)
-                categorical_counts.append({
-                    "column": col,
-                    "categories": value_counts.index.tolist(),
-                    "counts": [int(c) for c in value_counts.values]
-                })
-            except Exception as e:
-                logger.warning(f"Could not generate categorical counts for {col}: {e}")
-        chart_data["categorical_counts"] = categorical_counts
-        
-        # 4c. Correlation heatmap (for numeric columns)
-        if len(numeric_cols) >= 2:
-            try:
-                corr_cols = numeric_cols[:10]  # Limit to 10 columns
-                corr_matrix = df[corr_cols].corr()
-                # Replace NaN with 0 for JSON
-                corr_matrix = corr_matrix.fillna(0)
-                chart_data["correlation_heatmap"] = {
-                    "columns": corr_cols,
-                    "values": [[safe_float(v) or 0 for v in row] for row in corr_matrix.values]
-                }
-            except Exception as e:
-                logger.warning(f"Could not generate correlation heatmap: {e}")
-                chart_data["correlation_heatmap"] = {"columns": [], "values": []}
-        else:
-            chart_data["correlation_heatmap"] = {"columns": [], "values": []}
-        
-        # 4d. Missing values chart
-        cols_with_missing = [(col, int(count)) for col, count in missing_per_col.items() if count > 0]
-        if cols_with_missing:
-            chart_data["missing_values_chart"] = {
-                "columns": [c[0] for c in cols_with_missing],
-                "counts": [c[1] for c in cols_with_missing],
-                "percentages": [round((c[1] / rows) * 100, 2) for c in cols_with_missing]
-            }
-        else:
-            chart_data["missing_values_chart"] = None
-        
-        # 4e. Box plots for numeric columns
-        box_plots = []
-        for col in numeric_cols[:6]:  # Limit to 6 columns
-            try:
-                col_data = df[col].dropna()
-                if len(col_data) > 0:
-                    q1 = float(col_data.quantile(0.25))
-                    q3 = float(col_data.quantile(0.75))
-                    iqr = q3 - q1
-                    lower_bound = q1 - 1.5 * iqr
-                    upper_bound = q3 + 1.5 * iqr
-                    outliers = col_data[(col_data < lower_bound) | (col_data > upper_bound)]
-                    
-                    box_plots.append({
-                        "column": col,
-                        "min": safe_float(col_data.min()),
-                        "q1": safe_float(q1),
-                        "median": safe_float(col_data.median()),
-                        "q3": safe_float(q3),
-                        "max": safe_float(col_data.max()),
-                        "outliers": safe_list(outliers.head(50).tolist())  # Limit outliers
-                    })
-            except Exception as e:
-                logger.warning(f"Could not generate box plot for {col}: {e}")
-        chart_data["box_plots"] = box_plots
-        
-        # 4f. Scatter plot matrix (pairs of highly correlated columns)
-        scatter_matrix = []
-        if len(numeric_cols) >= 2:
-            try:
-                corr_matrix = df[numeric_cols[:8]].corr()
-                pairs_added = set()
-                
-                # Find interesting correlations (not 1.0 and abs > 0.3)
-                for i, col1 in enumerate(numeric_cols[:8]):
-                    for j, col2 in enumerate(numeric_cols[:8]):
-                        if i < j:
-                            pair_key = tuple(sorted([col1, col2]))
-                            if pair_key not in pairs_added:
-                                corr_val = corr_matrix.loc[col1, col2]
-                                if pd.notna(corr_val) and abs(corr_val) > 0.3:
-                                    # Sample data for scatter plot (max 200 points)
-                                    sample_df = df[[col1, col2]].dropna()
-                                    if len(sample_df) > 200:
-                                        sample_df = sample_df.sample(200, random_state=42)
-                                    
-                                    scatter_matrix.append({
-                                        "x_column": col1,
-                                        "y_column": col2,
-                                        "x_values": safe_list(sample_df[col1].tolist()),
-                                        "y_values": safe_list(sample_df[col2].tolist()),
-                                        "correlation": safe_float(corr_val) or 0
-                                    })
-                                    pairs_added.add(pair_key)
-                                    
-                                    if len(scatter_matrix) >= 6:  # Limit to 6 scatter plots
-                                        break
-                    if len(scatter_matrix) >= 6:
-                        break
-            except Exception as e:
-                logger.warning(f"Could not generate scatter matrix: {e}")
-        chart_data["scatter_matrix"] = scatter_matrix
-        
-        # ========== 5. Recommendations ==========
-        recommendations = []
-        
-        if total_missing > 0:
-            recommendations.append("Consider handling missing values using imputation or removal")
-        
-        if duplicate_count > 0:
-            recommendations.append("Review and remove duplicate rows if they are not intentional")
-        
-        if len(categorical_cols) > 0:
-            recommendations.append("Encode categorical variables before training ML models")
-        
-        # Check for high cardinality categorical columns
-        for col in categorical_cols:
-            if df[col].nunique() > 50:
-                recommendations.append(f"Column '{col}' has high cardinality ({df[col].nunique()} unique values) - consider binning")
-                break
-        
-        # Check for potential target detection
-        for col in numeric_cols:
-            unique_ratio = df[col].nunique() / len(df)
-            if unique_ratio < 0.05 and df[col].nunique() <= 10:
-                recommendations.append(f"Column '{col}' appears suitable for classification (low cardinality)")
-                break
-        
-        if len(recommendations) == 0:
-            recommendations.append("Dataset looks well-prepared for analysis!")
-        
-        # ========== 6. AI Insights ==========
-        insights = generate_insights(df, basic_info)
-        
-        # ========== Compile Result ==========
         result = {
             "analysis": {
-                "basic_info": basic_info,
-                "data_quality": data_quality,
-                "missing_values": missing_values,
-                "descriptive_stats": descriptive_stats,
-                "chart_data": chart_data,
-                "recommendations": recommendations
+                "basic_info": profile["basic_info"],
+                "data_quality": profile["data_quality"],
+                "missing_values": profile["missing_values"],
+                "descriptive_stats": profile["descriptive_stats"],
+                "chart_data": profile["chart_data"],
+                "recommendations": profile["recommendations"]
             },
             "ai_insights": {
-                "insights": "\n".join(insights),
+                "insights": "\n".join(profile["insights"]),
                 "timestamp": pd.Timestamp.now().isoformat()
             }
         }
@@ -444,140 +189,72 @@ async def analyze_data():
         raise HTTPException(status_code=500, detail=str(e))
 
 
+class ReportRequest(BaseModel):
+    include_ai_analysis: bool = True  # Add the LLM-written executive summary
 
 
-
-
+@router.post("/reports", status_code=202)
+def create_report(request: Optional[ReportRequest] = None):
+    """
+    Start generating an EDA PDF report in the background
+    
+    Requests for the same dataset version and options share one report.
+    Poll GET /reports/{report_id} and download the PDF once completed.
+    """
+    request = request or ReportRequest()
+    try:
+        return report_service.submit(include_ai_analysis=request.include_ai_analysis)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+@router.get("/reports/{report_id}")
+def get_report_status(report_id: str):
+    """Status and progress of a report job"""
+    status = report_service.get_status(report_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail=f"Report {report_id} not found")
+    return status
+
+
+@router.get("/reports/{report_id}/download")
+def download_report(report_id: str):
+    """Download a finished report (supports Range requests)"""
+    status = report_service.get_status(report_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail=f"Report {report_id} not found")
+    if status['status'] != 'completed':
+        raise HTTPException(status_code=409, detail=f"Report {report_id} is {status['status']}")
+    try:
+        path = report_service.get_artifact(report_id)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return FileResponse(path, media_type="application/pdf", filename="eda_report.pdf")
 
 
 @router.get("/report")
 def get_report():
     """
     Generate and download EDA PDF Report with AI Analysis
-    """
-    from fastapi.responses import StreamingResponse
-    from app.utils.pdf_generator import generate_eda_pdf
-    from app.core.groq_client import groq_client
-    import json
-
-    df = data_service.get_dataframe()
-    if df is None:
-        raise HTTPException(status_code=404, detail="No dataset loaded")
-    
-    # 1. Prepare Data Summary for AI
-    description = df.describe().to_dict()
-    missing = df.isnull().sum().to_dict()
-    
-    # Calculate correlations for context
-    numeric_df = df.select_dtypes(include=[np.number])
-    correlations = {}
-    if not numeric_df.empty:
-        corr_matrix = numeric_df.corr().abs()
-        # Get top pairs
-        pairs = (corr_matrix.where(np.triu(np.ones(corr_matrix.shape), k=1).astype(bool))
-                 .stack()
-                 .sort_values(ascending=False))
-        if not pairs.empty:
-            # Convert tuple keys to string for JSON serialization
-            top_corr = pairs.head(5).to_dict()
-            correlations = {f"{k[0]} vs {k[1]}": v for k, v in top_corr.items()}
-
-    # 2. Generate AI Analysis
-    ai_analysis_text = "AI Analysis unavailable."
-    try:
-        prompt = f"""
-        You are an expert Senior Data Scientist. Write a detailed Exploratory Data Analysis (EDA) report based on this dataset summary:
-        
-        Dataset Info: {len(df)} rows, {len(df.columns)} columns.
-        Columns: {', '.join(df.columns)}
-        
-        Descriptive Statistics:
-        {json.dumps(description, indent=2)}
-        
-        Missing Values:
-        {json.dumps(missing, indent=2)}
-        
-        Top Correlations (Absolute Values):
-        {json.dumps(correlations, indent=2)}
-        
-        Instructions:
-        1. Write a comprehensive "Executive Summary" analyzing the data quality, distributions, and relationships.
-        2. Specifically explain what the charts (Distribution, Heatmap, Boxplots) would likely show based on these stats.
-        3. Highlight any anomalies, outliers, or strong relationships.
-        4. Use professional, markdown-free formatting (paragraphs only).
-        5. Keep it under 400 words.
-        """
-        
-        response = groq_client.chat_completion([
-            {"role": "system", "content": "You are a helpful data science assistant."},
-            {"role": "user", "content": prompt}
-        ])
-        ai_analysis_text = response
-        
-    except Exception as e:
-        logger.error(f"AI Report Generation Failed: {e}")
-        ai_analysis_text = f"Could not generate AI analysis due to an error: {str(e)}"
-
-    analysis_results = {
-        'descriptive_stats': description,
-        'data_quality': {
-            'quality_score': 'N/A', 
-            'missing_values': missing
-        },
-        'ai_analysis': ai_analysis_text
-    }
-    
-    # generate_eda_pdf now handles chart generation internally using the df
-    pdf_buffer = generate_eda_pdf(df, analysis_results)
     
-    return StreamingResponse(
-        pdf_buffer,
-        media_type="application/pdf",
-        headers={"Content-Disposition": "attachment; filename=eda_report.pdf"}
-    )
-
-
-def generate_insights(df: pd.DataFrame, analysis: Dict) -> List[str]:
-    """
-    Generate AI-powered insights about the dataset
+    Waits for the report job; prefer POST /reports for large datasets.
     """
-    insights = []
-    
-    # Data size insight
-    rows, cols = df.shape
-    insights.append(f"Dataset contains {rows:,} rows and {cols} columns")
-    
-    # Missing values insight
-    missing_total = df.isnull().sum().sum()
-    if missing_total > 0:
-        missing_pct = (missing_total / (rows * cols)) * 100
-        insights.append(f"Found {missing_total:,} missing values ({missing_pct:.1f}% of total data)")
-    else:
-        insights.append("No missing values detected - data is complete!")
-    
-    # Column types insight
-    numeric_cols = df.select_dtypes(include=[np.number]).columns
-    categorical_cols = df.select_dtypes(include=['object']).columns
-    
-    if len(numeric_cols) > 0:
-        insights.append(f"Found {len(numeric_cols)} numeric columns suitable for modeling")
-    
-    if len(categorical_cols) > 0:
-        insights.append(f"Found {len(categorical_cols)} categorical columns that may need encoding")
-    
-    # Check for potential target variables
-    for col in df.columns:
-        if df[col].dtype in [np.int64, np.float64]:
-            unique_ratio = df[col].nunique() / len(df)
-            if unique_ratio < 0.1 and df[col].nunique() < 20:
-                insights.append(f"Column '{col}' might be a good classification target (low cardinality)")
-    
-    # Data quality insights
-    duplicate_count = df.duplicated().sum()
-    if duplicate_count > 0:
-        insights.append(f"Warning: Found {duplicate_count} duplicate rows")
+    try:
+        status = report_service.submit()
+    except ValueError:
+        raise HTTPException(status_code=404, detail="No dataset loaded")
     
-    return insights
+    status = report_service.wait(status['report_id'], timeout=settings.REPORT_TIMEOUT or None)
+    if status is None or status['status'] == 'failed':
+        detail = status['error'] if status else "Report not found"
+        raise HTTPException(status_code=500, detail=f"Report generation failed: {detail}")
+    if status['status'] != 'completed':
+        raise HTTPException(
+            status_code=504,
+            detail=f"Report is still being generated, poll /api/data/reports/{status['report_id']}"
+        )
+    return FileResponse(report_service.get_artifact(status['report_id']),
+                        media_type="application/pdf", filename="eda_report.pdf")
 
 
 @router.get("/test-data")
@@ -931,7 +608,7 @@ async def clean_data(request: Dict[str, Any]):
             prev_df, prev_info = current_dataset["history"].pop()
             current_dataset["df"] = prev_df
             current_dataset["info"] = prev_info
-            DataService._dataframe = prev_df # Sync
+            DataService().set_dataframe(prev_df) # Sync
             
             return {
                 "status": "success",
@@ -951,7 +628,7 @@ async def clean_data(request: Dict[str, Any]):
             next_df, next_info = current_dataset["future"].pop()
             current_dataset["df"] = next_df
             current_dataset["info"] = next_info
-            DataService._dataframe = next_df # Sync
+            DataService().set_dataframe(next_df) # Sync
             
             return {
                 "status": "success",
@@ -1005,8 +682,14 @@ async def clean_data(request: Dict[str, Any]):
             df.reset_index(drop=True, inplace=True)
 
         elif operation == "drop_duplicates":
-            df.drop_duplicates(inplace=True)
-            df.reset_index(drop=True, inplace=True)
+            # Optional subset of columns that must match, and which copy to keep
+            subset = [c for c in params.get("columns") or [] if c in df.columns] or None
+            keep = params.get("keep", "first")
+            if keep not in ("first", "last", False):
+                keep = "first"
+            # Row hashes are shared with the analysis, no second hashing pass
+            duplicated = analysis_service.row_index(df).duplicated(subset, keep=keep)
+            df = df[~duplicated].reset_index(drop=True)
 
         elif operation == "rename":
             old_name = params.get("column")
@@ -1026,7 +709,8 @@ async def clean_data(request: Dict[str, Any]):
                     elif dtype == 'float' or dtype == 'numeric':
                         df[col] = pd.to_numeric(df[col], errors='coerce')
                     elif dtype == 'datetime':
-                        df[col] = pd.to_datetime(df[col], errors='coerce')
+                        # Parsed once with the detected format (reused from the analysis when available)
+                        df[col] = analysis_service.parsed_datetime(df, col)
                     elif dtype == 'categorical':
                         df[col] = df[col].astype('category')
                     elif dtype == 'string':
@@ -1059,11 +743,7 @@ async def clean_data(request: Dict[str, Any]):
             threshold = float(params.get("threshold", 1.5))
             
             if col in df.columns and pd.api.types.is_numeric_dtype(df[col]):
-                Q1 = df[col].quantile(0.25)
-                Q3 = df[col].quantile(0.75)
-                IQR = Q3 - Q1
-                lower_bound = Q1 - threshold * IQR
-                upper_bound = Q3 + threshold * IQR
+                lower_bound, upper_bound = iqr_bounds(df[[col]], threshold).loc[col]
                 
                 if method == 'clip':
                     df[col] = df[col].clip(lower=lower_bound, upper=upper_bound)
@@ -1097,7 +777,7 @@ async def clean_data(request: Dict[str, Any]):
 
         # Update global reference (and Service sync)
         current_dataset["df"] = df
-        DataService._dataframe = df # Sync to ML Engine service
+        DataService().set_dataframe(df) # Sync to ML Engine service
         
         # Regenerate info
         # Helper function to make values JSON-safe (reused from upload)
@@ -1184,17 +864,10 @@ async def analyze_quality():
         # 3. Outlier Detection (Numeric columns)
         outlier_summary = []
         numeric_cols = df.select_dtypes(include=[np.number]).columns
+        # Every column's IQR fences and outlier flags in one pass
+        outlier_counts = univariate_mask(df[numeric_cols], "iqr", 1.5).sum(axis=0)
         
-        for col in numeric_cols:
-            Q1 = df[col].quantile(0.25)
-            Q3 = df[col].quantile(0.75)
-            IQR = Q3 - Q1
-            lower = Q1 - 1.5 * IQR
-            upper = Q3 + 1.5 * IQR
-            
-            outliers = df[(df[col] < lower) | (df[col] > upper)]
-            outlier_count = len(outliers)
-            
+        for col, outlier_count in zip(numeric_cols, outlier_counts.tolist()):
             if outlier_count > 0:
                 outlier_pct = round((outlier_count / total_rows) * 100, 2)
                 outlier_summary.append({
@@ -1235,10 +908,10 @@ async def analyze_quality():
             """
             
             try:
-                ai_response = groq_client.chat_completion([
+                ai_response = await groq_client.achat_completion([
                     {"role": "system", "content": "You are a data cleaning expert. Output valid JSON only."},
                     {"role": "user", "content": prompt}
-                ])
+                ], cache=True)
                 
                 import re
                 json_match = re.search(r'\{.*\}', ai_response, re.DOTALL)
@@ -1284,58 +957,31 @@ from typing import Optional
 
 class OutlierRequest(BaseModel):
     columns: Optional[List[str]] = None
-    method: str = "iqr"  # iqr or zscore
+    method: str = "iqr"  # iqr, zscore, isolation_forest or robust_covariance
     threshold: float = 1.5  # IQR multiplier or Z-score threshold
+    contamination: float = 0.05  # Expected outlier share (isolation_forest / robust_covariance)
 
 @router.post("/outliers/detect")
 async def detect_outliers(request: OutlierRequest):
-    """Detect outliers in numeric columns using IQR or Z-score method"""
+    """Detect outliers in numeric columns (IQR, Z-score, or multivariate IsolationForest / robust covariance)"""
     if current_dataset["df"] is None:
         raise HTTPException(status_code=404, detail="No dataset loaded")
     
     try:
         df = current_dataset["df"]
-        numeric_cols = df.select_dtypes(include=[np.number]).columns.tolist()
-        
-        # Filter to requested columns or use all numeric
-        target_cols = request.columns if request.columns else numeric_cols
-        target_cols = [c for c in target_cols if c in numeric_cols]
-        
-        outlier_info = []
-        total_outlier_rows = set()
-        
-        for col in target_cols:
-            col_data = df[col].dropna()
-            
-            if request.method == "zscore":
-                from scipy import stats
-                z_scores = np.abs(stats.zscore(col_data))
-                outlier_mask = z_scores > request.threshold
-            else:  # IQR
-                q1 = col_data.quantile(0.25)
-                q3 = col_data.quantile(0.75)
-                iqr = q3 - q1
-                lower = q1 - request.threshold * iqr
-                upper = q3 + request.threshold * iqr
-                outlier_mask = (col_data < lower) | (col_data > upper)
-            
-            outlier_indices = col_data[outlier_mask].index.tolist()
-            total_outlier_rows.update(outlier_indices)
-            
-            outlier_info.append({
-                "column": col,
-                "outlier_count": int(outlier_mask.sum()),
-                "percentage": round((outlier_mask.sum() / len(col_data)) * 100, 2),
-                "sample_values": col_data[outlier_mask].head(5).tolist()
-            })
+        result = await run_in_threadpool(
+            find_outliers, df, request.columns, request.method, request.threshold, request.contamination
+        )
         
         return {
             "method": request.method,
             "threshold": request.threshold,
-            "total_outlier_rows": len(total_outlier_rows),
-            "columns_analyzed": len(target_cols),
-            "details": outlier_info
+            "total_outlier_rows": int(result["row_mask"].sum()),
+            "columns_analyzed": len(result["columns"]),
+            "details": result["details"]
         }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Outlier detection error: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
@@ -1348,118 +994,173 @@ async def remove_outliers(request: OutlierRequest):
         raise HTTPException(status_code=404, detail="No dataset loaded")
     
     try:
-        df = current_dataset["df"].copy()
+        df = current_dataset["df"]
         original_rows = len(df)
-        numeric_cols = df.select_dtypes(include=[np.number]).columns.tolist()
-        
-        target_cols = request.columns if request.columns else numeric_cols
-        target_cols = [c for c in target_cols if c in numeric_cols]
-        
-        rows_to_remove = set()
-        
-        for col in target_cols:
-            col_data = df[col]
-            
-            if request.method == "zscore":
-                from scipy import stats
-                z_scores = np.abs(stats.zscore(col_data.dropna()))
-                mask = pd.Series(False, index=df.index)
-                mask.loc[col_data.dropna().index] = z_scores > request.threshold
-            else:  # IQR
-                q1 = col_data.quantile(0.25)
-                q3 = col_data.quantile(0.75)
-                iqr = q3 - q1
-                lower = q1 - request.threshold * iqr
-                upper = q3 + request.threshold * iqr
-                mask = (col_data < lower) | (col_data > upper)
-            
-            rows_to_remove.update(df[mask].index.tolist())
+        result = await run_in_threadpool(
+            find_outliers, df, request.columns, request.method, request.threshold, request.contamination
+        )
         
         # Remove outlier rows
-        df = df.drop(index=list(rows_to_remove))
+        df = df[~result["row_mask"]]
         
         # Update global dataset
         current_dataset["df"] = df
-        DataService._dataframe = df
+        DataService().set_dataframe(df)
         
         return {
             "status": "success",
             "original_rows": original_rows,
-            "removed_rows": len(rows_to_remove),
+            "removed_rows": original_rows - len(df),
             "remaining_rows": len(df),
-            "columns_processed": target_cols
+            "columns_processed": result["columns"]
         }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Outlier removal error: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# ==================== DUPLICATE DETECTION ====================
+
+class DuplicateRequest(BaseModel):
+    columns: Optional[List[str]] = None  # Columns that must match (default: all)
+    normalize: bool = False  # Near-duplicates: ignore text case/whitespace, round floats
+    max_groups: int = 10
+
+@router.post("/duplicates/detect")
+async def detect_duplicates(request: DuplicateRequest):
+    """Count duplicate rows, optionally on a column subset or as near-duplicates"""
+    if current_dataset["df"] is None:
+        raise HTTPException(status_code=404, detail="No dataset loaded")
+    
+    df = current_dataset["df"]
+    columns = request.columns
+    if columns is not None:
+        missing = [c for c in columns if c not in df.columns]
+        if missing or not columns:
+            raise HTTPException(status_code=400, detail=f"Unknown columns: {missing}" if missing else "No columns given")
+    
+    try:
+        def find():
+            # Shares the analysis' row hashes when df is the current dataset
+            row_index = analysis_service.row_index(df)
+            return (row_index.duplicate_count(columns, normalize=request.normalize),
+                    row_index.duplicate_groups(columns, normalize=request.normalize, max_groups=request.max_groups))
+        
+        duplicate_rows, groups = await run_in_threadpool(find)
+        
+        return {
+            "columns": columns or [str(c) for c in df.columns],
+            "normalized": request.normalize,
+            "total_rows": len(df),
+            "duplicate_rows": duplicate_rows,
+            "percentage": round(duplicate_rows / len(df) * 100, 2) if len(df) else 0.0,
+            "groups": groups
+        }
+    except Exception as e:
+        logger.error(f"Duplicate detection error: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 # ==================== FEATURE ENGINEERING ====================
 
-class FeatureEngineeringRequest(BaseModel):
-    operation: str  # polynomial, log, interaction, binning
+def json_safe_preview(df: pd.DataFrame) -> dict:
+    """Column -> {row: value} of numeric columns, with missing and infinite values as None"""
+    return df.astype(object).where(np.isfinite(df.to_numpy(dtype=float)), None).to_dict()
+
+class FeatureOperation(BaseModel):
+    operation: str  # See ml_engine.engines.feature_engine.FEATURE_OPERATIONS
     columns: List[str]
     params: Optional[Dict[str, Any]] = None
 
+class FeatureEngineeringRequest(BaseModel):
+    # A single operation, or a batch in operations (applied in one pass)
+    operation: Optional[str] = None  # See ml_engine.engines.feature_engine.FEATURE_OPERATIONS
+    columns: List[str] = []
+    params: Optional[Dict[str, Any]] = None
+    operations: Optional[List[FeatureOperation]] = None
+
 @router.post("/engineer")
 async def engineer_features(request: FeatureEngineeringRequest):
-    """Create new features from existing columns"""
+    """Create new features from existing columns (one operation or a batch)"""
     if current_dataset["df"] is None:
         raise HTTPException(status_code=404, detail="No dataset loaded")
     
+    operations = [op.model_dump() for op in request.operations or []]
+    if request.operation:
+        operations.insert(0, {"operation": request.operation, "columns": request.columns, "params": request.params})
+    if not operations:
+        raise HTTPException(status_code=400, detail="No feature operation given")
+    
     try:
-        df = current_dataset["df"].copy()
-        new_columns = []
-        params = request.params or {}
-        
-        if request.operation == "polynomial":
-            degree = params.get("degree", 2)
-            for col in request.columns:
-                if col in df.columns and df[col].dtype in [np.float64, np.int64]:
-                    new_col = f"{col}_pow{degree}"
-                    df[new_col] = df[col] ** degree
-                    new_columns.append(new_col)
-        
-        elif request.operation == "log":
-            for col in request.columns:
-                if col in df.columns and df[col].dtype in [np.float64, np.int64]:
-                    new_col = f"{col}_log"
-                    # Add small value to avoid log(0)
-                    df[new_col] = np.log1p(df[col].clip(lower=0))
-                    new_columns.append(new_col)
-        
-        elif request.operation == "interaction":
-            if len(request.columns) >= 2:
-                col1, col2 = request.columns[0], request.columns[1]
-                if col1 in df.columns and col2 in df.columns:
-                    new_col = f"{col1}_x_{col2}"
-                    df[new_col] = df[col1] * df[col2]
-                    new_columns.append(new_col)
-        
-        elif request.operation == "binning":
-            n_bins = params.get("bins", 5)
-            for col in request.columns:
-                if col in df.columns and df[col].dtype in [np.float64, np.int64]:
-                    new_col = f"{col}_binned"
-                    df[new_col] = pd.cut(df[col], bins=n_bins, labels=False)
-                    new_columns.append(new_col)
+        # New columns are computed into compact blocks, existing columns aren't copied
+        df, new_columns = await run_in_threadpool(engineer, current_dataset["df"], operations)
         
         # Update global dataset
         current_dataset["df"] = df
-        DataService._dataframe = df
+        DataService().set_dataframe(df)
         
         return {
             "status": "success",
-            "operation": request.operation,
+            "operation": request.operation or "batch",
+            "operations": [op["operation"] for op in operations],
             "new_columns": new_columns,
             "total_columns": len(df.columns),
-            "preview": df[new_columns].head(5).to_dict() if new_columns else {}
+            "preview": json_safe_preview(df[new_columns].head(5)) if new_columns else {}
         }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Feature engineering error: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 
+class AutoFeatureRequest(BaseModel):
+    target_column: str
+    max_features: int = 10  # Features added at most
+    time_budget_seconds: Optional[float] = None  # Default: settings.AUTO_FEATURE_TIME_BUDGET
+    memory_budget_mb: Optional[int] = None  # Default: settings.AUTO_FEATURE_MEMORY_MB
+    apply: bool = True  # Add the selected features (False only reports them)
+
+@router.post("/engineer/auto")
+async def auto_engineer_features(request: AutoFeatureRequest):
+    """Generate candidate features, screen them against the target within a budget, and add the best"""
+    if current_dataset["df"] is None:
+        raise HTTPException(status_code=404, detail="No dataset loaded")
+    
+    budget = {
+        "max_seconds": request.time_budget_seconds or settings.AUTO_FEATURE_TIME_BUDGET,
+        "max_memory_mb": request.memory_budget_mb or settings.AUTO_FEATURE_MEMORY_MB,
+        "sample_rows": settings.AUTO_FEATURE_SAMPLE_ROWS,
+    }
+    
+    try:
+        df = current_dataset["df"]
+        result = await run_in_threadpool(
+            synthesize_features, df, request.target_column, request.max_features, budget
+        )
+        
+        new_columns = []
+        if request.apply and result["operations"]:
+            df, new_columns = await run_in_threadpool(engineer, df, result["operations"])
+            current_dataset["df"] = df
+            DataService().set_dataframe(df)
+        
+        return {
+            "status": "success",
+            **result,
+            "new_columns": new_columns,
+            "total_columns": len(df.columns),
+            "preview": json_safe_preview(df[new_columns].head(5)) if new_columns else {}
+        }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Automated feature engineering error: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 # Log router initialization
 logger.info("=" * 60)
 logger.info("Data API Router Loaded")
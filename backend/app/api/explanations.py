@@ -1,4 +1,5 @@
 from fastapi import APIRouter, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from app.services.explanation_service import ExplanationService
 import logging
 
@@ -11,10 +12,14 @@ explanation_service = ExplanationService()
 async def get_shap_explanations(job_id: str):
     """
     Get SHAP explanations for trained model
+    
+    Results are cached per job. Plots render in a worker process; until they
+    are ready shap_results.plots is empty and plots_status is 'pending'
+    (poll /shap/{job_id}/plots).
     """
     try:
         logger.info(f"Getting explanations for job: {job_id}")
-        result = explanation_service.explain_model(job_id)
+        result = await run_in_threadpool(explanation_service.explain_model, job_id)
         return result
         
     except ValueError as e:
@@ -22,4 +27,17 @@ async def get_shap_explanations(job_id: str):
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         logger.error(f"Explanation endpoint error: {str(e)}", exc_info=True)
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/shap/{job_id}/plots")
+async def get_shap_plots(job_id: str):
+    """
+    Get rendered SHAP plots for a job (status: ready, pending, failed or unavailable)
+    """
+    try:
+        return explanation_service.get_plots(job_id)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        logger.error(f"SHAP plots endpoint error: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
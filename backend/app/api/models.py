@@ -1,8 +1,15 @@
-from fastapi import APIRouter, HTTPException, Response, UploadFile, File
-from pydantic import BaseModel
+from fastapi import APIRouter, HTTPException, Request, Response, UploadFile, File
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, Field
 from app.services.ml_service import MLService
+from app.utils.columnar import (
+    ARROW_STREAM_MEDIA_TYPE, is_arrow_media_type, columns_to_dataframe,
+    arrow_to_dataframe, dataframe_to_arrow, prediction_frame
+)
 from typing import Optional, List
 import logging
+import json
 import io
 import joblib
 
@@ -18,6 +25,7 @@ class TrainRequest(BaseModel):
     test_size: float = 0.2
     cv_folds: int = 5
     enable_tuning: bool = False
+    keep_models: Optional[bool] = None  # Retain every trained model, not just the best
 
 @router.post("/train")
 async def train_models(request: TrainRequest):
@@ -27,12 +35,15 @@ async def train_models(request: TrainRequest):
     try:
         logger.info(f"Received training request for target: {request.target_column}, test_size: {request.test_size}, cv_folds: {request.cv_folds}, enable_tuning: {request.enable_tuning}")
         
-        result = ml_service.train_models(
+        # Training and its LLM summary are blocking, keep them off the event loop
+        result = await run_in_threadpool(
+            ml_service.run_training,
             target_column=request.target_column,
             model_types=request.model_types,
             test_size=request.test_size,
             cv_folds=request.cv_folds,
-            enable_tuning=request.enable_tuning
+            enable_tuning=request.enable_tuning,
+            keep_models=request.keep_models
         )
         
         logger.info(f"Training successful. Job ID: {result['job_id']}")
@@ -69,6 +80,26 @@ async def get_model_results(job_id: str):
         logger.error(f"Get results error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/jobs")
+async def get_jobs_memory():
+    """Get memory usage of retained training jobs"""
+    try:
+        return ml_service.get_memory_report()
+    except Exception as e:
+        logger.error(f"Get jobs memory error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.delete("/jobs/{job_id}")
+async def release_job(job_id: str):
+    """Free the trained models of a job, keeping its summary"""
+    try:
+        return ml_service.release_job(job_id)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        logger.error(f"Release job error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/experiments")
 async def get_experiments():
     """Get list of past training experiments"""
@@ -91,11 +122,16 @@ async def get_experiments():
         return []
 
 @router.get("/export/{job_id}")
-async def export_model(job_id: str):
-    """Export the best trained model as a downloadable joblib file"""
+async def export_model(job_id: str, format: str = "joblib"):
+    """
+    Export the best trained model as a downloadable file
+    
+    format=joblib returns the pickled estimator, format=onnx returns the full
+    imputation + scaling + model pipeline as an ONNX graph (float64 input)
+    """
     try:
         # Get job with trainer
-        job = ml_service.jobs.get(job_id)
+        job = ml_service.get_job(job_id)
         if not job:
             raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
         
@@ -108,19 +144,32 @@ async def export_model(job_id: str):
         if not best_server or not hasattr(best_server, 'trained_model'):
             raise HTTPException(status_code=400, detail="No trained model found")
         
-        # Serialize model to bytes
-        buffer = io.BytesIO()
-        joblib.dump(best_server.trained_model, buffer)
-        buffer.seek(0)
-        
         # Get model name for filename
         best_model_name = job['results']['best_model']['model_name'].replace(' ', '_').lower()
         
+        if format == "onnx":
+            try:
+                content = await run_in_threadpool(ml_service.export_onnx, job_id)
+            except ImportError as e:
+                raise HTTPException(status_code=501, detail=str(e))
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            extension = "onnx"
+        elif format == "joblib":
+            # Serialize model to bytes
+            buffer = io.BytesIO()
+            joblib.dump(best_server.trained_model, buffer)
+            buffer.seek(0)
+            content = buffer.read()
+            extension = "joblib"
+        else:
+            raise HTTPException(status_code=400, detail=f"Unsupported export format: {format}")
+        
         return Response(
-            content=buffer.read(),
+            content=content,
             media_type="application/octet-stream",
             headers={
-                "Content-Disposition": f"attachment; filename={best_model_name}.joblib"
+                "Content-Disposition": f"attachment; filename={best_model_name}.{extension}"
             }
         )
     except HTTPException:
@@ -133,10 +182,14 @@ class PredictRequest(BaseModel):
     features: List[float]
 
 @router.post("/predict/{job_id}")
-async def predict(job_id: str, request: PredictRequest):
-    """Make a prediction using the best trained model"""
+async def predict(job_id: str, request: PredictRequest, backend: Optional[str] = None):
+    """
+    Make a prediction using the best trained model
+    
+    backend selects 'native' or 'onnx' inference (defaults to settings.INFERENCE_BACKEND)
+    """
     try:
-        job = ml_service.jobs.get(job_id)
+        job = ml_service.get_job(job_id)
         if not job:
             raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
         
@@ -149,30 +202,17 @@ async def predict(job_id: str, request: PredictRequest):
             raise HTTPException(status_code=400, detail="No trained model found")
         
         import numpy as np
-        features_array = np.array([request.features])
-        
-        # Scale features if scaler exists
-        if hasattr(trainer, 'scaler') and trainer.scaler is not None:
-            features_array = trainer.scaler.transform(features_array)
+        features_array = np.array([request.features], dtype=float)
         
-        prediction = best_server.trained_model.predict(features_array)
+        try:
+            predictions, proba = await run_in_threadpool(ml_service.predict, job_id, features_array, backend)
+        except ImportError as e:
+            raise HTTPException(status_code=501, detail=str(e))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         
-        # Get probability if available
-        probability = None
-        if hasattr(best_server.trained_model, 'predict_proba'):
-            try:
-                proba = best_server.trained_model.predict_proba(features_array)
-                probability = proba[0].tolist()
-            except:
-                pass
-        
-        # Decode label if encoder exists
-        result = prediction[0]
-        if hasattr(trainer, 'label_encoder') and trainer.label_encoder is not None:
-            try:
-                result = trainer.label_encoder.inverse_transform([int(prediction[0])])[0]
-            except:
-                pass
+        result = predictions[0]
+        probability = proba[0].tolist() if proba is not None else None
         
         return {
             "prediction": result if not hasattr(result, 'item') else result.item(),
@@ -185,95 +225,135 @@ async def predict(job_id: str, request: PredictRequest):
         logger.error(f"Prediction error: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/predict-columnar/{job_id}")
+async def predict_columnar(job_id: str, request: Request, backend: Optional[str] = None):
+    """
+    Predict many rows in one call using a columnar payload
+
+    Body is either JSON {"columns": {"feature": [values, ...], ...}} or an
+    Arrow IPC stream (Content-Type: application/vnd.apache.arrow.stream).
+    Raw feature values are accepted (categoricals as strings). The response
+    is columnar too: prediction plus probability_<class> columns, as Arrow
+    when the request was Arrow or Accept asks for it, JSON otherwise.
+    """
+    try:
+        if ml_service.get_job(job_id) is None:
+            raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+
+        content_type = request.headers.get("content-type", "")
+        body = await request.body()
+
+        try:
+            if is_arrow_media_type(content_type):
+                df = await run_in_threadpool(arrow_to_dataframe, body)
+            else:
+                payload = json.loads(body or b"{}")
+                df = columns_to_dataframe(payload.get("columns") if isinstance(payload, dict) else None)
+
+            result = await run_in_threadpool(ml_service.predict_frame, job_id, df, backend)
+        except ImportError as e:
+            raise HTTPException(status_code=501, detail=str(e))
+        except json.JSONDecodeError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid JSON body: {e}")
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        output = prediction_frame(result['predictions'], result['probabilities'], result['classes'])
+        model_name = ml_service.get_job(job_id)['results']['best_model']['model_name']
+
+        if is_arrow_media_type(content_type) or is_arrow_media_type(request.headers.get("accept", "")):
+            return Response(
+                content=await run_in_threadpool(dataframe_to_arrow, output),
+                media_type=ARROW_STREAM_MEDIA_TYPE,
+                headers={
+                    "X-Model-Name": model_name,
+                    "X-Missing-Columns": ",".join(result['missing_columns'])
+                }
+            )
+
+        # Columns are plain lists already, so skip FastAPI's per-item encoder
+        return JSONResponse(content={
+            "model_name": model_name,
+            "n_rows": len(output),
+            "columns": {col: output[col].tolist() for col in output.columns},
+            "missing_columns": result['missing_columns']
+        })
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Columnar prediction error: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
 class ExplainRequest(BaseModel):
     features: List[float]
 
+class ExplainBatchRequest(BaseModel):
+    rows: List[List[float]]
+    top_k: int = Field(10, ge=1)
+
 @router.post("/explain/{job_id}")
 async def explain_prediction(job_id: str, request: ExplainRequest):
     """Explain a prediction using SHAP values"""
     try:
-        import shap
-        import numpy as np
-        
-        job = ml_service.jobs.get(job_id)
+        job = ml_service.get_job(job_id)
         if not job:
             raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
         
-        trainer = job.get('trainer')
-        if not trainer:
-            raise HTTPException(status_code=400, detail="No trainer found for this job")
-        
-        best_server = trainer.get_best_model_server()
-        if not best_server or not hasattr(best_server, 'trained_model'):
-            raise HTTPException(status_code=400, detail="No trained model found")
-        
-        model = best_server.trained_model
-        feature_names = job['results'].get('feature_names', [f'Feature {i}' for i in range(len(request.features))])
-        
-        # Prepare features
-        features_array = np.array([request.features])
-        if hasattr(trainer, 'scaler') and trainer.scaler is not None:
-            features_array = trainer.scaler.transform(features_array)
-        
-        # Create SHAP explainer based on model type
         try:
-            # Try TreeExplainer for tree-based models
-            explainer = shap.TreeExplainer(model)
-            shap_values = explainer.shap_values(features_array)
-        except:
-            try:
-                # Fall back to KernelExplainer for other models
-                # Use a small background sample if available
-                background = trainer.X_train[:50] if hasattr(trainer, 'X_train') and trainer.X_train is not None else features_array
-                explainer = shap.KernelExplainer(model.predict, background)
-                shap_values = explainer.shap_values(features_array, nsamples=100)
-            except Exception as e:
-                logger.warning(f"SHAP failed: {e}")
-                return {"error": "SHAP not supported for this model type", "shap_values": None}
+            rows = await run_in_threadpool(ml_service.explain_rows, job_id, [request.features])
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            logger.warning(f"SHAP failed: {e}")
+            return {"error": "SHAP not supported for this model type", "shap_values": None}
         
-        # Handle multi-class output
-        if isinstance(shap_values, list):
-            # For classification, take the values for the predicted class
-            prediction = model.predict(features_array)[0]
-            pred_class = int(prediction) if hasattr(prediction, '__int__') else 0
-            shap_vals = shap_values[pred_class][0] if pred_class < len(shap_values) else shap_values[0][0]
-        else:
-            shap_vals = shap_values[0]
-        
-        # Create explanation data for frontend
-        explanations = []
-        for i, (name, val) in enumerate(zip(feature_names, shap_vals)):
-            explanations.append({
-                "feature": name,
-                "value": float(request.features[i]),
-                "shap_value": float(val),
-                "contribution": "positive" if val > 0 else "negative"
-            })
+        return {
+            "explanations": rows[0]['explanations'],  # Top 10 features
+            "base_value": rows[0]['base_value'],
+            "model_name": job['results']['best_model']['model_name']
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Explain error: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/explain-batch/{job_id}")
+async def explain_batch(job_id: str, request: ExplainBatchRequest):
+    """Explain many predictions in one call with the job's cached explainer"""
+    try:
+        job = ml_service.get_job(job_id)
+        if not job:
+            raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+        if not request.rows:
+            raise HTTPException(status_code=400, detail="No rows to explain")
         
-        # Sort by absolute SHAP value
-        explanations.sort(key=lambda x: abs(x["shap_value"]), reverse=True)
+        try:
+            rows = await run_in_threadpool(ml_service.explain_rows, job_id, request.rows, request.top_k)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         
         return {
-            "explanations": explanations[:10],  # Top 10 features
-            "base_value": float(explainer.expected_value[0]) if isinstance(explainer.expected_value, (list, np.ndarray)) else float(explainer.expected_value),
+            "rows": rows,
+            "explainer": ml_service.explainers[job_id].kind,
             "model_name": job['results']['best_model']['model_name']
         }
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Explain error: {str(e)}", exc_info=True)
+        logger.error(f"Batch explain error: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.post("/predict-batch/{job_id}")
-async def predict_batch(job_id: str, file: UploadFile = File(...)):
+async def predict_batch(job_id: str, file: UploadFile = File(...), backend: Optional[str] = None):
     """Batch prediction - upload CSV and get predictions"""
     from fastapi.responses import StreamingResponse
     import pandas as pd
     import io
     
     try:
-        job = ml_service.jobs.get(job_id)
+        job = ml_service.get_job(job_id)
         if not job:
             raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
         
@@ -292,43 +372,25 @@ async def predict_batch(job_id: str, file: UploadFile = File(...)):
         # Get feature names from training (need to match)
         feature_names = job['results'].get('feature_names', [])
         
-        # Prepare features - only keep columns that were used in training
         available_cols = [c for c in feature_names if c in df.columns]
         if len(available_cols) < len(feature_names):
             missing = set(feature_names) - set(available_cols)
-            logger.warning(f"Missing columns in batch file: {missing}")
-        
-        X = df[available_cols] if available_cols else df.select_dtypes(include=['number'])
-        
-        # Handle missing values
-        X = X.fillna(X.mean())
-        
-        # Scale if scaler exists
-        import numpy as np
-        features_array = X.values
-        if hasattr(trainer, 'scaler') and trainer.scaler is not None:
-            features_array = trainer.scaler.transform(features_array)
+            logger.warning(f"Missing columns in batch file (imputed with training means): {missing}")
         
-        # Predict
-        predictions = best_server.trained_model.predict(features_array)
+        # Encode with the training encoders; missing values are imputed downstream
+        features_array = trainer.encode_features(df)
         
-        # Decode labels if needed
-        if hasattr(trainer, 'label_encoder') and trainer.label_encoder is not None:
-            try:
-                predictions = trainer.label_encoder.inverse_transform(predictions.astype(int))
-            except:
-                pass
+        try:
+            predictions, proba = await run_in_threadpool(ml_service.predict, job_id, features_array, backend)
+        except ImportError as e:
+            raise HTTPException(status_code=501, detail=str(e))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         
         # Add predictions to dataframe
         df['prediction'] = predictions
-        
-        # Get probabilities if available
-        if hasattr(best_server.trained_model, 'predict_proba'):
-            try:
-                proba = best_server.trained_model.predict_proba(features_array)
-                df['prediction_confidence'] = proba.max(axis=1)
-            except:
-                pass
+        if proba is not None:
+            df['prediction_confidence'] = proba.max(axis=1)
         
         # Create CSV response
         output = io.StringIO()
@@ -345,4 +407,4 @@ async def predict_batch(job_id: str, file: UploadFile = File(...)):
         raise
     except Exception as e:
         logger.error(f"Batch prediction error: {str(e)}", exc_info=True)
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,33 @@
+"""
+Sessions API Router
+Inspect and end the calling session (selected with the X-Session-ID header)
+Session ids are the only credential a session has, so no endpoint lists them.
+"""
+
+from fastapi import APIRouter
+import logging
+
+from app.core.sessions import session_manager, get_session_id
+from app.services.ml_service import MLService
+from app.services.report_service import report_service
+
+logger = logging.getLogger(__name__)
+router = APIRouter(tags=["sessions"])
+
+ml_service = MLService()
+
+
+@router.get("/current")
+async def get_current_session():
+    """Metadata of the calling session"""
+    return session_manager.current().metadata()
+
+
+@router.delete("/current")
+async def end_current_session():
+    """Drop the calling session's dataset, chat history, trained models and reports"""
+    session_id = get_session_id()
+    released_jobs = ml_service.release_session_jobs(session_id)
+    deleted_reports = report_service.delete_session(session_id)
+    session_manager.delete(session_id)
+    return {"session_id": session_id, "released_jobs": released_jobs, "deleted_reports": deleted_reports}
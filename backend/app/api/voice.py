@@ -3,16 +3,27 @@ Voice API Router
 Handles voice command processing: transcription, intent parsing, and execution
 """
 
-from fastapi import APIRouter, File, UploadFile, HTTPException, Request
+from fastapi import APIRouter, File, UploadFile, HTTPException, Request, WebSocket, WebSocketDisconnect
 from fastapi.responses import JSONResponse
+from fastapi.concurrency import run_in_threadpool
 from app.services.voice_service import VoiceService
 from app.services.nlu_service import NLUService
 from app.services.tts_service import TTSService
+from app.services.analysis_service import AnalysisService
+from app.services.data_service import DataService
+from app.services.intent_classifier import local_intent_classifier
+from app.services.voice_stream import SpeechSegmenter, segment_transcriber
+from app.core.sessions import (
+    SESSION_HEADER, DEFAULT_SESSION, is_valid_session_id, set_session_id, reset_session_id
+)
+from app.config import settings
+from contextlib import contextmanager
+import asyncio
 import logging
+import json
 import os
-import tempfile
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
 import time
 
 # Configure logging
@@ -82,14 +93,8 @@ def validate_audio_file(audio: UploadFile) -> None:
         )
 
 
-async def save_upload_file(audio: UploadFile) -> tuple[str, bytes]:
-    """
-    Save uploaded file to temporary location
-    
-    Returns:
-        Tuple of (temp_file_path, content_bytes)
-    """
-    suffix = Path(audio.filename).suffix or ".webm"
+async def read_upload(audio: UploadFile) -> bytes:
+    """Read the uploaded audio into memory (it is sent to Whisper as-is, no temp file)"""
     content = await audio.read()
     
     if not content or len(content) == 0:
@@ -99,23 +104,111 @@ async def save_upload_file(audio: UploadFile) -> tuple[str, bytes]:
         )
     
     logger.info(f"Received audio: {audio.filename}, size: {len(content)} bytes")
+    return content
+
+
+class StageTimer:
+    """Wall-clock milliseconds spent in each pipeline stage"""
     
-    # Create temporary file
-    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as temp_file:
-        temp_file.write(content)
-        temp_file_path = temp_file.name
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
     
-    return temp_file_path, content
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = round((time.perf_counter() - start) * 1000, 1)
+    
+    def report(self) -> Dict[str, float]:
+        return {**self.stages, "total": round((time.perf_counter() - self.started) * 1000, 1)}
 
 
-def cleanup_temp_file(file_path: str) -> None:
-    """Safely delete temporary file"""
-    if file_path and os.path.exists(file_path):
-        try:
-            os.unlink(file_path)
-            logger.debug(f"Deleted temporary file: {file_path}")
-        except Exception as e:
-            logger.warning(f"Failed to delete temp file {file_path}: {e}")
+# Intents whose work can start from the transcript alone, before NLU has finished
+PREFETCH_INTENTS = {"ANALYZE_DATA"}
+_prefetch_tasks = set()  # Strong references so running prefetches aren't garbage collected
+
+# Sample rates accepted on the streaming endpoint (telephony to studio audio)
+MIN_STREAM_SAMPLE_RATE = 8000
+MAX_STREAM_SAMPLE_RATE = 48000
+
+
+def _prefetch_done(task: asyncio.Task) -> None:
+    _prefetch_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning(f"Voice prefetch failed: {task.exception()}")
+
+
+def start_prefetch(text: str, timer: StageTimer) -> Optional[asyncio.Task]:
+    """
+    Start dataset work the command will probably need, while NLU runs
+    
+    Guessed from the local classifier without a confidence threshold: a wrong
+    guess only warms a per-dataset cache.
+    """
+    guess = local_intent_classifier.classify(text)
+    if guess["intent"] not in PREFETCH_INTENTS or not DataService().get_columns():
+        return None
+    
+    async def prefetch():
+        with timer.stage("prefetch"):
+            await run_in_threadpool(AnalysisService().prefetch)
+    
+    logger.info(f"Prefetching analysis for likely {guess['intent']}")
+    task = asyncio.create_task(prefetch())
+    _prefetch_tasks.add(task)
+    task.add_done_callback(_prefetch_done)
+    return task
+
+
+async def transcribe_audio_upload(audio: UploadFile, timer: StageTimer) -> Tuple[str, int]:
+    """
+    Validate, read and transcribe an uploaded command
+    
+    Returns:
+        Tuple of (transcription, audio size in bytes)
+    """
+    validate_audio_file(audio)
+    with timer.stage("upload"):
+        content = await read_upload(audio)
+    
+    with timer.stage("transcription"):
+        transcription = await voice_service.atranscribe(content, audio.filename)
+    
+    if not transcription or transcription.strip() == "":
+        raise HTTPException(
+            status_code=400,
+            detail="Could not transcribe audio. Please try again."
+        )
+    
+    logger.info(f"✓ Transcribed: '{transcription}'")
+    return transcription, len(content)
+
+
+async def understand_and_execute(text: str, timer: StageTimer, execute: bool = True) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]]]:
+    """
+    Parse the intent (with prefetch running alongside) and optionally execute it
+    
+    Returns:
+        Tuple of (intent data, execution result or None)
+    """
+    start_prefetch(text, timer)
+    
+    with timer.stage("nlu"):
+        intent_data = await run_in_threadpool(nlu_service.parse_intent, text)
+    logger.info(f"✓ Intent: {intent_data['intent']} "
+               f"(confidence: {intent_data['confidence']:.2f}, source: {intent_data.get('source', 'llm')})")
+    
+    if not execute:
+        return intent_data, None
+    
+    # Execution shares the prefetched analysis (it waits for it rather than recomputing)
+    with timer.stage("execution"):
+        execution_result = await run_in_threadpool(nlu_service.execute_intent, intent_data)
+    logger.info(f"✓ Execution: {execution_result.get('action', 'unknown')}")
+    return intent_data, execution_result
 
 
 # API Endpoints
@@ -150,8 +243,7 @@ async def transcribe_audio(audio: UploadFile = File(...)):
             "duration_ms": 1234
         }
     """
-    start_time = time.time()
-    temp_file_path = None
+    timer = StageTimer()
 
     try:
         # Validate
@@ -163,12 +255,12 @@ async def transcribe_audio(audio: UploadFile = File(...)):
         
         validate_audio_file(audio)
         
-        # Save audio file
-        temp_file_path, content = await save_upload_file(audio)
+        with timer.stage("upload"):
+            content = await read_upload(audio)
         
-        # Transcribe
-        logger.info(f"Starting transcription for: {temp_file_path}")
-        transcription = voice_service.transcribe(temp_file_path)
+        # Transcribe straight from memory
+        with timer.stage("transcription"):
+            transcription = await voice_service.atranscribe(content, audio.filename)
 
         if not transcription or transcription.strip() == "":
             raise HTTPException(
@@ -176,13 +268,15 @@ async def transcribe_audio(audio: UploadFile = File(...)):
                 detail="Transcription returned empty result. Please try speaking more clearly."
             )
 
-        duration_ms = int((time.time() - start_time) * 1000)
+        timings = timer.report()
+        duration_ms = int(timings["total"])
         logger.info(f"✓ Transcription successful ({duration_ms}ms): {transcription}")
         
         return {
             "text": transcription,
             "success": True,
             "duration_ms": duration_ms,
+            "timings_ms": timings,
             "audio_size_bytes": len(content)
         }
 
@@ -197,8 +291,6 @@ async def transcribe_audio(audio: UploadFile = File(...)):
             status_code=500,
             detail=f"Transcription failed: {str(e)}"
         )
-    finally:
-        cleanup_temp_file(temp_file_path)
 
 
 @router.post("/parse-intent")
@@ -220,43 +312,28 @@ async def parse_intent(audio: UploadFile = File(...)):
             "success": true
         }
     """
-    start_time = time.time()
-    temp_file_path = None
+    timer = StageTimer()
 
     try:
         # Validate services
         validate_services()
-        validate_audio_file(audio)
-        
-        # Save audio
-        temp_file_path, content = await save_upload_file(audio)
         
         # Step 1: Transcribe
         logger.info("Step 1: Transcribing audio...")
-        transcription = voice_service.transcribe(temp_file_path)
-
-        if not transcription or transcription.strip() == "":
-            raise HTTPException(
-                status_code=400,
-                detail="Could not transcribe audio. Please try again."
-            )
-
-        logger.info(f"✓ Transcribed: '{transcription}'")
+        transcription, _ = await transcribe_audio_upload(audio, timer)
 
         # Step 2: Parse intent
         logger.info("Step 2: Parsing intent...")
-        intent_data = nlu_service.parse_intent(transcription)
-        
-        logger.info(f"✓ Intent parsed: {intent_data['intent']} "
-                   f"(confidence: {intent_data['confidence']:.2f})")
+        intent_data, _ = await understand_and_execute(transcription, timer, execute=False)
 
-        duration_ms = int((time.time() - start_time) * 1000)
+        timings = timer.report()
 
         return {
             "transcription": transcription,
             "intent": intent_data,
             "success": True,
-            "duration_ms": duration_ms
+            "duration_ms": int(timings["total"]),
+            "timings_ms": timings
         }
 
     except HTTPException:
@@ -270,8 +347,6 @@ async def parse_intent(audio: UploadFile = File(...)):
             status_code=500,
             detail=f"Intent parsing failed: {str(e)}"
         )
-    finally:
-        cleanup_temp_file(temp_file_path)
 
 
 @router.post("/process")
@@ -293,8 +368,7 @@ async def process_voice_command(audio: UploadFile = File(...)):
             "success": true
         }
     """
-    start_time = time.time()
-    temp_file_path = None
+    timer = StageTimer()
     tts_service = None
     response_audio_path = None
 
@@ -304,42 +378,23 @@ async def process_voice_command(audio: UploadFile = File(...)):
         
         # Validate services
         validate_services()
-        validate_audio_file(audio)
-        
-        # Save audio
-        temp_file_path, content = await save_upload_file(audio)
-        
-        logger.info(f"Starting voice command processing, audio size: {len(content)} bytes")
         
         # Step 1: Transcribe
-        logger.info("Step 1/4: Transcribing audio...")
-        transcription = voice_service.transcribe(temp_file_path)
-        
-        if not transcription or transcription.strip() == "":
-            raise HTTPException(
-                status_code=400,
-                detail="Could not transcribe audio. Please try again."
-            )
-        
-        logger.info(f"✓ Transcribed: '{transcription}'")
-        
-        # Step 2: Parse intent
-        logger.info("Step 2/4: Parsing intent...")
-        intent_data = nlu_service.parse_intent(transcription)
-        logger.info(f"✓ Intent: {intent_data['intent']} "
-                   f"(confidence: {intent_data['confidence']:.2f})")
+        logger.info("Step 1/3: Transcribing audio...")
+        transcription, audio_size = await transcribe_audio_upload(audio, timer)
+        logger.info(f"Processing voice command, audio size: {audio_size} bytes")
         
-        # Step 3: Execute intent
-        logger.info("Step 3/4: Executing action...")
-        execution_result = nlu_service.execute_intent(intent_data)
-        logger.info(f"✓ Execution: {execution_result.get('action', 'unknown')}")
+        # Step 2: Parse intent and execute (dataset prefetch overlaps the parsing)
+        logger.info("Step 2/3: Parsing intent and executing action...")
+        intent_data, execution_result = await understand_and_execute(transcription, timer)
         
-        # Step 4: Generate voice response
-        logger.info("Step 4/4: Generating voice response...")
+        # Step 3: Generate voice response
+        logger.info("Step 3/3: Generating voice response...")
         response_text = execution_result.get('message', 'Operation completed.')
         
         # Convert response to speech
-        response_audio_path = tts_service.text_to_speech(response_text)
+        with timer.stage("tts"):
+            response_audio_path = await run_in_threadpool(tts_service.text_to_speech, response_text)
         
         # Read audio file and encode as base64 if successful
         response_audio_base64 = None
@@ -352,7 +407,8 @@ async def process_voice_command(audio: UploadFile = File(...)):
             except Exception as e:
                 logger.warning(f"Failed to encode response audio: {e}")
         
-        duration_ms = int((time.time() - start_time) * 1000)
+        timings = timer.report()
+        duration_ms = int(timings["total"])
         
         result = {
             "transcription": transcription,
@@ -362,6 +418,7 @@ async def process_voice_command(audio: UploadFile = File(...)):
             "response_audio": response_audio_base64,
             "success": True,
             "duration_ms": duration_ms,
+            "timings_ms": timings,
             "pipeline": {
                 "transcription_complete": True,
                 "intent_parsed": True,
@@ -370,7 +427,7 @@ async def process_voice_command(audio: UploadFile = File(...)):
             }
         }
         
-        logger.info(f"✓ Voice command processing complete ({duration_ms}ms)")
+        logger.info(f"✓ Voice command processing complete ({duration_ms}ms): {timings}")
         return result
         
     except HTTPException:
@@ -385,8 +442,7 @@ async def process_voice_command(audio: UploadFile = File(...)):
             detail=f"Voice command processing failed: {str(e)}"
         )
     finally:
-        # Cleanup temporary files
-        cleanup_temp_file(temp_file_path)
+        # Cleanup generated audio
         if response_audio_path and tts_service:
             tts_service.cleanup_audio_file(response_audio_path)
 
@@ -417,50 +473,30 @@ async def execute_voice_command(audio: UploadFile = File(...)):
             "success": true
         }
     """
-    start_time = time.time()
-    temp_file_path = None
+    timer = StageTimer()
 
     try:
         # Validate services
         validate_services()
-        validate_audio_file(audio)
-        
-        # Save audio
-        temp_file_path, content = await save_upload_file(audio)
-        
-        logger.info(f"Starting voice command execution, audio size: {len(content)} bytes")
         
         # Step 1: Transcribe
-        logger.info("Step 1/3: Transcribing audio...")
-        transcription = voice_service.transcribe(temp_file_path)
+        logger.info("Step 1/2: Transcribing audio...")
+        transcription, audio_size = await transcribe_audio_upload(audio, timer)
+        logger.info(f"Executing voice command, audio size: {audio_size} bytes")
         
-        if not transcription or transcription.strip() == "":
-            raise HTTPException(
-                status_code=400,
-                detail="Could not transcribe audio. Please try again."
-            )
-        
-        logger.info(f"✓ Transcribed: '{transcription}'")
-        
-        # Step 2: Parse intent
-        logger.info("Step 2/3: Parsing intent...")
-        intent_data = nlu_service.parse_intent(transcription)
-        logger.info(f"✓ Intent: {intent_data['intent']} "
-                   f"(confidence: {intent_data['confidence']:.2f})")
-        
-        # Step 3: Execute intent
-        logger.info("Step 3/3: Executing action...")
-        execution_result = nlu_service.execute_intent(intent_data)
-        logger.info(f"✓ Execution: {execution_result.get('action', 'unknown')}")
+        # Step 2: Parse intent and execute (dataset prefetch overlaps the parsing)
+        logger.info("Step 2/2: Parsing intent and executing action...")
+        intent_data, execution_result = await understand_and_execute(transcription, timer)
         
-        duration_ms = int((time.time() - start_time) * 1000)
+        timings = timer.report()
         
         return {
             "transcription": transcription,
             "intent": intent_data,
             "execution": execution_result,
             "success": True,
-            "duration_ms": duration_ms,
+            "duration_ms": int(timings["total"]),
+            "timings_ms": timings,
             "pipeline": {
                 "transcription_complete": True,
                 "intent_parsed": True,
@@ -479,8 +515,6 @@ async def execute_voice_command(audio: UploadFile = File(...)):
             status_code=500,
             detail=f"Voice command execution failed: {str(e)}"
         )
-    finally:
-        cleanup_temp_file(temp_file_path)
 
 
 @router.post("/process-text")
@@ -520,20 +554,16 @@ async def process_text_command(request: Request):
         
         logger.info(f"Processing text command: '{text}'")
         
-        # Parse intent
-        intent_data = nlu_service.parse_intent(text)
-        logger.info(f"✓ Intent: {intent_data['intent']} "
-                   f"(confidence: {intent_data['confidence']:.2f})")
-        
-        # Execute intent
-        execution_result = nlu_service.execute_intent(intent_data)
-        logger.info(f"✓ Execution: {execution_result.get('action', 'unknown')}")
+        # Parse intent and execute
+        timer = StageTimer()
+        intent_data, execution_result = await understand_and_execute(text, timer)
         
         return {
             "text": text,
             "intent": intent_data,
             "execution": execution_result,
-            "success": True
+            "success": True,
+            "timings_ms": timer.report()
         }
         
     except HTTPException:
@@ -563,21 +593,15 @@ async def quick_command(audio: UploadFile = File(...)):
             "success": true
         }
     """
-    temp_file_path = None
+    timer = StageTimer()
 
     try:
         validate_services()
-        validate_audio_file(audio)
         
-        # Save and transcribe
-        temp_file_path, _ = await save_upload_file(audio)
-        transcription = voice_service.transcribe(temp_file_path)
+        transcription, _ = await transcribe_audio_upload(audio, timer)
         
-        if not transcription:
-            raise HTTPException(status_code=400, detail="Transcription failed")
-        
-        # Process with NLU pipeline
-        result = nlu_service.process_voice_command(transcription)
+        # Parse and execute, prefetching dataset work alongside the parsing
+        intent_data, result = await understand_and_execute(transcription, timer)
         
         # Return simplified response
         return {
@@ -586,7 +610,8 @@ async def quick_command(audio: UploadFile = File(...)):
             "message": result.get('message', ''),
             "success": result.get('success', False),
             "needs_input": result.get('needs_input', False),
-            "suggestions": result.get('suggestions', [])
+            "suggestions": result.get('suggestions', []),
+            "timings_ms": timer.report()
         }
         
     except HTTPException:
@@ -594,8 +619,150 @@ async def quick_command(audio: UploadFile = File(...)):
     except Exception as e:
         logger.error(f"Quick command error: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.websocket("/stream")
+async def stream_voice_command(websocket: WebSocket):
+    """
+    Streaming voice commands over a WebSocket
+    
+    Send 16-bit mono PCM audio as binary frames while recording; speech is
+    segmented by voice activity detection and each segment is transcribed as
+    soon as it ends. Send {"type": "end"} to flush the last segment and close.
+    
+    Query params:
+        sample_rate: PCM sample rate, 8000-48000 (default VOICE_STREAM_SAMPLE_RATE)
+        execute: "false" to only parse intents
+        session_id: Session, for clients that can't set the X-Session-ID header
+    
+    Server messages (JSON):
+        {"type": "ready", "sample_rate", "transcriber"}
+        {"type": "speech_start", "segment"}
+        {"type": "partial", "segment", "text"}
+        {"type": "final", "segment", "text"}
+        {"type": "intent", "segment", "intent"}
+        {"type": "result", "segment", "execution", "timings_ms"}
+        {"type": "error", "segment", "message"}
+    """
+    session_id = (websocket.headers.get(SESSION_HEADER)
+                  or websocket.query_params.get("session_id") or DEFAULT_SESSION)
+    if not is_valid_session_id(session_id) or nlu_service is None:
+        await websocket.close(code=1008)
+        return
+    
+    try:
+        sample_rate = int(websocket.query_params.get("sample_rate", settings.VOICE_STREAM_SAMPLE_RATE))
+    except ValueError:
+        sample_rate = 0
+    if not MIN_STREAM_SAMPLE_RATE <= sample_rate <= MAX_STREAM_SAMPLE_RATE:
+        await websocket.close(code=1003)
+        return
+    execute = websocket.query_params.get("execute", "true").lower() != "false"
+    
+    token = set_session_id(session_id)
+    await websocket.accept()
+    await websocket.send_json({
+        "type": "ready",
+        "sample_rate": sample_rate,
+        "transcriber": segment_transcriber.backend
+    })
+    
+    segmenter = SpeechSegmenter(sample_rate)
+    segments: asyncio.Queue = asyncio.Queue()
+    segment_no = 0
+    partial_task: Optional[asyncio.Task] = None
+    partial_bytes = 0  # Segment length at the last partial transcript
+    
+    async def send_partial(number: int, pcm: bytes):
+        try:
+            text = await segment_transcriber.transcribe(pcm, sample_rate)
+            if text:
+                await websocket.send_json({"type": "partial", "segment": number, "text": text})
+        except Exception as e:
+            logger.warning(f"Partial transcription failed: {e}")
+    
+    async def process_segments():
+        # Segments are handled one at a time so commands run in the order spoken
+        while True:
+            item = await segments.get()
+            if item is None:
+                return
+            number, pcm, timer = item
+            try:
+                with timer.stage("transcription"):
+                    text = await segment_transcriber.transcribe(pcm, sample_rate)
+                if not text:
+                    continue
+                await websocket.send_json({"type": "final", "segment": number, "text": text})
+                
+                intent_data, _ = await understand_and_execute(text, timer, execute=False)
+                await websocket.send_json({"type": "intent", "segment": number, "intent": intent_data})
+                if execute:
+                    with timer.stage("execution"):
+                        execution_result = await run_in_threadpool(nlu_service.execute_intent, intent_data)
+                    await websocket.send_json({
+                        "type": "result",
+                        "segment": number,
+                        "execution": execution_result,
+                        "timings_ms": timer.report()
+                    })
+            except WebSocketDisconnect:
+                return
+            except Exception as e:
+                logger.error(f"Streaming segment {number} failed: {e}", exc_info=True)
+                await websocket.send_json({"type": "error", "segment": number, "message": str(e)})
+    
+    def finish_segment(pcm: bytes):
+        nonlocal partial_task
+        if partial_task is not None and not partial_task.done():
+            partial_task.cancel()
+        # Timings start at end of speech
+        segments.put_nowait((segment_no, pcm, StageTimer()))
+    
+    worker = asyncio.create_task(process_segments())
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            
+            if message.get("bytes"):
+                for event, pcm in segmenter.feed(message["bytes"]):
+                    if event == "start":
+                        segment_no += 1
+                        partial_bytes = 0
+                        await websocket.send_json({"type": "speech_start", "segment": segment_no})
+                    else:
+                        finish_segment(pcm)
+                
+                # Partials every VOICE_STREAM_PARTIAL_INTERVAL_MS of recorded speech, one at a time
+                interval_bytes = settings.VOICE_STREAM_PARTIAL_INTERVAL_MS * sample_rate * 2 // 1000
+                if (interval_bytes > 0 and segmenter.current_bytes - partial_bytes >= interval_bytes
+                        and (partial_task is None or partial_task.done())):
+                    partial_bytes = segmenter.current_bytes
+                    partial_task = asyncio.create_task(send_partial(segment_no, segmenter.current()))
+            
+            elif message.get("text"):
+                try:
+                    control = json.loads(message["text"])
+                except ValueError:
+                    control = {}
+                if control.get("type") in ("end", "stop"):
+                    pcm = segmenter.flush()
+                    if pcm:
+                        finish_segment(pcm)
+                    segments.put_nowait(None)
+                    await worker
+                    await websocket.close()
+                    break
+    except WebSocketDisconnect:
+        pass
     finally:
-        cleanup_temp_file(temp_file_path)
+        for task in (worker, partial_task):
+            if task is not None and not task.done():
+                task.cancel()
+        reset_session_id(token)
+        logger.info(f"Voice stream closed after {segment_no} segment(s)")
 
 
 @router.get("/supported-intents")
@@ -23,11 +23,16 @@ class Settings(BaseSettings):
     HOST: str = "0.0.0.0"
     PORT: int = 8000
     RELOAD: bool = True
+    WORKERS: int = 1  # Uvicorn worker processes; more than 1 turns on SHARED_STATE and disables reload
     
     # Groq API - Make it optional with default to avoid startup errors
     GROQ_API_KEY: str = ""
     WHISPER_MODEL: str = "whisper-large-v3"
     LLM_MODEL: str = "llama-3.3-70b-versatile"
+    GROQ_TIMEOUT: float = 30.0  # Seconds per request attempt
+    GROQ_MAX_RETRIES: int = 3  # Retries on connection errors, 429s and 5xx
+    GROQ_MAX_CONCURRENCY: int = 8  # In-flight LLM calls per process
+    GROQ_MAX_CONNECTIONS: int = 20  # Pooled HTTP connections
     
     # CORS - Allow Next.js frontend to make requests
     ALLOWED_ORIGINS: List[str] = [
@@ -44,11 +49,69 @@ class Settings(BaseSettings):
     DATA_CACHE_DIR: Path = BASE_DIR / "data_cache"
     MODEL_CACHE_DIR: Path = BASE_DIR / "model_cache"
     
+    # LLM prompt cache
+    PROMPT_CACHE_ENABLED: bool = True  # Reuse answers to repeated deterministic prompts
+    PROMPT_CACHE_PATH: Path = DATA_CACHE_DIR / "prompt_cache.sqlite3"
+    PROMPT_CACHE_TTL: int = 86400  # Seconds before a cached answer expires
+    PROMPT_CACHE_MAX_ENTRIES: int = 5000  # Least recently used entries are evicted beyond this
+    
     # ML Settings
     MAX_TRAINING_TIME: int = 300  # 5 minutes
+    MAX_RETAINED_JOBS: int = 5  # Jobs per session whose trainer stays in memory for predict/explain
+    MAX_RETAINED_JOBS_TOTAL: int = 20  # Retained jobs across all sessions of a worker process
+    KEEP_ALL_MODELS: bool = False  # Keep every trained estimator, not just the best
+    INFERENCE_BACKEND: str = "native"  # "native" or "onnx" (needs skl2onnx + onnxruntime)
+    ONNX_INTRA_OP_THREADS: int = 0  # 0 lets ONNX Runtime pick
+    AUTO_FEATURE_TIME_BUDGET: float = 30.0  # Seconds an automated feature search may take
+    AUTO_FEATURE_MEMORY_MB: int = 256  # Candidate features held at once during the search
+    AUTO_FEATURE_SAMPLE_ROWS: int = 20000  # Rows candidates are generated and screened on
+    SHAP_GLOBAL_MAX_ROWS: int = 2000  # Rows sampled for global SHAP importance
+    SHAP_TIME_BUDGET: float = 1.0  # Seconds before global SHAP stops adding rows
+    SHAP_PLOT_WORKERS: int = 1  # Processes rendering SHAP plots off-request
+    REPORT_CHART_WORKERS: int = 2  # Processes rendering EDA report charts
+    REPORT_KDE_SAMPLE: int = 5000  # Values a report histogram's KDE is fitted on
+    REPORT_CHART_CACHE_MAX_FILES: int = 500  # Rendered report charts kept in DATA_CACHE_DIR/charts
+    REPORT_WORKERS: int = 2  # Report jobs generated at once per process
+    REPORT_MAX_ARTIFACTS: int = 100  # Finished report PDFs kept in DATA_CACHE_DIR/reports
+    REPORT_TIMEOUT: float = 300.0  # Seconds GET /api/data/report waits for its job (0 = no limit)
+    
+    # Sessions (X-Session-ID header)
+    SESSION_MAX_MEMORY_MB: int = 1024  # Dataset + undo history per session (0 = unlimited)
+    SESSION_MAX_TOTAL_MB: int = 8192  # All in-memory sessions; LRU sessions spill to disk beyond it
+    SESSION_IDLE_SECONDS: int = 900  # Idle sessions are spilled to disk after this
+    SESSION_TTL_SECONDS: int = 86400  # Sessions are deleted after this long without requests
+    SESSION_STORE_URL: str = ""  # redis://host:6379/0 for shared session metadata, empty for local SQLite
+    
+    # Multi-worker state
+    SHARED_STATE: bool = False  # Share datasets and trained models between worker processes
+    SHARED_STATE_DIR: Path = BASE_DIR / "shared_state"  # Memory-mapped datasets and model registry
+    TRAINING_QUEUE: str = "local"  # "local" (in-process, bounded) or "celery" (needs CELERY_BROKER_URL)
+    TRAINING_CONCURRENCY: int = 1  # Training jobs run at once per worker process (API or Celery)
+    CELERY_BROKER_URL: str = ""  # e.g. redis://localhost:6379/1
+    CELERY_RESULT_BACKEND: str = ""  # Defaults to the broker URL
+    TRAINING_TIMEOUT: float = 3600.0  # Seconds to wait for a queued training job (0 = no limit)
+    
+    # Chat prompt context
+    CHAT_CONTEXT_TOKEN_BUDGET: int = 1200  # Approximate tokens of dataset description per turn
+    CHAT_HISTORY_RECENT_MESSAGES: int = 4  # Messages sent verbatim, older ones are summarized
+    CHAT_HISTORY_SUMMARY_TOKENS: int = 300  # Budget for the summary of older turns
+    
+    # Chat code sandbox
+    CODE_SANDBOX_WORKERS: int = 2  # Worker processes running generated code
+    CODE_SANDBOX_CPU_SECONDS: float = 30.0  # CPU time per snippet before it is interrupted
+    CODE_SANDBOX_TIMEOUT: float = 60.0  # Wall-clock seconds a snippet may run (time queued not counted)
+    CODE_SANDBOX_MEMORY_MB: int = 4096  # Address-space limit per worker (0 = unlimited)
     
     # Voice Settings
     VOICE_TIMEOUT: int = 30  # seconds
+    NLU_LOCAL_INTENT_ENABLED: bool = True  # Classify clear commands locally before asking the LLM
+    NLU_LOCAL_CONFIDENCE: float = 0.75  # Local confidence needed to skip the LLM
+    VOICE_STREAM_SAMPLE_RATE: int = 16000  # Default sample rate of streamed PCM audio
+    VOICE_STREAM_END_SILENCE_MS: int = 400  # Silence that ends a spoken segment
+    VOICE_STREAM_MAX_SEGMENT_SECONDS: float = 15.0  # Longer segments are cut and transcribed
+    VOICE_STREAM_PARTIAL_INTERVAL_MS: int = 1000  # How often to send partial transcripts (0 = never)
+    VOICE_STREAM_TRANSCRIBER: str = "groq"  # "groq" or "local" (needs faster-whisper)
+    VOICE_STREAM_LOCAL_MODEL: str = "base.en"  # faster-whisper model for the local transcriber
     TTS_ENGINE: str = "gtts"
     
     class Config:
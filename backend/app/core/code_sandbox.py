@@ -0,0 +1,396 @@
+"""
+Process-pool sandbox for executing generated analysis code
+Workers are pre-warmed with pandas/numpy/matplotlib, read the dataset from a
+memory-mapped Arrow snapshot and run each snippet under CPU, wall-clock and
+memory limits
+"""
+from app.config import settings
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from collections import OrderedDict
+from contextlib import redirect_stdout
+from io import StringIO, BytesIO
+from pathlib import Path
+from queue import Empty
+from typing import Optional, Tuple, Dict
+import multiprocessing
+import itertools
+import traceback
+import threading
+import warnings
+import logging
+import signal
+import base64
+import uuid
+import time
+import os
+
+import numpy as np
+import pandas as pd
+
+from app.utils.columnar import write_frame_file, read_frame_file
+
+try:
+    import resource
+    RESOURCE_AVAILABLE = True
+except ImportError:
+    RESOURCE_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Dataset snapshots kept on disk (one per recently active session dataset)
+MAX_SNAPSHOTS = 8
+# Seconds between checks on a running snippet
+POLL_SECONDS = 1.0
+# Seconds past its wall-clock limit a worker gets to stop a snippet itself before it is killed
+KILL_GRACE_SECONDS = 10.0
+
+
+class CodeTimeoutError(Exception):
+    """Raised when a snippet exceeds its CPU or wall-clock time"""
+
+
+# ---------------------------------------------------------------------------
+# Worker process side
+# ---------------------------------------------------------------------------
+
+_worker_frame = None  # (snapshot path, DataFrame) loaded by this worker
+_limits = (0.0, 0.0)  # CPU and wall-clock seconds allowed for the running snippet
+_started_queue = None  # Tells the API process which worker runs which task, and since when
+
+
+def _on_time_limit(signum, frame):
+    if signum == signal.SIGVTALRM:
+        raise CodeTimeoutError(f"Code exceeded the {_limits[0]}s CPU time limit")
+    raise CodeTimeoutError(f"Code timed out after {_limits[1]}s")
+
+
+def _init_worker(memory_limit_bytes: int, started_queue):
+    """Import the heavy libraries once and apply per-process limits"""
+    global _started_queue
+    _started_queue = started_queue
+
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot  # noqa: F401
+
+    # Copy-on-write makes the per-run shallow copy of df safe to mutate
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        try:
+            pd.set_option('mode.copy_on_write', True)
+        except Exception:
+            pass
+
+    if RESOURCE_AVAILABLE and memory_limit_bytes > 0:
+        try:
+            resource.setrlimit(resource.RLIMIT_AS, (memory_limit_bytes, memory_limit_bytes))
+        except (ValueError, OSError) as e:
+            logger.warning(f"Could not limit sandbox memory: {e}")
+
+    if hasattr(signal, 'setitimer'):
+        signal.signal(signal.SIGVTALRM, _on_time_limit)
+        signal.signal(signal.SIGALRM, _on_time_limit)
+
+
+def _warm_up() -> int:
+    """No-op task used to start workers ahead of the first request"""
+    return os.getpid()
+
+
+def _load_frame(path: str) -> pd.DataFrame:
+    """Load a dataset snapshot, reusing it while the dataset is unchanged"""
+    global _worker_frame
+    if _worker_frame is None or _worker_frame[0] != path:
+        _worker_frame = None
+        _worker_frame = (path, read_frame_file(path))
+    return _worker_frame[1]
+
+
+def _run_code(
+    code: str,
+    snapshot_path: str,
+    cpu_seconds: float,
+    wall_seconds: float,
+    task_id: int
+) -> Tuple[str, Optional[str]]:
+    """
+    Execute a snippet against the dataset and capture stdout and figures
+
+    The limits are timed here, from the moment the snippet starts, so time
+    spent queued behind other snippets doesn't count.
+    """
+    global _limits
+    import matplotlib.pyplot as plt
+
+    if _started_queue is not None:
+        _started_queue.put((task_id, os.getpid(), time.time()))
+
+    stdout = StringIO()
+    visualization = None
+    use_timer = hasattr(signal, 'setitimer')
+
+    try:
+        df = _load_frame(snapshot_path)
+
+        local_vars = {
+            'df': df.copy(deep=False),
+            'pd': pd,
+            'np': np,
+            'plt': plt,
+            'base64': base64,
+            'BytesIO': BytesIO,
+        }
+
+        if use_timer:
+            _limits = (cpu_seconds, wall_seconds)
+            if cpu_seconds > 0:
+                signal.setitimer(signal.ITIMER_VIRTUAL, cpu_seconds)
+            if wall_seconds > 0:
+                signal.setitimer(signal.ITIMER_REAL, wall_seconds)
+        try:
+            with redirect_stdout(stdout):
+                exec(code, {"__builtins__": __builtins__}, local_vars)
+        finally:
+            if use_timer:
+                signal.setitimer(signal.ITIMER_VIRTUAL, 0)
+                signal.setitimer(signal.ITIMER_REAL, 0)
+
+        output = stdout.getvalue()
+
+        # Check for plot data in output (legacy method)
+        if "PLOT:" in output:
+            for line in output.split('\n'):
+                if line.startswith("PLOT:"):
+                    visualization = "data:image/png;base64," + line[5:]
+                    output = output.replace(line, "[Visualization generated]")
+
+        # Auto-capture any open matplotlib figures
+        if visualization is None and plt.get_fignums():
+            buf = BytesIO()
+            plt.savefig(buf, format='png', dpi=150, bbox_inches='tight', facecolor='white', edgecolor='none')
+            buf.seek(0)
+            visualization = f"data:image/png;base64,{base64.b64encode(buf.read()).decode('utf-8')}"
+            buf.close()
+
+        return output.strip(), visualization
+
+    except Exception as e:
+        return f"Code execution error: {str(e)}\n{traceback.format_exc()}", None
+
+    finally:
+        plt.close('all')
+
+
+# ---------------------------------------------------------------------------
+# API process side
+# ---------------------------------------------------------------------------
+
+class CodeSandbox:
+    """
+    Runs generated code in a pool of worker processes
+
+    Each worker has its own stdout and matplotlib state, so snippets can run
+    concurrently. A snippet that exceeds its CPU or wall-clock time is
+    interrupted inside its worker. Only a worker that ignores that (stuck in
+    native code) is killed; snippets of other sessions lost with the pool
+    are resubmitted once to the new one.
+    """
+
+    def __init__(self):
+        self._executor = None
+        self._warming = []  # start-up futures of the current pool
+        self._started_queue = None  # (task id, worker pid, start time) from the workers
+        self._running: Dict[int, Tuple[int, float]] = {}  # task id -> (worker pid, start time)
+        self._task_ids = itertools.count()
+        self._lock = threading.Lock()
+        self._snapshots = OrderedDict()  # dataset key -> snapshot path
+        self._snapshot_refs: Dict[str, int] = {}  # snapshot path -> snippets using it
+        self._snapshot_dir = settings.DATA_CACHE_DIR / "sandbox"
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """Lazily start the worker pool and warm up every worker"""
+        with self._lock:
+            if self._executor is None:
+                context = multiprocessing.get_context('spawn')
+                self._started_queue = context.Queue()
+                self._running = {}
+                self._executor = ProcessPoolExecutor(
+                    max_workers=settings.CODE_SANDBOX_WORKERS,
+                    mp_context=context,
+                    initializer=_init_worker,
+                    initargs=(settings.CODE_SANDBOX_MEMORY_MB * 1024 * 1024, self._started_queue)
+                )
+                self._warming = [self._executor.submit(_warm_up) for _ in range(settings.CODE_SANDBOX_WORKERS)]
+            return self._executor
+
+    def _wait_until_warm(self):
+        """Block until a fresh pool has started, so start-up isn't charged to a snippet's timeout"""
+        for future in list(self._warming):
+            try:
+                future.result()
+            except Exception:
+                pass
+
+    def _restart(self, broken: Optional[ProcessPoolExecutor] = None):
+        """
+        Kill the workers so the next call gets a fresh pool
+
+        Args:
+            broken: Pool that failed; nothing happens if it was already replaced
+        """
+        with self._lock:
+            if broken is not None and self._executor is not broken:
+                return
+            executor, self._executor = self._executor, None
+            self._warming = []
+        if executor is None:
+            return
+        for process in list(getattr(executor, '_processes', {}).values()):
+            process.terminate()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _started(self, task_id: int) -> Optional[Tuple[int, float]]:
+        """Worker pid and start time of a task, once a worker has picked it up"""
+        with self._lock:
+            while self._started_queue is not None:
+                try:
+                    started_id, pid, started_at = self._started_queue.get_nowait()
+                except (Empty, OSError, ValueError):
+                    break
+                self._running[started_id] = (pid, started_at)
+            return self._running.get(task_id)
+
+    def _wait(self, future, task_id: int) -> Tuple[str, Optional[str]]:
+        """
+        Result of a submitted snippet
+
+        Raises:
+            CodeTimeoutError: The snippet ran KILL_GRACE_SECONDS past its
+                wall-clock limit and its worker was killed
+        """
+        while True:
+            try:
+                return future.result(timeout=POLL_SECONDS)
+            except FutureTimeoutError:
+                started = self._started(task_id)
+                if started is None or time.time() - started[1] < settings.CODE_SANDBOX_TIMEOUT + KILL_GRACE_SECONDS:
+                    continue
+                logger.warning(f"Sandboxed code ignored its time limit, killing worker {started[0]}")
+                try:
+                    os.kill(started[0], getattr(signal, 'SIGKILL', signal.SIGTERM))
+                except OSError:
+                    pass
+                raise CodeTimeoutError(f"timed out after {settings.CODE_SANDBOX_TIMEOUT}s")
+
+    def warm_up(self):
+        """Start the workers so the first chat request doesn't pay for imports"""
+        self._get_executor()
+
+    def _acquire_snapshot(self, df: pd.DataFrame, dataset_key: str) -> str:
+        """
+        Path of an on-disk snapshot of the dataset, written once per dataset key
+
+        Arrow IPC files are memory-mapped by the workers (see write_frame_file).
+        The file is written outside the lock so a large dataset doesn't stall
+        other sessions. The caller must hand the path to _release_snapshot.
+        """
+        with self._lock:
+            path = self._snapshots.get(dataset_key)
+            if path is not None and os.path.exists(path):
+                self._snapshots.move_to_end(dataset_key)
+                self._snapshot_refs[path] += 1
+                return path
+            if path is not None:
+                # Removed from disk behind our back; write it again
+                del self._snapshots[dataset_key]
+                if self._snapshot_refs[path] == 0:
+                    del self._snapshot_refs[path]
+
+        self._snapshot_dir.mkdir(parents=True, exist_ok=True)
+        base = self._snapshot_dir / f"dataset_{os.getpid()}_{dataset_key}_{uuid.uuid4().hex[:8]}"
+        written = write_frame_file(df, str(base))
+
+        with self._lock:
+            path = self._snapshots.get(dataset_key)
+            if path is None:
+                # First writer publishes its file
+                path = written
+                self._snapshots[dataset_key] = path
+                self._snapshot_refs[path] = 0
+                while len(self._snapshots) > MAX_SNAPSHOTS:
+                    _, old = self._snapshots.popitem(last=False)
+                    if self._snapshot_refs[old] == 0:
+                        del self._snapshot_refs[old]
+                        Path(old).unlink(missing_ok=True)
+            self._snapshots.move_to_end(dataset_key)
+            self._snapshot_refs[path] += 1
+        if written != path:
+            Path(written).unlink(missing_ok=True)
+        return path
+
+    def _release_snapshot(self, path: str):
+        """Drop a snippet's hold on a snapshot, removing it if it was evicted meanwhile"""
+        with self._lock:
+            if path not in self._snapshot_refs:
+                return
+            self._snapshot_refs[path] -= 1
+            if self._snapshot_refs[path] > 0 or path in self._snapshots.values():
+                return
+            del self._snapshot_refs[path]
+        Path(path).unlink(missing_ok=True)
+
+    def execute(self, code: str, df: pd.DataFrame, dataset_key: str) -> Tuple[str, Optional[str]]:
+        """
+        Execute code against a dataset in a worker process
+
+        Args:
+            code: Python source; `df`, `pd`, `np`, `plt`, `base64` and `BytesIO` are predefined
+            df: Dataset exposed as `df` (not modified)
+            dataset_key: Identifies this version of the dataset so the
+                snapshot is only written once per version
+
+        Returns:
+            Tuple of (captured output or error message, base64 PNG or None)
+        """
+        path = self._acquire_snapshot(df, dataset_key)
+        try:
+            return self._submit(code, path)
+        finally:
+            self._release_snapshot(path)
+
+    def _submit(self, code: str, path: str) -> Tuple[str, Optional[str]]:
+        """Run a snippet on a dataset snapshot, resubmitting once if another snippet broke the pool"""
+        for attempt in range(2):
+            executor = self._get_executor()
+            self._wait_until_warm()
+            task_id = next(self._task_ids)
+            try:
+                future = executor.submit(
+                    _run_code, code, path,
+                    settings.CODE_SANDBOX_CPU_SECONDS, settings.CODE_SANDBOX_TIMEOUT, task_id
+                )
+                return self._wait(future, task_id)
+            except CodeTimeoutError as e:
+                self._restart(executor)
+                return f"Code execution error: {e}", None
+            except BrokenProcessPool:
+                logger.error("Sandbox worker died (memory limit, crash or killed), restarting workers")
+                self._restart(executor)
+            finally:
+                with self._lock:
+                    self._running.pop(task_id, None)
+        return "Code execution error: the code crashed its worker process (likely out of memory)", None
+
+    def shutdown(self):
+        """Stop the workers and remove dataset snapshots (called on app shutdown)"""
+        self._restart()
+        with self._lock:
+            for path in self._snapshot_refs:
+                Path(path).unlink(missing_ok=True)
+            self._snapshots.clear()
+            self._snapshot_refs.clear()
+
+
+# Singleton instance
+code_sandbox = CodeSandbox()
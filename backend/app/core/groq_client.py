@@ -1,23 +1,107 @@
-from groq import Groq
+from groq import Groq, AsyncGroq, APIConnectionError, RateLimitError, InternalServerError
 from app.config import settings
-from typing import Optional, Dict, Any
+from tenacity import (
+    Retrying, AsyncRetrying, retry_if_exception_type,
+    stop_after_attempt, wait_random_exponential
+)
+from app.core.prompt_cache import PromptCache
+from contextlib import asynccontextmanager
+from typing import Optional, Dict, Any, AsyncIterator
+import asyncio
+import threading
 import logging
+import httpx
 
 # Setup logging to track API calls
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Transient failures worth retrying (connection errors include SDK timeouts)
+RETRYABLE_ERRORS = (APIConnectionError, RateLimitError, InternalServerError, TimeoutError)
+# Seconds between attempts of an async call waiting for a free concurrency slot
+SLOT_POLL_SECONDS = 0.02
+
 class GroqClient:
     """
     Centralized Groq API client
     Handles both Whisper (speech-to-text) and LLM calls
+    
+    chat_completion blocks and is meant for worker threads; async handlers
+    use achat_completion so an LLM round trip never blocks the event loop.
+    Both share the same pooling, retry and timeout policy, and draw on one
+    budget of GROQ_MAX_CONCURRENCY in-flight calls.
     """
     
     def __init__(self):
         """Initialize Groq client with API key from settings"""
-        self.client = Groq(api_key=settings.GROQ_API_KEY)
+        self.limits = httpx.Limits(
+            max_connections=settings.GROQ_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.GROQ_MAX_CONNECTIONS
+        )
+        # Retries are handled here with jittered backoff, not by the SDK
+        self.client = Groq(
+            api_key=settings.GROQ_API_KEY,
+            http_client=httpx.Client(limits=self.limits, timeout=settings.GROQ_TIMEOUT),
+            max_retries=0
+        )
+        # One budget for sync and async calls; async waiters poll it so the loop never blocks
+        self._slots = threading.BoundedSemaphore(settings.GROQ_MAX_CONCURRENCY)
+        
+        # Async client is bound to the event loop that created it
+        self._async_client = None
+        self._async_loop = None
+        
+        self.prompt_cache = None
+        if settings.PROMPT_CACHE_ENABLED:
+            try:
+                self.prompt_cache = PromptCache(
+                    settings.PROMPT_CACHE_PATH,
+                    ttl_seconds=settings.PROMPT_CACHE_TTL,
+                    max_entries=settings.PROMPT_CACHE_MAX_ENTRIES
+                )
+            except Exception as e:
+                logger.warning(f"Prompt cache disabled: {e}")
         logger.info("Groq client initialized successfully")
     
+    def _get_async_client(self):
+        """Get the pooled async client for the running event loop"""
+        loop = asyncio.get_running_loop()
+        if self._async_loop is not loop:
+            self._async_client = AsyncGroq(
+                api_key=settings.GROQ_API_KEY,
+                http_client=httpx.AsyncClient(limits=self.limits, timeout=settings.GROQ_TIMEOUT),
+                max_retries=0
+            )
+            self._async_loop = loop
+        return self._async_client
+    
+    @asynccontextmanager
+    async def _async_slot(self):
+        """Hold one of the shared concurrency slots without blocking the event loop"""
+        while not self._slots.acquire(blocking=False):
+            await asyncio.sleep(SLOT_POLL_SECONDS)
+        try:
+            yield
+        finally:
+            self._slots.release()
+    
+    @staticmethod
+    def _retry_policy() -> Dict[str, Any]:
+        """Shared tenacity settings: exponential backoff with full jitter"""
+        return {
+            'retry': retry_if_exception_type(RETRYABLE_ERRORS),
+            'stop': stop_after_attempt(settings.GROQ_MAX_RETRIES + 1),
+            'wait': wait_random_exponential(multiplier=0.5, max=8),
+            'reraise': True,
+        }
+    
+    async def aclose(self):
+        """Close the pooled async connections (called on app shutdown)"""
+        if self._async_client is not None:
+            await self._async_client.close()
+            self._async_client = None
+            self._async_loop = None
+    
     def transcribe_audio(self, audio_file_path: str) -> Optional[str]:
         """
         Transcribe audio file to text using Whisper
@@ -49,12 +133,93 @@ class GroqClient:
             logger.error(f"Transcription failed: {str(e)}")
             return None
     
+    async def atranscribe_audio(self, audio_data: bytes, filename: str, model: Optional[str] = None) -> str:
+        """
+        Transcribe in-memory audio with Whisper on the pooled async client
+        
+        Args:
+            audio_data: Encoded audio (webm, wav, mp3, ...)
+            filename: Name whose extension tells the API the audio format
+            model: Whisper model (defaults to settings.WHISPER_MODEL)
+        
+        Returns:
+            Transcribed text
+        
+        Raises:
+            Exception: The request failed after retries
+        """
+        client = self._get_async_client()
+        async with self._async_slot():
+            async for attempt in AsyncRetrying(**self._retry_policy()):
+                with attempt:
+                    transcription = await asyncio.wait_for(
+                        client.audio.transcriptions.create(
+                            file=(filename, audio_data),
+                            model=model or settings.WHISPER_MODEL,
+                            response_format="text",
+                            language="en",
+                            temperature=0.0
+                        ),
+                        settings.GROQ_TIMEOUT
+                    )
+        
+        # The text response format comes back as a plain string
+        text = getattr(transcription, 'text', transcription)
+        return str(text).strip()
+    
+    def _completion_kwargs(
+        self,
+        messages: list[Dict[str, str]],
+        model: Optional[str],
+        temperature: float,
+        max_tokens: int
+    ) -> Dict[str, Any]:
+        """Request parameters shared by the sync and async paths"""
+        return {
+            'model': model or settings.LLM_MODEL,
+            'messages': messages,
+            'temperature': temperature,
+            'max_tokens': max_tokens,
+            'top_p': 1,
+            'stream': False,
+            'timeout': settings.GROQ_TIMEOUT,
+        }
+    
+    def _cache_keys(self, kwargs: Dict[str, Any], fuzzy_text: Optional[str]):
+        """Exact key and (for fuzzy lookups) template scope of a request"""
+        params = (kwargs['messages'], kwargs['model'], kwargs['temperature'], kwargs['max_tokens'])
+        key = PromptCache.make_key(*params)
+        scope = PromptCache.make_scope(*params, fuzzy_text) if fuzzy_text else None
+        return key, scope
+    
+    def _cache_get(self, kwargs: Dict[str, Any], fuzzy_text: Optional[str]) -> Optional[str]:
+        """Cached response for a request, if any"""
+        try:
+            key, scope = self._cache_keys(kwargs, fuzzy_text)
+            content = self.prompt_cache.get(key, scope=scope, fuzzy_text=fuzzy_text)
+        except Exception as e:
+            logger.warning(f"Prompt cache lookup failed: {e}")
+            return None
+        if content is not None:
+            logger.info(f"LLM response (cached): {content[:100]}...")
+        return content
+    
+    def _cache_set(self, kwargs: Dict[str, Any], fuzzy_text: Optional[str], content: str):
+        """Store a successful response"""
+        try:
+            key, scope = self._cache_keys(kwargs, fuzzy_text)
+            self.prompt_cache.set(key, kwargs['model'], content, scope=scope, fuzzy_text=fuzzy_text)
+        except Exception as e:
+            logger.warning(f"Prompt cache write failed: {e}")
+    
     def chat_completion(
         self, 
         messages: list[Dict[str, str]], 
         model: Optional[str] = None,
         temperature: float = 0.7,
-        max_tokens: int = 1024
+        max_tokens: int = 1024,
+        cache: bool = False,
+        fuzzy_text: Optional[str] = None
     ) -> Optional[str]:
         """
         Send chat completion request to Groq LLM
@@ -64,28 +229,121 @@ class GroqClient:
             model: Model to use (defaults to settings.LLM_MODEL)
             temperature: Randomness (0.0 = deterministic, 1.0 = creative)
             max_tokens: Maximum response length
+            cache: Serve repeated prompts from the prompt cache (only for
+                prompts whose answer depends on nothing but the prompt)
+            fuzzy_text: User text embedded in the prompt; when set, prompts
+                from the same template whose text differs only in case,
+                punctuation and filler words share a cached answer
             
         Returns:
             LLM response text or None if error
         """
+        kwargs = self._completion_kwargs(messages, model, temperature, max_tokens)
+        use_cache = cache and self.prompt_cache is not None
+        if use_cache:
+            cached = self._cache_get(kwargs, fuzzy_text)
+            if cached is not None:
+                return cached
         try:
-            response = self.client.chat.completions.create(
-                model=model or settings.LLM_MODEL,
-                messages=messages,
-                temperature=temperature,
-                max_tokens=max_tokens,
-                top_p=1,
-                stream=False
-            )
+            with self._slots:
+                for attempt in Retrying(**self._retry_policy()):
+                    with attempt:
+                        response = self.client.chat.completions.create(**kwargs)
+            
+            content = response.choices[0].message.content
+            logger.info(f"LLM response: {content[:100]}...")
+            if use_cache and content:
+                self._cache_set(kwargs, fuzzy_text, content)
+            return content
+            
+        except Exception as e:
+            logger.error(f"LLM request failed: {str(e) or type(e).__name__}")
+            return None
+    
+    async def achat_completion(
+        self, 
+        messages: list[Dict[str, str]], 
+        model: Optional[str] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 1024,
+        cache: bool = False,
+        fuzzy_text: Optional[str] = None
+    ) -> Optional[str]:
+        """
+        Async version of chat_completion for use inside async handlers
+        
+        Prompt cache reads and writes (SQLite) run in a worker thread.
+        
+        Returns:
+            LLM response text or None if error
+        """
+        kwargs = self._completion_kwargs(messages, model, temperature, max_tokens)
+        use_cache = cache and self.prompt_cache is not None
+        if use_cache:
+            cached = await asyncio.to_thread(self._cache_get, kwargs, fuzzy_text)
+            if cached is not None:
+                return cached
+        try:
+            client = self._get_async_client()
+            async with self._async_slot():
+                async for attempt in AsyncRetrying(**self._retry_policy()):
+                    with attempt:
+                        # Hard per-attempt deadline, even if the server keeps the socket alive
+                        response = await asyncio.wait_for(
+                            client.chat.completions.create(**kwargs), settings.GROQ_TIMEOUT
+                        )
             
             content = response.choices[0].message.content
             logger.info(f"LLM response: {content[:100]}...")
+            if use_cache and content:
+                await asyncio.to_thread(self._cache_set, kwargs, fuzzy_text, content)
             return content
             
         except Exception as e:
-            logger.error(f"LLM request failed: {str(e)}")
+            logger.error(f"LLM request failed: {str(e) or type(e).__name__}")
             return None
     
+    async def astream_chat_completion(
+        self,
+        messages: list[Dict[str, str]],
+        model: Optional[str] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 1024
+    ) -> AsyncIterator[str]:
+        """
+        Stream a chat completion token by token
+        
+        Opening the stream is retried like achat_completion; once tokens are
+        flowing a failure can't be replayed, so it is raised to the caller.
+        Each chunk must arrive within GROQ_TIMEOUT seconds.
+        
+        Yields:
+            Text deltas as the model generates them
+        """
+        kwargs = self._completion_kwargs(messages, model, temperature, max_tokens)
+        kwargs['stream'] = True
+        client = self._get_async_client()
+        async with self._async_slot():
+            async for attempt in AsyncRetrying(**self._retry_policy()):
+                with attempt:
+                    stream = await asyncio.wait_for(
+                        client.chat.completions.create(**kwargs), settings.GROQ_TIMEOUT
+                    )
+            
+            chunks = stream.__aiter__()
+            try:
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(chunks.__anext__(), settings.GROQ_TIMEOUT)
+                    except StopAsyncIteration:
+                        break
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+            finally:
+                close = getattr(stream, 'close', None)
+                if close is not None:
+                    await close()
+    
     def parse_intent(self, user_text: str) -> Dict[str, Any]:
         """
         Parse user intent from transcribed text
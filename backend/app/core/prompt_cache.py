@@ -0,0 +1,180 @@
+"""
+On-disk prompt -> response cache for LLM calls
+SQLite backed with TTL expiry, LRU eviction and optional fuzzy matching
+"""
+from typing import Optional, List, Dict, Any
+from pathlib import Path
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+FUZZY_PLACEHOLDER = "<<user_text>>"
+
+
+def normalize_prompt(text: str) -> str:
+    """Collapse whitespace so indentation changes don't miss the cache"""
+    return re.sub(r"\s+", " ", text).strip()
+
+
+# Words dropped from user text before fuzzy comparison
+FILLER_WORDS = frozenset({
+    "a", "an", "the", "please", "can", "could", "would", "you", "i", "me", "my",
+    "want", "like", "let", "lets", "just", "now", "hey", "ok", "okay", "um", "uh",
+})
+
+
+def normalize_utterance(text: str) -> str:
+    """
+    User text reduced for fuzzy comparison: lowercase, no punctuation, no filler words
+
+    Every other word is kept verbatim, so utterances naming different columns
+    or values ("age" / "wage", "sales_2023" / "sales_2024") never match.
+    """
+    words = re.sub(r"[^\w\s]", " ", text.lower()).split()
+    return " ".join(w for w in words if w not in FILLER_WORDS)
+
+
+class PromptCache:
+    """
+    Prompt-response cache keyed by model, normalized prompt hash and sampling
+    parameters. Fuzzy lookups only match entries built from the same prompt
+    template whose user text differs just in case, punctuation and filler words.
+    """
+
+    def __init__(self, path: Path, ttl_seconds: int, max_entries: int):
+        self.path = Path(path)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS prompt_cache (
+                key TEXT PRIMARY KEY,
+                scope TEXT,
+                fuzzy_text TEXT,
+                model TEXT NOT NULL,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_prompt_cache_access ON prompt_cache(last_access)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_prompt_cache_scope ON prompt_cache(scope, last_access)")
+        self._conn.commit()
+        logger.info(f"Prompt cache at {self.path} (ttl={ttl_seconds}s, max={max_entries})")
+
+    @staticmethod
+    def make_key(messages: List[Dict[str, str]], model: str, temperature: float, max_tokens: int) -> str:
+        """Hash of the request parameters that determine the response"""
+        payload = {
+            'model': model,
+            'temperature': round(float(temperature), 3),
+            'max_tokens': max_tokens,
+            'messages': [
+                {'role': m.get('role'), 'content': normalize_prompt(m.get('content') or '')}
+                for m in messages
+            ],
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+    @classmethod
+    def make_scope(cls, messages: List[Dict[str, str]], model: str, temperature: float,
+                   max_tokens: int, fuzzy_text: str) -> str:
+        """Key of the prompt template: the prompt with the user's text blanked out"""
+        templated = [
+            {'role': m.get('role'), 'content': (m.get('content') or '').replace(fuzzy_text, FUZZY_PLACEHOLDER)}
+            for m in messages
+        ]
+        return cls.make_key(templated, model, temperature, max_tokens)
+
+    def get(self, key: str, scope: Optional[str] = None, fuzzy_text: Optional[str] = None) -> Optional[str]:
+        """
+        Look up a cached response
+
+        Args:
+            key: Exact request key from make_key
+            scope: Template key from make_scope, enables fuzzy matching
+            fuzzy_text: User text to compare against entries in the same scope
+
+        Returns:
+            Cached response or None
+        """
+        now = time.time()
+        oldest = now - self.ttl_seconds
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT key, response FROM prompt_cache WHERE key = ? AND created_at > ?",
+                (key, oldest)
+            ).fetchone()
+
+            if row is None and scope and fuzzy_text:
+                row = self._fuzzy_lookup(scope, normalize_utterance(fuzzy_text), oldest)
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            self._conn.execute(
+                "UPDATE prompt_cache SET last_access = ?, hits = hits + 1 WHERE key = ?",
+                (now, row[0])
+            )
+            self._conn.commit()
+            self.hits += 1
+            return row[1]
+
+    def _fuzzy_lookup(self, scope: str, utterance: str, oldest: float) -> Optional[tuple]:
+        """Most recent entry in a scope with the same normalized user text"""
+        if not utterance:
+            return None
+        row = self._conn.execute(
+            "SELECT key, response FROM prompt_cache "
+            "WHERE scope = ? AND fuzzy_text = ? AND created_at > ? ORDER BY last_access DESC LIMIT 1",
+            (scope, utterance, oldest)
+        ).fetchone()
+        if row:
+            logger.info(f"Prompt cache fuzzy hit for '{utterance}'")
+        return row
+
+    def set(self, key: str, model: str, response: str, scope: Optional[str] = None,
+            fuzzy_text: Optional[str] = None):
+        """Store a response and evict expired / least recently used entries"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO prompt_cache "
+                "(key, scope, fuzzy_text, model, response, created_at, last_access, hits) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, 0)",
+                (key, scope, normalize_utterance(fuzzy_text) if fuzzy_text else None, model, response, now, now)
+            )
+            self._conn.execute("DELETE FROM prompt_cache WHERE created_at <= ?", (now - self.ttl_seconds,))
+            self._conn.execute(
+                "DELETE FROM prompt_cache WHERE key IN ("
+                "SELECT key FROM prompt_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            self._conn.commit()
+
+    def clear(self):
+        """Drop every cached response"""
+        with self._lock:
+            self._conn.execute("DELETE FROM prompt_cache")
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """Entry count and hit/miss counters since startup"""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM prompt_cache").fetchone()[0]
+        return {'entries': entries, 'hits': self.hits, 'misses': self.misses}
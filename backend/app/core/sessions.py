@@ -0,0 +1,502 @@
+"""
+Per-session state for concurrent users
+Each request is bound to a session through the X-Session-ID header; datasets,
+undo history and chat state live in that session instead of process globals.
+Idle sessions are spilled to disk and session metadata is kept in a store
+(local SQLite, or Redis when SESSION_STORE_URL points at one). With shared
+state on, datasets are published through the store so every worker process
+sees the same session.
+"""
+from app.config import settings
+from app.core.shared_state import shared_state_enabled, dataset_store
+from collections import OrderedDict
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Callable
+import hashlib
+import json
+import logging
+import pickle
+import re
+import sqlite3
+import threading
+import time
+import uuid
+
+import pandas as pd
+
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+SESSION_HEADER = "X-Session-ID"
+DEFAULT_SESSION = "default"
+SESSION_ID_PATTERN = re.compile(r'^[A-Za-z0-9_.-]{1,64}$')
+# Seconds between idle/memory sweeps (run on a background thread)
+SWEEP_INTERVAL = 30
+# Seconds between last-access updates in a shared store
+TOUCH_INTERVAL = 60
+# Seconds before a long-lived binding (websocket) checks the shared store again
+SYNC_INTERVAL = 5
+
+_current_session_id: ContextVar[str] = ContextVar('session_id', default=DEFAULT_SESSION)
+# Per binding (request, websocket, task): session id -> when it was last synced with the
+# shared store. A dict, so threadpool calls made with a copy of the context share it.
+_synced_at: ContextVar[Optional[Dict[str, float]]] = ContextVar('session_synced_at', default=None)
+
+
+def get_session_id() -> str:
+    """Session id of the current request (DEFAULT_SESSION outside requests)"""
+    return _current_session_id.get()
+
+
+def set_session_id(session_id: str):
+    """Bind the current context to a session, returns a token for reset_session_id"""
+    return _current_session_id.set(session_id), _synced_at.set({})
+
+
+def reset_session_id(token):
+    """Undo set_session_id"""
+    session_token, synced_token = token
+    _synced_at.reset(synced_token)
+    _current_session_id.reset(session_token)
+
+
+def _claim_sync(session_id: str) -> bool:
+    """Whether this binding should read the shared store for a session now"""
+    synced = _synced_at.get()
+    if synced is None:
+        # Outside any binding (scripts, start-up): nothing to deduplicate against
+        return True
+    now = time.time()
+    if now - synced.get(session_id, 0.0) < SYNC_INTERVAL:
+        return False
+    synced[session_id] = now
+    return True
+
+
+def is_valid_session_id(session_id: str) -> bool:
+    """Session ids are short tokens safe to use in keys and log lines"""
+    return bool(SESSION_ID_PATTERN.match(session_id))
+
+
+class SessionQuotaError(ValueError):
+    """A dataset does not fit in the session memory quota"""
+
+
+class SessionState:
+    """Everything one user's session holds in memory"""
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.created_at = time.time()
+        self.last_access = self.created_at
+
+        # DataService view of the dataset
+        self.dataframe: Optional[pd.DataFrame] = None
+        self.filename: Optional[str] = None
+        self.version = 0
+
+        # Data router view: current df, info and undo/redo stacks of (df, info)
+        self.dataset: Dict[str, Any] = {"df": None, "info": None, "history": [], "future": []}
+
+        # Small per-service state (chat history, caches); never spilled
+        self.services: Dict[str, Any] = {}
+
+        self.spill_path: Optional[Path] = None
+        self.dataset_path: Optional[str] = None  # Published copy when state is shared
+        self.saved_at = 0.0
+        self._frame_bytes: Dict[int, int] = {}
+
+    def service_state(self, name: str, factory: Callable[[], Any]) -> Any:
+        """Get (creating on first use) a piece of per-service state"""
+        if name not in self.services:
+            self.services[name] = factory()
+        return self.services[name]
+
+    def frames(self) -> List[pd.DataFrame]:
+        """Distinct DataFrames held by the session"""
+        candidates = [self.dataframe, self.dataset["df"]]
+        candidates += [df for df, _ in self.dataset["history"]]
+        candidates += [df for df, _ in self.dataset["future"]]
+        seen, frames = set(), []
+        for df in candidates:
+            if df is not None and id(df) not in seen:
+                seen.add(id(df))
+                frames.append(df)
+        return frames
+
+    def memory_bytes(self) -> int:
+        """Memory held by the session's DataFrames (deep sizes, cached per frame)"""
+        frames = self.frames()
+        live = {id(df) for df in frames}
+        self._frame_bytes = {k: v for k, v in self._frame_bytes.items() if k in live}
+        total = 0
+        for df in frames:
+            if id(df) not in self._frame_bytes:
+                self._frame_bytes[id(df)] = frame_bytes(df)
+            total += self._frame_bytes[id(df)]
+        return total
+
+    def metadata(self) -> Dict[str, Any]:
+        """JSON-safe summary for the metadata store"""
+        df = self.dataframe if self.dataframe is not None else self.dataset["df"]
+        return {
+            'session_id': self.session_id,
+            'filename': self.filename,
+            'shape': list(df.shape) if df is not None else None,
+            'version': self.version,
+            'created_at': self.created_at,
+            'last_access': self.last_access,
+            'spilled': self.spill_path is not None,
+            'memory_bytes': 0 if self.spill_path is not None else self.memory_bytes(),
+            'dataset_path': self.dataset_path,
+            'info': self.dataset["info"],
+        }
+
+
+def frame_bytes(df: pd.DataFrame) -> int:
+    """Deep memory usage of a DataFrame"""
+    return int(df.memory_usage(deep=True).sum())
+
+
+class LocalMetadataStore:
+    """Session metadata in a SQLite file (single host stand-in for Redis)"""
+
+    def __init__(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions (session_id TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def set(self, session_id: str, data: Dict[str, Any]):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sessions (session_id, data, updated_at) VALUES (?, ?, ?)",
+                (session_id, json.dumps(data, default=str), time.time())
+            )
+            self._conn.commit()
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+            self._conn.commit()
+
+
+class RedisMetadataStore:
+    """Session metadata in Redis, shared by every backend instance"""
+
+    PREFIX = "intelliml:session:"
+
+    def __init__(self, url: str):
+        self._client = redis.Redis.from_url(url, decode_responses=True)
+        self._client.ping()
+
+    def set(self, session_id: str, data: Dict[str, Any]):
+        self._client.set(self.PREFIX + session_id, json.dumps(data, default=str), ex=settings.SESSION_TTL_SECONDS)
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        raw = self._client.get(self.PREFIX + session_id)
+        return json.loads(raw) if raw else None
+
+    def delete(self, session_id: str):
+        self._client.delete(self.PREFIX + session_id)
+
+
+def create_metadata_store():
+    """Redis store when configured and reachable, local SQLite otherwise"""
+    url = settings.SESSION_STORE_URL
+    if url.startswith(("redis://", "rediss://")):
+        if not REDIS_AVAILABLE:
+            logger.warning("SESSION_STORE_URL points at Redis but redis is not installed, using local store")
+        else:
+            try:
+                return RedisMetadataStore(url)
+            except Exception as e:
+                logger.warning(f"Redis session store unavailable ({e}), using local store")
+    return LocalMetadataStore(settings.DATA_CACHE_DIR / "sessions.sqlite3")
+
+
+class SessionManager:
+    """
+    Holds live sessions, enforces per-session quotas and spills idle or
+    least recently used sessions to disk when memory runs short
+    """
+
+    def __init__(self):
+        self._sessions: "OrderedDict[str, SessionState]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._sweeper: Optional[threading.Thread] = None
+        self._stop_sweeper = threading.Event()
+        self._store = None
+        self.spill_dir = settings.DATA_CACHE_DIR / "sessions"
+
+    @property
+    def store(self):
+        """Metadata store, created on first use"""
+        if self._store is None:
+            self._store = create_metadata_store()
+        return self._store
+
+    def current(self) -> SessionState:
+        """State of the session bound to the current request"""
+        return self.get(get_session_id())
+
+    def get(self, session_id: str) -> SessionState:
+        """Get a session, creating it or restoring it from disk as needed"""
+        with self._lock:
+            state = self._sessions.get(session_id)
+            if state is None:
+                state = SessionState(session_id)
+                self._sessions[session_id] = state
+                self._restore_spilled(state)
+            elif state.spill_path is not None:
+                self._restore_spilled(state)
+            self._sessions.move_to_end(session_id)
+            state.last_access = time.time()
+            if self._sweeper is None:
+                self._start_sweeper()
+
+        # Once per request rather than on every current() call
+        if shared_state_enabled() and _claim_sync(session_id):
+            self._sync_shared(state)
+        return state
+
+    def _start_sweeper(self):
+        """Run sweep() every SWEEP_INTERVAL seconds on a daemon thread, off the request path"""
+        def loop():
+            while not self._stop_sweeper.wait(SWEEP_INTERVAL):
+                try:
+                    self.sweep()
+                except Exception as e:
+                    logger.warning(f"Session sweep failed: {e}")
+
+        self._sweeper = threading.Thread(target=loop, name="session-sweeper", daemon=True)
+        self._sweeper.start()
+
+    def shutdown(self):
+        """Stop the background sweeper (called on app shutdown)"""
+        self._stop_sweeper.set()
+
+    def save_metadata(self, state: SessionState):
+        """Publish a session's metadata to the store"""
+        try:
+            self.store.set(state.session_id, state.metadata())
+            state.saved_at = time.time()
+        except Exception as e:
+            logger.warning(f"Could not save metadata for session {state.session_id}: {e}")
+
+    def publish(self, state: SessionState):
+        """Make a session's new dataset visible to other workers (metadata only when not shared)"""
+        if shared_state_enabled() and state.dataframe is not None:
+            state.dataset_path = dataset_store.publish(state.session_id, state.version, state.dataframe)
+        self.save_metadata(state)
+
+    def _sync_shared(self, state: SessionState):
+        """Pick up a dataset another worker published for this session"""
+        try:
+            record = self.store.get(state.session_id)
+        except Exception as e:
+            logger.warning(f"Could not read metadata for session {state.session_id}: {e}")
+            return
+
+        if record is None:
+            # Only a session this worker already published can have been ended elsewhere
+            if state.saved_at:
+                logger.info(f"Session {state.session_id} was ended elsewhere, clearing it")
+                state.__init__(state.session_id)
+            return
+
+        path = record.get('dataset_path')
+        if record.get('version', 0) > state.version and path:
+            df = dataset_store.load(path)
+            state.dataframe = df
+            state.filename = record.get('filename')
+            state.version = record['version']
+            state.dataset_path = path
+            # Undo history stays with the worker that recorded it
+            state.dataset = {"df": df, "info": record.get('info'), "history": [], "future": []}
+            state.saved_at = time.time()
+            logger.info(f"Loaded session {state.session_id} dataset v{state.version} from shared store")
+        elif time.time() - state.saved_at > TOUCH_INTERVAL:
+            self.save_metadata(state)
+
+    def enforce_quota(self, state: SessionState, df: pd.DataFrame):
+        """
+        Make room for a new dataset in a session
+
+        Drops redo then the oldest undo snapshots while the session is over
+        SESSION_MAX_MEMORY_MB; raises SessionQuotaError if the dataset alone is too big
+        """
+        quota = settings.SESSION_MAX_MEMORY_MB * 1024 * 1024
+        if quota <= 0:
+            return
+        if frame_bytes(df) > quota:
+            raise SessionQuotaError(
+                f"Dataset uses more than the {settings.SESSION_MAX_MEMORY_MB} MB session memory limit"
+            )
+        dataset = state.dataset
+        while state.memory_bytes() > quota and (dataset["future"] or dataset["history"]):
+            if dataset["future"]:
+                dataset["future"].pop(0)
+            else:
+                dataset["history"].pop(0)
+            logger.info(f"Session {state.session_id} over quota, dropped an undo snapshot")
+
+    def _spill_file(self, session_id: str) -> Path:
+        return self.spill_dir / f"{hashlib.sha1(session_id.encode()).hexdigest()}.pkl"
+
+    def _spill(self, state: SessionState) -> bool:
+        """
+        Move a session's DataFrames to disk
+
+        The pickle is written outside the lock; it is discarded if the session
+        was used in the meantime. Returns whether the session was spilled.
+        """
+        with self._lock:
+            if state.spill_path is not None or not state.frames():
+                return False
+            accessed = state.last_access
+            dataset = state.dataset
+            saved = {
+                'dataframe': state.dataframe,
+                'filename': state.filename,
+                'version': state.version,
+                'dataset': {**dataset, "history": list(dataset["history"]), "future": list(dataset["future"])},
+            }
+
+        self.spill_dir.mkdir(parents=True, exist_ok=True)
+        path = self._spill_file(state.session_id)
+        tmp_path = path.with_name(f"{path.stem}.{uuid.uuid4().hex}.tmp")
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(saved, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+        with self._lock:
+            if self._sessions.get(state.session_id) is not state or state.last_access != accessed:
+                tmp_path.unlink(missing_ok=True)
+                return False
+            tmp_path.replace(path)
+            state.dataframe = None
+            state.dataset = {"df": None, "info": state.dataset["info"], "history": [], "future": []}
+            state.spill_path = path
+            state._frame_bytes = {}
+        self.save_metadata(state)
+        logger.info(f"Spilled idle session {state.session_id} to disk")
+        return True
+
+    def _restore_spilled(self, state: SessionState):
+        """Load a session's DataFrames back from disk, if it was spilled"""
+        path = state.spill_path or self._spill_file(state.session_id)
+        if not path.exists():
+            state.spill_path = None
+            return
+        with open(path, 'rb') as f:
+            saved = pickle.load(f)
+        state.dataframe = saved['dataframe']
+        state.filename = saved['filename']
+        state.version = saved['version']
+        state.dataset = saved['dataset']
+        state.spill_path = None
+        path.unlink(missing_ok=True)
+        logger.info(f"Restored session {state.session_id} from disk")
+
+    def sweep(self):
+        """
+        Spill idle sessions, then least recently used ones while over SESSION_MAX_TOTAL_MB
+
+        Only picking the sessions holds the lock; store reads and spill writes happen outside it.
+        """
+        now = time.time()
+        with self._lock:
+            expired = [
+                session_id for session_id, state in self._sessions.items()
+                if now - state.last_access > settings.SESSION_TTL_SECONDS
+            ]
+            idle = [
+                state for session_id, state in self._sessions.items()
+                if session_id not in expired and now - state.last_access > settings.SESSION_IDLE_SECONDS
+            ]
+
+        for session_id in expired:
+            everywhere = self._expired_everywhere(session_id, now)
+            with self._lock:
+                state = self._sessions.get(session_id)
+                if state is not None and now - state.last_access > settings.SESSION_TTL_SECONDS:
+                    self._forget(session_id, everywhere=everywhere)
+        for state in idle:
+            self._spill(state)
+
+        limit = settings.SESSION_MAX_TOTAL_MB * 1024 * 1024
+        if limit <= 0:
+            return
+        with self._lock:
+            # Least recently used first; the most recently used session is never spilled
+            sizes = [(s, s.memory_bytes()) for s in self._sessions.values() if s.spill_path is None]
+        total = sum(size for _, size in sizes)
+        for state, size in sizes[:-1]:
+            if total <= limit:
+                break
+            if self._spill(state):
+                total -= size
+
+    def _expired_everywhere(self, session_id: str, now: float) -> bool:
+        """Whether no worker has used a session within SESSION_TTL_SECONDS"""
+        if not shared_state_enabled():
+            return True
+        try:
+            record = self.store.get(session_id)
+        except Exception:
+            return False
+        return record is None or now - record.get('last_access', 0) > settings.SESSION_TTL_SECONDS
+
+    def _forget(self, session_id: str, everywhere: bool = True):
+        """Remove a session from memory and disk, and from the store / shared files when everywhere"""
+        state = self._sessions.pop(session_id, None)
+        self._spill_file(session_id).unlink(missing_ok=True)
+        if everywhere:
+            try:
+                self.store.delete(session_id)
+            except Exception as e:
+                logger.warning(f"Could not delete metadata for session {session_id}: {e}")
+            if shared_state_enabled():
+                dataset_store.delete(session_id)
+        if state is not None:
+            logger.info(f"Session {session_id} removed")
+
+    def delete(self, session_id: str):
+        """Drop a session and everything it holds"""
+        with self._lock:
+            self._forget(session_id)
+
+
+class SessionDatasetView:
+    """Dict-like view of the calling session's dataset slots (df, info, history, future)"""
+
+    def __getitem__(self, key: str) -> Any:
+        return session_manager.current().dataset[key]
+
+    def __setitem__(self, key: str, value: Any):
+        state = session_manager.current()
+        state.dataset[key] = value
+        if key == "info" and shared_state_enabled():
+            session_manager.save_metadata(state)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return session_manager.current().dataset.get(key, default)
+
+
+# Singleton instance
+session_manager = SessionManager()
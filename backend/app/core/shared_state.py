@@ -0,0 +1,112 @@
+"""
+State shared between worker processes
+Session datasets are published as memory-mappable files and trained jobs
+are persisted to a model registry, so any uvicorn or Celery worker can
+serve a request regardless of which one handled the upload or training
+"""
+from app.config import settings
+from app.utils.columnar import write_frame_file, read_frame_file
+from pathlib import Path
+from typing import Optional, Dict, Any
+import hashlib
+import logging
+import os
+
+import joblib
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+def shared_state_enabled() -> bool:
+    """Shared state is on when asked for, or implied by several workers / a Celery queue"""
+    return settings.SHARED_STATE or settings.WORKERS > 1 or settings.TRAINING_QUEUE == "celery"
+
+
+def _session_key(session_id: str) -> str:
+    return hashlib.sha1(session_id.encode()).hexdigest()[:16]
+
+
+class SharedDatasetStore:
+    """Session datasets on disk, one file per published version"""
+
+    def __init__(self, root: Path):
+        self.root = root / "datasets"
+
+    def publish(self, session_id: str, version: int, df: pd.DataFrame) -> str:
+        """
+        Write a session's dataset, removing the version it replaces
+
+        Returns:
+            Path other workers load the dataset from
+        """
+        self.root.mkdir(parents=True, exist_ok=True)
+        prefix = _session_key(session_id)
+        path = write_frame_file(df, str(self.root / f"{prefix}_{version}"))
+        for old in self.root.glob(f"{prefix}_*"):
+            if str(old) != path and not old.name.endswith('.tmp'):
+                old.unlink(missing_ok=True)
+        return path
+
+    @staticmethod
+    def load(path: str) -> pd.DataFrame:
+        """Load a published dataset"""
+        return read_frame_file(path)
+
+    def delete(self, session_id: str):
+        """Remove every published version of a session's dataset"""
+        for old in self.root.glob(f"{_session_key(session_id)}_*"):
+            old.unlink(missing_ok=True)
+
+
+class ModelRegistry:
+    """Trained jobs (record + trainer) persisted with joblib, filed by session"""
+
+    def __init__(self, root: Path):
+        self.root = root / "models"
+
+    @staticmethod
+    def _safe(job_id: str) -> str:
+        # Job ids are UUIDs; keep only safe characters for the file name anyway
+        return ''.join(c for c in job_id if c.isalnum() or c in '-_')
+
+    def _find(self, job_id: str) -> Optional[Path]:
+        matches = list(self.root.glob(f"*__{self._safe(job_id)}.joblib"))
+        return matches[0] if matches else None
+
+    def save(self, job_id: str, job: Dict[str, Any]):
+        """Persist a job, including its trainer"""
+        self.root.mkdir(parents=True, exist_ok=True)
+        path = self.root / f"{_session_key(job.get('session_id', ''))}__{self._safe(job_id)}.joblib"
+        tmp = path.with_suffix('.tmp')
+        joblib.dump(job, tmp)
+        os.replace(tmp, path)
+        logger.info(f"Job {job_id} saved to model registry")
+
+    def load(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Load a job saved by any worker, or None"""
+        path = self._find(job_id)
+        if path is None:
+            return None
+        try:
+            return joblib.load(path)
+        except Exception as e:
+            logger.error(f"Could not load job {job_id} from model registry: {e}")
+            return None
+
+    def delete(self, job_id: str):
+        path = self._find(job_id)
+        if path is not None:
+            path.unlink(missing_ok=True)
+
+    def delete_session(self, session_id: str) -> int:
+        """Remove every job trained in a session, returns how many were removed"""
+        paths = list(self.root.glob(f"{_session_key(session_id)}__*.joblib"))
+        for path in paths:
+            path.unlink(missing_ok=True)
+        return len(paths)
+
+
+# Singleton instances
+dataset_store = SharedDatasetStore(settings.SHARED_STATE_DIR)
+model_registry = ModelRegistry(settings.SHARED_STATE_DIR)
@@ -0,0 +1,72 @@
+"""
+Celery task queue for model training
+Used when TRAINING_QUEUE="celery": training runs on Celery workers, which
+read the session dataset from the shared store and save the trained job to
+the model registry so any API worker can serve it.
+
+Start a worker from backend/ with:
+    celery -A app.core.task_queue.celery_app worker --concurrency=<TRAINING_CONCURRENCY>
+"""
+from app.config import settings
+from app.core.sessions import set_session_id, reset_session_id
+from typing import Dict, Any
+import logging
+
+try:
+    from celery import Celery
+    CELERY_AVAILABLE = True
+except ImportError:
+    CELERY_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+celery_app = None
+if CELERY_AVAILABLE and settings.CELERY_BROKER_URL:
+    celery_app = Celery(
+        "intelliml",
+        broker=settings.CELERY_BROKER_URL,
+        backend=settings.CELERY_RESULT_BACKEND or settings.CELERY_BROKER_URL,
+    )
+    celery_app.conf.update(
+        task_serializer="json",
+        result_serializer="json",
+        accept_content=["json"],
+        # Training jobs are long: one at a time per worker process, acknowledged when done
+        worker_prefetch_multiplier=1,
+        task_acks_late=True,
+        worker_concurrency=settings.TRAINING_CONCURRENCY,
+    )
+
+    @celery_app.task(name="intelliml.train_models")
+    def train_models_task(session_id: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Train in the session's context; the job is saved to the model registry"""
+        from app.services.ml_service import MLService
+
+        token = set_session_id(session_id)
+        try:
+            return MLService().train_models(**params)
+        finally:
+            reset_session_id(token)
+
+
+def celery_enabled() -> bool:
+    """Celery is installed and a broker is configured"""
+    return celery_app is not None
+
+
+def submit_training(session_id: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Run a training job on a Celery worker and wait for its result
+
+    Args:
+        session_id: Session whose dataset is trained on
+        params: Keyword arguments of MLService.train_models
+
+    Returns:
+        Training response (the job itself is loaded lazily from the model registry)
+    """
+    if not celery_enabled():
+        raise RuntimeError("Celery is not configured (install celery and set CELERY_BROKER_URL)")
+    logger.info(f"Submitting training for session {session_id} to Celery")
+    result = train_models_task.delay(session_id, params)
+    return result.get(timeout=settings.TRAINING_TIMEOUT or None)
@@ -31,6 +31,29 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# Bind each request to its session (X-Session-ID header), added before CORS
+# so CORS stays the outermost middleware
+from app.core.sessions import (
+    SESSION_HEADER, DEFAULT_SESSION, is_valid_session_id, set_session_id, reset_session_id
+)
+
+@app.middleware("http")
+async def session_middleware(request: Request, call_next):
+    """Run the request inside its session and echo the session id back"""
+    session_id = request.headers.get(SESSION_HEADER) or DEFAULT_SESSION
+    if not is_valid_session_id(session_id):
+        return JSONResponse(
+            status_code=400,
+            content={"success": False, "error": f"Invalid {SESSION_HEADER} header", "status_code": 400}
+        )
+    token = set_session_id(session_id)
+    try:
+        response = await call_next(request)
+    finally:
+        reset_session_id(token)
+    response.headers[SESSION_HEADER] = session_id
+    return response
+
 # CORS Configuration - MUST be before routes
 # Using wildcard for development to avoid localhost/127.0.0.1 mismatches
 app.add_middleware(
@@ -89,7 +112,7 @@ async def test_groq():
             )
         
         # Test with a simple chat completion
-        response = groq_client.chat_completion(
+        response = await groq_client.achat_completion(
             messages=[{"role": "user", "content": "Say 'OK' if you're working"}],
             temperature=0.1,
             max_tokens=10
@@ -147,6 +170,14 @@ try:
 except Exception as e:
     logger.warning(f"Explanations router not available: {e}")
 
+sessions_router = None
+try:
+    from app.api import sessions
+    sessions_router = sessions
+    logger.info("✓ Sessions router imported")
+except Exception as e:
+    logger.warning(f"Sessions router not available: {e}")
+
 chat_router = None
 try:
     from app.api import chat
@@ -183,6 +214,10 @@ if chat_router:
     app.include_router(chat_router.router, prefix="/api/chat", tags=["chat"])
     logger.info("✓ Chat router included at /api/chat")
 
+if sessions_router:
+    app.include_router(sessions_router.router, prefix="/api/sessions", tags=["sessions"])
+    logger.info("✓ Sessions router included at /api/sessions")
+
 logger.info("All routers included successfully")
 
 # Global exception handlers
@@ -235,6 +270,10 @@ async def startup_event():
             methods = ', '.join(route.methods)
             logger.info(f"  {methods:8s} {route.path}")
     logger.info("=" * 70)
+    
+    if chat_router:
+        from app.core.code_sandbox import code_sandbox
+        code_sandbox.warm_up()
 
 # Shutdown event
 @app.on_event("shutdown")
@@ -243,13 +282,36 @@ async def shutdown_event():
     logger.info("=" * 70)
     logger.info("🛑 IntelliML API Shutting Down")
     logger.info("=" * 70)
+    
+    if explanations_router:
+        from app.services.explanation_service import shutdown_plot_executor
+        shutdown_plot_executor()
+    
+    if chat_router:
+        from app.core.code_sandbox import code_sandbox
+        code_sandbox.shutdown()
+    
+    from app.services.report_service import shutdown_report_executor
+    shutdown_report_executor()
+    
+    from app.utils.pdf_generator import shutdown_chart_executor
+    shutdown_chart_executor()
+    
+    from app.core.sessions import session_manager
+    session_manager.shutdown()
+    
+    from app.core.groq_client import groq_client
+    await groq_client.aclose()
 
 if __name__ == "__main__":
     import uvicorn
+    from app.config import settings
     uvicorn.run(
         "app.main:app",
-        host="0.0.0.0",
-        port=8000,
-        reload=True,
+        host=settings.HOST,
+        port=settings.PORT,
+        # Reload needs a single process; several workers share state on disk
+        reload=settings.RELOAD and settings.WORKERS == 1,
+        workers=settings.WORKERS,
         log_level="info"
     )
\ No newline at end of file
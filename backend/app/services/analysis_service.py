@@ -1,10 +1,17 @@
 import logging
 import json
+import threading
 from pathlib import Path
 
+import numpy as np
+
 from app.services.data_service import DataService
 from app.core.groq_client import groq_client
-from ml_engine.engines.data_analyzer import DataAnalyzer
+from app.core.sessions import session_manager
+from ml_engine.engines.profiler import DatasetProfile, ANALYSIS_PROFILE
+from ml_engine.engines.correlation import correlation_matrix
+from ml_engine.engines.duplicates import RowHashIndex
+from ml_engine.engines.type_inference import parse_datetime
 
 logger = logging.getLogger(__name__)
 
@@ -24,10 +31,103 @@ class AnalysisService:
     def __init__(self):
         if not hasattr(self, '_initialized'):
             self.data_service = DataService()
-            self.analyzer = DataAnalyzer()
             self.groq = groq_client
             self._initialized = True
     
+    @staticmethod
+    def _session_cache() -> dict:
+        """Profile of the session's current dataset version, shared by every analysis endpoint"""
+        return session_manager.current().service_state(
+            'analysis_cache', lambda: {'lock': threading.Lock(), 'version': None}
+        )
+    
+    def profile(self, spec: dict) -> dict:
+        """
+        Profile sections of the current dataset
+        
+        Every endpoint profiles through here, so facts shared between specs
+        (null counts, duplicates, correlations, ...) are computed once per
+        dataset version. Concurrent callers (e.g. a voice prefetch and the
+        request it anticipated) wait for the same computation.
+        
+        Args:
+            spec: Profiler spec (see ml_engine.engines.profiler)
+        """
+        cache = self._session_cache()
+        version = self.data_service.get_version()
+        with cache['lock']:
+            if cache['version'] != version or 'profile' not in cache:
+                df = self.data_service.get_dataframe(copy=False)
+                logger.info(f"Profiling dataframe with shape: {df.shape}")
+                cache['profile'] = DatasetProfile(df)
+                cache['version'] = version
+            return cache['profile'].profile(spec)
+    
+    def _profile_of(self, df):
+        """
+        The cached profile of df, when df is the session's current dataset
+        (call with the cache lock held)
+        
+        The version is checked as well as identity: /clean edits the session
+        frame in place, so the same object can hold a newer dataset.
+        """
+        cache = self._session_cache()
+        version = self.data_service.get_version()
+        profile = cache.get('profile')
+        if profile is not None and profile.df is df and cache['version'] == version:
+            return profile
+        try:
+            current = self.data_service.get_dataframe(copy=False)
+        except ValueError:
+            return None
+        if current is not df:
+            return None
+        cache['profile'] = DatasetProfile(df)
+        cache['version'] = version
+        return cache['profile']
+    
+    def parsed_datetime(self, df, column: str):
+        """
+        A column of df converted to datetimes
+        
+        Reuses the profile's parse when df is the profiled dataset, otherwise
+        parses once with the detected format.
+        """
+        with self._session_cache()['lock']:
+            profile = self._profile_of(df)
+            if profile is not None:
+                return profile.datetime_column(column)
+        return parse_datetime(df[column])
+    
+    def correlations(self, df):
+        """
+        Correlation matrix of df's numeric columns
+        
+        Served from the dataset's profile, so the report and the analysis
+        endpoints compute it once per dataset version.
+        """
+        with self._session_cache()['lock']:
+            profile = self._profile_of(df)
+            if profile is not None:
+                return profile.corr
+        return correlation_matrix(df, df.select_dtypes(include=[np.number]).columns)
+    
+    def row_index(self, df) -> RowHashIndex:
+        """Row-hash duplicate index of df, shared with the profile when df is the current dataset"""
+        with self._session_cache()['lock']:
+            profile = self._profile_of(df)
+            if profile is not None:
+                return profile.row_index
+        return RowHashIndex(df)
+    
+    def get_analysis(self) -> dict:
+        """Statistical analysis of the current dataset, computed once per dataset version"""
+        return self.profile(ANALYSIS_PROFILE)
+    
+    def prefetch(self):
+        """Compute the analysis ahead of a request that is likely to need it"""
+        self.get_analysis()
+    
     def analyze_dataset(self) -> dict:
         """
         Perform complete dataset analysis with AI insights
@@ -35,16 +135,17 @@ class AnalysisService:
         try:
             logger.info("Starting dataset analysis")
             
-            # Get current dataframe
-            df = self.data_service.get_dataframe()
-            logger.info(f"Got dataframe with shape: {df.shape}")
-            
-            # Perform automated analysis
-            analysis = self.analyzer.analyze(df)
-            logger.info("Analysis complete")
+            # Automated analysis (cached per dataset version)
+            analysis = self.get_analysis()
             
             # Generate AI insights
-            insights = self._generate_ai_insights(analysis)
+            cache = self._session_cache()
+            cached = cache.get('insights')
+            if cached is not None and cached[0] is analysis:
+                insights = cached[1]
+            else:
+                insights = self._generate_ai_insights(analysis)
+                cache['insights'] = (analysis, insights)
             logger.info("AI insights generated")
             
             return {
@@ -83,7 +184,7 @@ Provide a brief summary (3-5 sentences) covering:
 Be conversational and helpful."""
 
             messages = [{"role": "user", "content": prompt}]
-            insights = self.groq.chat_completion(messages, temperature=0.7)
+            insights = self.groq.chat_completion(messages, temperature=0.7, cache=True)
             
             return insights if insights else "Analysis completed successfully."
             
@@ -0,0 +1,216 @@
+"""
+Prompt context for the data chat
+Per-dataset column summaries computed once per dataset version, a token
+budget allocator that keeps the columns most relevant to the question,
+and compression of older conversation turns
+"""
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.metrics.pairwise import linear_kernel
+from typing import Dict, Any, List, Optional, Tuple
+import pandas as pd
+import numpy as np
+import threading
+import logging
+import re
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Columns shown in the sample-rows table
+MAX_SAMPLE_COLUMNS = 8
+MAX_SAMPLE_ROWS = 5
+CODE_BLOCK_PATTERN = re.compile(r'```.*?```', re.DOTALL)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about 4 characters per token for English and code)"""
+    return len(text) // 4 + 1
+
+
+def _name_words(name: str) -> List[str]:
+    """Split a column name into lowercase words (snake_case, camelCase, spaces)"""
+    spaced = re.sub(r'([a-z0-9])([A-Z])', r'\1 \2', str(name))
+    return [w for w in re.split(r'[^A-Za-z0-9]+', spaced.lower()) if w]
+
+
+class DatasetContextBuilder:
+    """
+    Builds the dataset description sent with each chat turn
+
+    Column summaries and the relevance index are computed once per dataset
+    version; each turn only scores the question against them and fills the
+    token budget with the most relevant columns.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._summary = None
+
+    def build(self, df: pd.DataFrame, version: Any, question: str, token_budget: Optional[int] = None) -> str:
+        """
+        Dataset context for a question
+
+        Args:
+            df: Current dataset
+            version: Dataset version; summaries are recomputed when it changes
+            question: User's message, used to rank columns
+            token_budget: Approximate tokens to spend (defaults to CHAT_CONTEXT_TOKEN_BUDGET)
+
+        Returns:
+            Context string
+        """
+        summary = self._get_summary(df, version)
+        budget = token_budget or settings.CHAT_CONTEXT_TOKEN_BUDGET
+        columns = summary['columns']
+
+        header = (
+            f"Dataset Information:\n"
+            f"- Shape: {df.shape[0]} rows, {df.shape[1]} columns\n"
+            f"- Data Types Summary: {summary['dtype_counts']}\n"
+        )
+        used = estimate_tokens(header)
+
+        ranked = self._rank_columns(summary, question)
+        selected = []
+        for col in ranked:
+            cost = estimate_tokens(summary['lines'][col])
+            if used + cost > budget * 0.6 and selected:
+                break
+            selected.append(col)
+            used += cost
+
+        # Keep dataset order so related columns stay together
+        order = {col: i for i, col in enumerate(columns)}
+        selected.sort(key=order.get)
+
+        parts = [header, "Columns (most relevant to the question):"]
+        parts.extend(summary['lines'][col] for col in selected)
+        chosen = set(selected)
+        omitted = [col for col in columns if col not in chosen]
+        if omitted:
+            names = ', '.join(map(str, omitted[:30]))
+            more = f" (+{len(omitted) - 30} more)" if len(omitted) > 30 else ""
+            line = f"Other columns (not summarized): {names}{more}"
+            parts.append(line)
+            used += estimate_tokens(line)
+
+        sample_cols = selected[:MAX_SAMPLE_COLUMNS]
+        sample = df[sample_cols].head(MAX_SAMPLE_ROWS).to_markdown(index=False, numalign="left", stralign="left")
+        if used + estimate_tokens(sample) <= budget:
+            parts.append(f"\nSample Data (First {MAX_SAMPLE_ROWS} rows, selected columns):\n{sample}")
+
+        return '\n'.join(parts) + '\n'
+
+    def _get_summary(self, df: pd.DataFrame, version: Any) -> Dict[str, Any]:
+        """Per-column summary lines and relevance index, cached per dataset version"""
+        with self._lock:
+            if self._summary is not None and self._version == version:
+                return self._summary
+
+            columns = df.columns.tolist()
+            lines = {}
+
+            numeric = df.select_dtypes(include=[np.number])
+            stats = numeric.describe().T if not numeric.empty else pd.DataFrame()
+            missing = df.isnull().sum()
+
+            documents = []
+            for col in columns:
+                series = df[col]
+                prefix = f"- {col} ({series.dtype}): "
+                if col in stats.index:
+                    s = stats.loc[col]
+                    detail = (
+                        f"mean={s['mean']:.4g}, std={s['std']:.4g}, "
+                        f"min={s['min']:.4g}, median={s['50%']:.4g}, max={s['max']:.4g}"
+                    )
+                    values_text = ''
+                else:
+                    counts = series.value_counts().head(3)
+                    top = ', '.join(str(v) for v in counts.index)
+                    detail = f"{series.nunique()} unique, top: {top}"
+                    values_text = ' '.join(str(v) for v in counts.index)
+                if missing[col]:
+                    detail += f", missing={int(missing[col])}"
+                lines[col] = prefix + detail
+                documents.append(f"{' '.join(_name_words(col))} {values_text}".strip() or str(col))
+
+            vectorizer = TfidfVectorizer(analyzer='char_wb', ngram_range=(2, 4), lowercase=True)
+            try:
+                matrix = vectorizer.fit_transform(documents)
+            except ValueError:
+                vectorizer, matrix = None, None
+
+            self._summary = {
+                'columns': columns,
+                'lines': lines,
+                'words': {col: set(_name_words(col)) for col in columns},
+                'dtype_counts': ', '.join(f"{k}: {v}" for k, v in df.dtypes.astype(str).value_counts().items()),
+                'vectorizer': vectorizer,
+                'matrix': matrix,
+            }
+            self._version = version
+            logger.info(f"Built chat context summaries for {len(columns)} columns")
+            return self._summary
+
+    @staticmethod
+    def _rank_columns(summary: Dict[str, Any], question: str) -> List[str]:
+        """Columns ordered by relevance to the question, ties in dataset order"""
+        columns = summary['columns']
+        scores = np.zeros(len(columns))
+
+        if summary['vectorizer'] is not None and question.strip():
+            query = summary['vectorizer'].transform([question])
+            scores += linear_kernel(query, summary['matrix']).ravel()
+
+        # Exact mentions of a column or its words outrank fuzzy similarity
+        question_lower = question.lower()
+        question_words = set(_name_words(question))
+        for i, col in enumerate(columns):
+            if re.search(rf'(?<!\w){re.escape(str(col).lower())}(?!\w)', question_lower):
+                scores[i] += 2.0
+            elif summary['words'][col] and summary['words'][col] <= question_words:
+                scores[i] += 1.0
+
+        order = np.argsort(-scores, kind='stable')
+        return [columns[i] for i in order]
+
+
+def compress_history(history: List[Dict[str, str]]) -> Tuple[Optional[str], List[Dict[str, str]]]:
+    """
+    Split conversation history into a summary of older turns and recent messages
+
+    The last CHAT_HISTORY_RECENT_MESSAGES messages are kept verbatim; older
+    ones are reduced to the user's question and the first sentence of each
+    reply (code stripped), newest first until CHAT_HISTORY_SUMMARY_TOKENS.
+
+    Returns:
+        Tuple of (summary text or None, recent messages)
+    """
+    keep = settings.CHAT_HISTORY_RECENT_MESSAGES
+    recent = history[-keep:] if keep > 0 else []
+    older = history[:len(history) - len(recent)]
+    if not older:
+        return None, recent
+
+    lines = []
+    used = 0
+    for msg in reversed(older):
+        text = CODE_BLOCK_PATTERN.sub(' [code] ', msg.get('content') or '')
+        text = re.sub(r'\s+', ' ', text).strip()
+        if msg.get('role') == 'assistant':
+            text = re.split(r'(?<=[.!?])\s', text, maxsplit=1)[0]
+            line = f"Assistant: {text[:200]}"
+        else:
+            line = f"User: {text[:200]}"
+        cost = estimate_tokens(line)
+        if used + cost > settings.CHAT_HISTORY_SUMMARY_TOKENS:
+            break
+        lines.append(line)
+        used += cost
+
+    if not lines:
+        return None, recent
+    return "Earlier in this conversation:\n" + '\n'.join(reversed(lines)), recent
@@ -6,18 +6,20 @@ The LLM can generate and execute Python code to answer questions.
 
 import pandas as pd
 import numpy as np
-from io import StringIO
-import sys
-import traceback
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, AsyncIterator
+import asyncio
+import hashlib
 import logging
 import json
 import re
-import base64
-from io import BytesIO
+
+from fastapi.concurrency import run_in_threadpool
 
 from app.core.groq_client import groq_client
+from app.core.code_sandbox import code_sandbox
+from app.core.sessions import session_manager
 from app.services.data_service import DataService
+from app.services.chat_context import DatasetContextBuilder, compress_history
 
 logger = logging.getLogger(__name__)
 
@@ -34,7 +36,16 @@ class DataChatService:
     def __init__(self):
         self.data_service = DataService()
         self.groq = groq_client
-        self.conversation_history: List[Dict[str, str]] = []
+    
+    @property
+    def conversation_history(self) -> List[Dict[str, str]]:
+        """Chat history of the calling session"""
+        return session_manager.current().service_state('chat_history', list)
+    
+    @property
+    def context_builder(self) -> DatasetContextBuilder:
+        """Dataset context cache of the calling session"""
+        return session_manager.current().service_state('chat_context', DatasetContextBuilder)
         
     def chat(self, user_message: str) -> Dict[str, Any]:
         """
@@ -47,84 +58,132 @@ class DataChatService:
             Dict with response, code, output, and optional visualization
         """
         try:
-            # Get current dataset
-            df = self.data_service.get_dataframe()
-            
-            # Build context about the dataset
-            dataset_context = self._build_dataset_context(df)
-            
-            # Add to conversation
-            self.conversation_history.append({"role": "user", "content": user_message})
-            
-            # Generate response with code
-            response = self._generate_response(user_message, dataset_context)
-            
-            # Add assistant response to history
-            self.conversation_history.append({"role": "assistant", "content": response['text']})
-            
-            return response
+            messages = self._start_turn(user_message)
+            llm_response = self.groq.chat_completion(messages, max_tokens=2048)
+            return self._finish_turn(self._process_llm_response(llm_response))
+        except Exception as e:
+            return self._error_response(e)
+    
+    async def chat_async(self, user_message: str) -> Dict[str, Any]:
+        """
+        Async version of chat: awaits the LLM without blocking the event loop
+        and runs generated code in a worker thread
+        """
+        try:
+            messages = self._start_turn(user_message)
+            llm_response = await self.groq.achat_completion(messages, max_tokens=2048)
+            response = await run_in_threadpool(self._process_llm_response, llm_response)
+            return self._finish_turn(response)
+        except Exception as e:
+            return self._error_response(e)
+    
+    async def chat_stream(self, user_message: str) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Streaming version of chat
+        
+        Forwards tokens as they arrive and starts executing the first
+        ```python``` block in a worker thread as soon as it closes, while the
+        model is still writing the rest of its answer.
+        
+        Yields:
+            Events as {'event': name, 'data': payload}: 'token' ({'text'}),
+            'code' ({'code'}), 'output' ({'output', 'visualization'}) and a
+            final 'done' carrying the same dict chat() returns
+        """
+        try:
+            messages = self._start_turn(user_message)
+        except Exception as e:
+            yield {"event": "done", "data": self._error_response(e)}
+            return
+        
+        text = ""
+        code = None
+        execution = None
+        output, visualization = None, None
+        try:
+            async for token in self.groq.astream_chat_completion(messages, max_tokens=2048):
+                text += token
+                yield {"event": "token", "data": {"text": token}}
+                
+                # A block can only close on a token carrying a backtick
+                if code is None and '`' in token:
+                    code = self._first_closed_code_block(text)
+                    if code is not None:
+                        yield {"event": "code", "data": {"code": code}}
+                        df = self.data_service.get_dataframe(copy=False)
+                        execution = asyncio.ensure_future(run_in_threadpool(self._execute_code, code, df))
+                
+                if execution is not None and execution.done() and output is None:
+                    output, visualization = execution.result()
+                    yield {"event": "output", "data": {"output": output, "visualization": visualization}}
             
-        except ValueError as e:
-            return {
-                "text": str(e),
-                "code": None,
-                "output": None,
-                "visualization": None,
-                "error": True
-            }
+            if execution is not None and output is None:
+                output, visualization = await execution
+                yield {"event": "output", "data": {"output": output, "visualization": visualization}}
         except Exception as e:
-            logger.error(f"Chat error: {str(e)}", exc_info=True)
-            return {
-                "text": f"Sorry, I encountered an error: {str(e)}",
-                "code": None,
-                "output": None,
-                "visualization": None,
-                "error": True
+            if execution is not None and not execution.done():
+                execution.cancel()
+            yield {"event": "done", "data": self._error_response(e)}
+            return
+        
+        if not text:
+            response = self._process_llm_response(None)
+        else:
+            response = {
+                "text": text,
+                "code": code,
+                "output": output,
+                "visualization": visualization,
+                "error": False
             }
+        yield {"event": "done", "data": self._finish_turn(response)}
+    
+    def _first_closed_code_block(self, text: str) -> Optional[str]:
+        """First complete ```python``` block in a partial reply, if it has closed yet"""
+        blocks = self._extract_code_blocks(text)
+        return blocks[0] if blocks else None
     
-    def _build_dataset_context(self, df: pd.DataFrame) -> str:
-        """Build context string describing the dataset"""
-        # Truncate to save tokens
-        max_cols = 20
-        max_rows_sample = 5
+    def _start_turn(self, user_message: str) -> List[Dict[str, str]]:
+        """Record the user message and build the LLM prompt"""
+        # Get current dataset (read-only, no copy)
+        df = self.data_service.get_dataframe(copy=False)
         
-        # Column info
-        cols = df.columns.tolist()
-        if len(cols) > max_cols:
-            col_info = ', '.join(cols[:max_cols]) + f"... (+{len(cols)-max_cols} more)"
-        else:
-            col_info = ', '.join(cols)
-            
-        # Data types (summary)
-        dtype_counts = df.dtypes.value_counts().to_string()
+        # Build context about the dataset, focused on the question
+        dataset_context = self._build_dataset_context(df, user_message)
+        messages = self._build_messages(user_message, dataset_context)
         
-        # Sample data
-        sample_data = df.head(max_rows_sample).to_markdown(index=False, numalign="left", stralign="left")
+        # Add to conversation
+        self.conversation_history.append({"role": "user", "content": user_message})
         
-        # Statistics
-        # Only describe numeric columns to save space, and limit to top columns
-        numeric_df = df.select_dtypes(include=[np.number])
-        if not numeric_df.empty:
-            stats = numeric_df.iloc[:, :max_cols].describe().to_markdown(numalign="left", stralign="left")
+        return messages
+    
+    def _finish_turn(self, response: Dict[str, Any]) -> Dict[str, Any]:
+        """Add assistant response to history"""
+        self.conversation_history.append({"role": "assistant", "content": response['text']})
+        return response
+    
+    @staticmethod
+    def _error_response(e: Exception) -> Dict[str, Any]:
+        """Chat reply for a failed turn"""
+        if isinstance(e, ValueError):
+            text = str(e)
         else:
-            stats = "No numeric columns."
-
-        context = f"""Dataset Information:
-- Shape: {df.shape[0]} rows, {df.shape[1]} columns
-- Columns: {col_info}
-- Data Types Summary:
-{dtype_counts}
-
-Sample Data (First {max_rows_sample} rows):
-{sample_data}
-
-Statistics (Top {max_cols} numeric columns):
-{stats}
-"""
-        return context
+            logger.error(f"Chat error: {str(e)}", exc_info=True)
+            text = f"Sorry, I encountered an error: {str(e)}"
+        return {
+            "text": text,
+            "code": None,
+            "output": None,
+            "visualization": None,
+            "error": True
+        }
     
-    def _generate_response(self, user_message: str, dataset_context: str) -> Dict[str, Any]:
-        """Generate LLM response with optional code execution"""
+    def _build_dataset_context(self, df: pd.DataFrame, question: str = "") -> str:
+        """Build context string describing the dataset within the token budget"""
+        return self.context_builder.build(df, self.data_service.get_version(), question)
+    
+    def _build_messages(self, user_message: str, dataset_context: str) -> List[Dict[str, str]]:
+        """Build the LLM messages for a chat turn"""
         
         system_prompt = """You are an AI data analyst assistant. The user has uploaded a dataset and wants to analyze it.
 
@@ -145,8 +204,15 @@ IMPORTANT:
 - pandas is available as `pd`
 - Always use print() to show results"""
 
-        messages = [
-            {"role": "system", "content": system_prompt},
+        messages = [{"role": "system", "content": system_prompt}]
+        
+        # Older turns are summarized, recent ones kept verbatim
+        history_summary, recent = compress_history(self.conversation_history)
+        if history_summary:
+            messages.append({"role": "system", "content": history_summary})
+        messages.extend(recent)
+        
+        messages.append(
             {"role": "user", "content": f"""Dataset Context:
 {dataset_context}
 
@@ -156,15 +222,12 @@ Please analyze the data and provide:
 1. A clear explanation
 2. Python code if needed (wrapped in ```python```)
 3. Suggested visualizations if relevant"""}
-        ]
-        
-        # Add conversation history (limited to last 10 messages)
-        for msg in self.conversation_history[-10:]:
-            messages.append(msg)
-        
-        # Get LLM response
-        llm_response = self.groq.chat_completion(messages, max_tokens=2048)
+        )
         
+        return messages
+    
+    def _process_llm_response(self, llm_response: Optional[str]) -> Dict[str, Any]:
+        """Execute the first code block of an LLM reply and build the chat response"""
         if not llm_response:
             return {
                 "text": "I'm having trouble connecting to the AI service. Please try again.",
@@ -182,7 +245,7 @@ Please analyze the data and provide:
         visualization = None
         
         if code_blocks:
-            df = self.data_service.get_dataframe()
+            df = self.data_service.get_dataframe(copy=False)
             code_output, visualization = self._execute_code(code_blocks[0], df)
         
         return {
@@ -200,61 +263,10 @@ Please analyze the data and provide:
         return matches
     
     def _execute_code(self, code: str, df: pd.DataFrame) -> tuple:
-        """Safely execute Python code and capture output"""
-        # Capture stdout
-        old_stdout = sys.stdout
-        sys.stdout = StringIO()
-        
-        visualization = None
-        
-        try:
-            # Create safe execution environment
-            import matplotlib
-            matplotlib.use('Agg')
-            import matplotlib.pyplot as plt
-            
-            local_vars = {
-                'df': df.copy(),
-                'pd': pd,
-                'np': np,
-                'plt': plt,
-                'base64': base64,
-                'BytesIO': BytesIO,
-            }
-            
-            # Execute code
-            exec(code, {"__builtins__": __builtins__}, local_vars)
-            
-            # Get output
-            output = sys.stdout.getvalue()
-            
-            # Check for plot data in output (legacy method)
-            if "PLOT:" in output:
-                lines = output.split('\n')
-                for line in lines:
-                    if line.startswith("PLOT:"):
-                        visualization = "data:image/png;base64," + line[5:]
-                        output = output.replace(line, "[Visualization generated]")
-            
-            # Auto-capture any open matplotlib figures (new method)
-            if visualization is None and plt.get_fignums():
-                buf = BytesIO()
-                plt.savefig(buf, format='png', dpi=150, bbox_inches='tight', facecolor='white', edgecolor='none')
-                buf.seek(0)
-                img_base64 = base64.b64encode(buf.read()).decode('utf-8')
-                visualization = f"data:image/png;base64,{img_base64}"
-                buf.close()
-            
-            return output.strip(), visualization
-            
-        except Exception as e:
-            error_msg = f"Code execution error: {str(e)}\n{traceback.format_exc()}"
-            logger.error(error_msg)
-            return error_msg, None
-            
-        finally:
-            sys.stdout = old_stdout
-            plt.close('all')
+        """Run code against the dataset in the sandbox worker pool and capture output"""
+        session = session_manager.current()
+        session_key = hashlib.sha1(session.session_id.encode()).hexdigest()[:12]
+        return code_sandbox.execute(code, df, dataset_key=f"{session_key}_v{session.version}")
     
     def get_visualization_suggestions(self) -> List[Dict[str, str]]:
         """Suggest appropriate visualizations based on dataset analysis"""
@@ -319,7 +331,7 @@ Please analyze the data and provide:
     
     def clear_history(self):
         """Clear conversation history"""
-        self.conversation_history = []
+        self.conversation_history.clear()
 
 
 # Singleton instance
@@ -2,7 +2,11 @@ import pandas as pd
 import numpy as np
 from io import BytesIO
 from typing import Optional, Dict, Any
+import threading
 import logging
+import time
+
+from app.core.sessions import session_manager
 
 logger = logging.getLogger(__name__)
 
@@ -10,11 +14,13 @@ class DataService:
     """
     Service for data processing and management
     Handles file uploads, parsing, and data storage
+    
+    The dataset itself lives in the calling request's session
     """
     
     _instance = None
-    _dataframe = None
-    _filename = None
+    _version = 0  # Increasing across sessions and worker processes
+    _version_lock = threading.Lock()
     
     def __new__(cls):
         if cls._instance is None:
@@ -44,8 +50,7 @@ class DataService:
                 raise ValueError(f"Unsupported file type: {filename}")
             
             # Store DataFrame as class variable
-            DataService._dataframe = df
-            DataService._filename = filename
+            self.set_dataframe(df, filename)
             
             logger.info(f"Loaded dataset: {df.shape[0]} rows, {df.shape[1]} columns")
             logger.info(f"Columns: {df.columns.tolist()}")
@@ -59,11 +64,12 @@ class DataService:
     
     def get_dataset_info(self) -> Dict[str, Any]:
         """Get comprehensive information about current dataset"""
-        if DataService._dataframe is None:
+        session = session_manager.current()
+        if session.dataframe is None:
             logger.warning("No dataset loaded")
             return None
         
-        df = DataService._dataframe
+        df = session.dataframe
         
         # Convert dtypes to string for JSON serialization
         dtypes = {col: str(dtype) for col, dtype in df.dtypes.items()}
@@ -72,7 +78,7 @@ class DataService:
         preview_data = df.head(10).replace({np.nan: None}).values.tolist()
         
         info = {
-            "filename": DataService._filename,
+            "filename": session.filename,
             "shape": list(df.shape),
             "columns": df.columns.tolist(),
             "dtypes": dtypes,
@@ -84,21 +90,55 @@ class DataService:
         logger.info(f"Returning dataset info for {len(df)} rows")
         return info
     
-    def get_dataframe(self) -> pd.DataFrame:
-        """Get current DataFrame"""
-        if DataService._dataframe is None:
+    def set_dataframe(self, df: pd.DataFrame, filename: Optional[str] = None):
+        """
+        Replace the current DataFrame
+        
+        Args:
+            df: New dataset
+            filename: Source filename (kept unchanged when None)
+        
+        Raises:
+            SessionQuotaError: If the dataset exceeds the session memory quota
+        """
+        session = session_manager.current()
+        session_manager.enforce_quota(session, df)
+        with DataService._version_lock:
+            # Microsecond clock floor keeps versions increasing across worker processes
+            DataService._version = max(DataService._version + 1, time.time_ns() // 1000)
+            session.version = DataService._version
+        session.dataframe = df
+        if filename is not None:
+            session.filename = filename
+        session_manager.publish(session)
+    
+    def get_version(self) -> int:
+        """Version of the current dataset, changes whenever it is replaced"""
+        return session_manager.current().version
+    
+    def get_dataframe(self, copy: bool = True) -> pd.DataFrame:
+        """
+        Get current DataFrame
+        
+        Args:
+            copy: Return a copy; pass False only for read-only access
+        """
+        df = session_manager.current().dataframe
+        if df is None:
             raise ValueError("No dataset loaded. Please upload a file first.")
-        logger.info(f"Returning dataframe with shape: {DataService._dataframe.shape}")
-        return DataService._dataframe.copy()
+        logger.info(f"Returning dataframe with shape: {df.shape}")
+        return df.copy() if copy else df
     
     def get_columns(self) -> list:
         """Get list of column names"""
-        if DataService._dataframe is None:
+        df = session_manager.current().dataframe
+        if df is None:
             return []
-        return DataService._dataframe.columns.tolist()
+        return df.columns.tolist()
     
     def get_column_type(self, column: str) -> str:
         """Get data type of a column"""
-        if DataService._dataframe is None:
+        df = session_manager.current().dataframe
+        if df is None:
             raise ValueError("No dataset loaded")
-        return str(DataService._dataframe[column].dtype)
\ No newline at end of file
+        return str(df[column].dtype)
\ No newline at end of file
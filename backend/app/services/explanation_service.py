@@ -1,10 +1,36 @@
 from app.services.ml_service import MLService
-from ml_engine.engines.explainer import ModelExplainer
+from ml_engine.engines.explainer import ModelExplainer, render_shap_plots
 from app.core.groq_client import groq_client
+from app.config import settings
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any
+import multiprocessing
+import numpy as np
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Plots render in worker processes: matplotlib is slow and pyplot is not thread-safe
+_plot_executor = None
+
+def _get_plot_executor() -> ProcessPoolExecutor:
+    """Lazily start the plot rendering pool"""
+    global _plot_executor
+    if _plot_executor is None:
+        _plot_executor = ProcessPoolExecutor(
+            max_workers=settings.SHAP_PLOT_WORKERS,
+            mp_context=multiprocessing.get_context('spawn')
+        )
+    return _plot_executor
+
+def shutdown_plot_executor():
+    """Stop the plot rendering pool (called on app shutdown)"""
+    global _plot_executor
+    if _plot_executor is not None:
+        _plot_executor.shutdown(wait=False, cancel_futures=True)
+        _plot_executor = None
+
 class ExplanationService:
     """
     Service for generating model explanations
@@ -15,6 +41,8 @@ class ExplanationService:
         self.ml_service = MLService()
         self.explainer = ModelExplainer()
         self.groq = groq_client
+        self.cache = OrderedDict()  # job_id -> explanation result, most recent last
+        self.plot_jobs = {}  # job_id -> Future of rendered plots
     
     def explain_model(self, job_id: str) -> dict:
         """
@@ -26,9 +54,13 @@ class ExplanationService:
         Returns:
             SHAP explanations + natural language
         """
+        if job_id in self.cache:
+            self.cache.move_to_end(job_id)
+            return self._with_plots(job_id)
+        
         try:
             # Get job results
-            job = self.ml_service.jobs.get(job_id)
+            job = self.ml_service.get_job(job_id)
             if not job:
                 raise ValueError(f"Job {job_id} not found")
             
@@ -44,36 +76,21 @@ class ExplanationService:
             # Get the feature names from trainer
             feature_names = trainer.feature_names
             
-            # Get training data and preprocess the same way trainer did
-            df = self.ml_service.data_service.get_dataframe()
-            target_column = job['target_column']
-            
-            # Prepare features (replicating trainer's preprocessing)
-            X = df.drop(columns=[target_column]).copy()
-            
-            # Encode categorical features same way as training
-            from sklearn.preprocessing import LabelEncoder
-            for col in X.select_dtypes(include=['object']).columns:
-                le = LabelEncoder()
-                X[col] = le.fit_transform(X[col].astype(str))
-            
-            # Fill missing values
-            X = X.fillna(X.mean())
-            
-            # Convert to numpy and scale
-            X_np = X.values
-            X_scaled = trainer.scaler.transform(X_np)
+            # Preprocess with the trainer's own encoders, means and scaler
+            X_scaled = self._explanation_data(trainer)
             
-            # Use subset for SHAP (faster)
-            sample_size = min(100, len(X_scaled))
-            X_sample = X_scaled[:sample_size]
-            
-            # Generate SHAP explanations
+            # Generate SHAP explanations (plots are rendered off-request)
             shap_results = self.explainer.explain_model(
                 best_server.trained_model,
-                X_sample,
-                feature_names
+                X_scaled,
+                feature_names,
+                max_samples=settings.SHAP_GLOBAL_MAX_ROWS,
+                background=trainer.background,
+                time_budget=settings.SHAP_TIME_BUDGET,
+                render_plots=False
             )
+            shap_values = shap_results.pop('shap_values', None)
+            sample = shap_results.pop('sample', None)
             
             # Make results JSON-safe
             def make_safe(obj):
@@ -96,18 +113,26 @@ class ExplanationService:
                 safe_results['feature_importance']
             )
             
-            return {
+            self.cache[job_id] = {
                 'shap_results': safe_results,
                 'explanation': nl_explanation,
                 'model_name': job['results']['best_model']['model_name'],
                 'status': 'success'
             }
+            while len(self.cache) > settings.MAX_RETAINED_JOBS:
+                evicted, _ = self.cache.popitem(last=False)
+                self.plot_jobs.pop(evicted, None)
+            
+            if shap_values is not None:
+                self._submit_plots(job_id, shap_values, sample, feature_names)
+            
+            return self._with_plots(job_id)
             
         except Exception as e:
             logger.error(f"Explanation error: {str(e)}", exc_info=True)
             # Return fallback with feature importance from model
             try:
-                job = self.ml_service.jobs.get(job_id)
+                job = self.ml_service.get_job(job_id)
                 if job and job.get('trainer'):
                     trainer = job['trainer']
                     best_server = trainer.get_best_model_server()
@@ -133,6 +158,71 @@ class ExplanationService:
                 pass
             raise
     
+    def _explanation_data(self, trainer) -> np.ndarray:
+        """
+        Scaled rows to explain: the current dataset when it still has the
+        training features, otherwise the trainer's background sample
+        """
+        try:
+            df = self.ml_service.data_service.get_dataframe()
+        except ValueError:
+            df = None
+        
+        if df is not None and all(col in df.columns for col in trainer.feature_names):
+            return trainer.preprocess(trainer.encode_features(df))
+        
+        logger.info("Current dataset does not match the training features, using background sample")
+        if trainer.background is None:
+            raise ValueError("No data available to explain this model")
+        return trainer.background
+    
+    def _submit_plots(self, job_id: str, shap_values: np.ndarray, sample: np.ndarray, feature_names: list):
+        """Queue plot rendering for a job on the worker pool"""
+        try:
+            self.plot_jobs[job_id] = _get_plot_executor().submit(
+                render_shap_plots, shap_values, sample, feature_names
+            )
+        except Exception as e:
+            logger.warning(f"Could not queue SHAP plots for job {job_id}: {e}")
+    
+    def get_plots(self, job_id: str) -> Dict[str, Any]:
+        """
+        Get rendered SHAP plots for a job
+        
+        Returns:
+            Dict with status ('ready', 'pending', 'failed' or 'unavailable') and plots
+        """
+        if job_id not in self.cache:
+            raise ValueError(f"No explanation computed for job {job_id}")
+        
+        cached_plots = self.cache[job_id]['shap_results'].get('plots')
+        if cached_plots:
+            return {'status': 'ready', 'plots': cached_plots}
+        
+        future = self.plot_jobs.get(job_id)
+        if future is None:
+            return {'status': 'unavailable', 'plots': {}}
+        if not future.done():
+            return {'status': 'pending', 'plots': {}}
+        
+        self.plot_jobs.pop(job_id, None)
+        try:
+            plots = future.result()
+        except Exception as e:
+            logger.error(f"SHAP plot rendering failed for job {job_id}: {e}")
+            return {'status': 'failed', 'plots': {}}
+        
+        self.cache[job_id]['shap_results']['plots'] = plots
+        return {'status': 'ready', 'plots': plots}
+    
+    def _with_plots(self, job_id: str) -> Dict[str, Any]:
+        """Cached explanation with whatever plots are ready"""
+        plots = self.get_plots(job_id)
+        result = self.cache[job_id]
+        result['shap_results']['plots'] = plots['plots']
+        result['shap_results']['plots_status'] = plots['status']
+        return result
+    
     def _generate_nl_explanation(self, best_model: dict, feature_importance: list) -> str:
         """Generate natural language explanation"""
         top_features = feature_importance[:5]
@@ -153,4 +243,4 @@ Provide a brief explanation (3-4 sentences):
 Be clear and non-technical."""
 
         messages = [{"role": "user", "content": prompt}]
-        return self.groq.chat_completion(messages, temperature=0.7)
\ No newline at end of file
+        return self.groq.chat_completion(messages, temperature=0.7, cache=True)
\ No newline at end of file
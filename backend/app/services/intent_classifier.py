@@ -0,0 +1,298 @@
+"""
+Local intent classifier for voice/text commands
+Weighted command phrases are matched in one pass with an Aho-Corasick
+automaton and target columns are found by fuzzy matching against the
+dataset's column names, so clear commands resolve without an LLM call
+"""
+from collections import deque
+from difflib import SequenceMatcher, get_close_matches
+from functools import lru_cache
+from typing import Dict, Any, List, Optional, Tuple
+import logging
+import re
+import time
+
+logger = logging.getLogger(__name__)
+
+# Command phrases per intent with their weight. Phrases match at the start of
+# a word, so "train" also covers "training"/"trained".
+INTENT_PHRASES = {
+    "ANALYZE_DATA": {
+        "analyze": 1.0, "analyse": 1.0, "analysis": 1.0, "explore": 1.0, "eda": 1.0,
+        "statistics": 0.8, "stats": 0.8, "summary": 0.7, "summarize": 0.8, "describe": 0.8,
+        "visualize": 0.8, "distribution": 0.6, "correlation": 0.6, "insights": 0.6,
+        "show": 0.3, "display": 0.3, "my data": 0.4, "the data": 0.3, "dataset": 0.3,
+    },
+    "TRAIN_MODEL": {
+        "train": 1.0, "build a model": 1.0, "build model": 1.0, "create a model": 1.0,
+        "create model": 1.0, "fit a model": 1.0, "fit model": 1.0, "develop a model": 1.0,
+        "automl": 0.8, "learn": 0.4, "model": 0.3, "build": 0.4,
+        # "train a model to predict X" is training, not prediction
+        "to predict": 0.5, "to forecast": 0.5, "to classify": 0.5, "target": 0.4,
+    },
+    "EXPLAIN_MODEL": {
+        "explain": 1.0, "interpret": 1.0, "feature importance": 1.2, "important features": 1.2,
+        "shap": 1.0, "what affects": 1.0, "what drives": 1.0, "why": 0.6, "how does": 0.5,
+    },
+    "UPLOAD_DATA": {
+        "upload": 1.2, "load": 0.8, "import": 0.8, "add data": 1.0, "bring data": 1.0,
+        "use dataset": 1.0, "new dataset": 0.8, "csv": 0.5, "file": 0.4,
+    },
+    "PREDICT": {
+        "predict": 1.0, "prediction": 1.0, "forecast": 1.0, "estimate": 0.8,
+        "what will": 0.7, "inference": 0.8, "score new": 0.8,
+    },
+    "HELP": {
+        "help": 1.2, "how to": 0.6, "what can": 1.0, "guide": 0.8, "tutorial": 1.0,
+        "show me how": 1.0, "get started": 1.0, "getting started": 1.0,
+    },
+    "VIEW_RESULTS": {
+        "results": 1.0, "result": 0.8, "what happened": 1.0, "outcome": 0.8,
+        "performance": 0.7, "metrics": 0.8, "accuracy": 0.6, "score": 0.5,
+    },
+    "COMPARE_MODELS": {
+        "compare": 1.2, "comparison": 1.2, "which is better": 1.2, "best model": 0.9,
+        "difference between": 1.0, "leaderboard": 1.0, "versus": 0.8, "vs": 0.6,
+    },
+}
+
+# Spoken model names -> the model_type entity the LLM prompt uses
+MODEL_TYPE_PHRASES = {
+    "xgboost": "xgboost", "xg boost": "xgboost", "gradient boosting": "xgboost",
+    "random forest": "random forest", "linear regression": "linear regression",
+    "logistic regression": "logistic regression", "neural network": "neural network",
+    "neural net": "neural network", "svm": "svm", "support vector": "svm",
+}
+
+# Words after which the target column is usually named
+TARGET_CUES = ("predict", "forecast", "estimate", "target", "classify", "for", "of")
+FILLER_WORDS = ("the", "a", "an", "my", "column", "variable", "is")
+
+# Naming a model type is evidence for training
+MODEL_TYPE_WEIGHT = 0.6
+
+# Bonus for a leading strong phrase: commands usually start with their verb
+LEADING_BONUS = 0.5
+STRONG_WEIGHT = 0.8
+COLUMN_MATCH_CUTOFF = 0.8
+# Score of a single word that belongs to exactly one column ("price" -> SalePrice)
+COLUMN_WORD_SCORE = 0.85
+
+
+def _normalize(text: str) -> str:
+    """Lowercase words separated by single spaces (snake_case and camelCase split)"""
+    spaced = re.sub(r'([a-z0-9])([A-Z])', r'\1 \2', str(text))
+    return ' '.join(w for w in re.split(r'[^a-z0-9]+', spaced.lower()) if w)
+
+
+class PhraseAutomaton:
+    """
+    Aho-Corasick automaton over word-prefixed phrases
+
+    Finds every phrase occurrence in a single pass over the text, whatever
+    the number of phrases.
+    """
+
+    def __init__(self, phrases: Dict[str, Any]):
+        """
+        Args:
+            phrases: Phrase -> payload returned with each match
+        """
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        for phrase, payload in phrases.items():
+            self._add(' ' + _normalize(phrase), payload)
+        self._build()
+
+    def _add(self, pattern: str, payload: Any):
+        node = 0
+        for ch in pattern:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        self._out[node].append((len(pattern), payload))
+
+    def _build(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0) if node else 0
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def find(self, text: str) -> List[Tuple[int, int, Any]]:
+        """
+        Non-overlapping matches in normalized text, longest first
+
+        Returns:
+            List of (start, end, payload) ordered by position
+        """
+        haystack = ' ' + text
+        matches = []
+        node = 0
+        for i, ch in enumerate(haystack):
+            while node and ch not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(ch, 0)
+            for length, payload in self._out[node]:
+                matches.append((i + 1 - length, i + 1, payload))
+
+        # Longest first: "to predict" wins over the "predict" inside it
+        kept = []
+        for start, end, payload in sorted(matches, key=lambda m: (m[0] - m[1], m[0])):
+            if not any(s < end and start < e for s, e, _ in kept):
+                kept.append((start, end, payload))
+        return sorted(kept, key=lambda m: m[0])
+
+
+@lru_cache(maxsize=32)
+def _column_index(columns: Tuple[str, ...]) -> Tuple[Dict[str, str], Dict[str, str]]:
+    """
+    Lookup tables for a column list, cached per list
+
+    Returns:
+        Tuple of (normalized name -> column, distinctive word -> column)
+    """
+    index, word_columns = {}, {}
+    for col in columns:
+        normalized = _normalize(col)
+        if normalized:
+            index.setdefault(normalized, col)
+            index.setdefault(normalized.replace(' ', ''), col)
+            for word in set(normalized.split()):
+                if len(word) >= 3:
+                    word_columns.setdefault(word, set()).add(col)
+    words = {word: cols.pop() for word, cols in word_columns.items() if len(cols) == 1}
+    return index, words
+
+
+class LocalIntentClassifier:
+    """Classifies commands locally; low-confidence results are escalated by the caller"""
+
+    def __init__(self):
+        self._intents = PhraseAutomaton({
+            phrase: (intent, weight)
+            for intent, phrases in INTENT_PHRASES.items()
+            for phrase, weight in phrases.items()
+        })
+        self._model_types = PhraseAutomaton(MODEL_TYPE_PHRASES)
+
+    def classify(self, text: str, columns: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Classify a command
+
+        Args:
+            text: User's command
+            columns: Dataset columns to match the target column against
+
+        Returns:
+            Dictionary with intent, entities, confidence, needs_clarification
+            and classifier_ms
+        """
+        started = time.perf_counter()
+        normalized = _normalize(text)
+
+        scores = {}
+        matches = self._intents.find(normalized)
+        for i, (_, _, (intent, weight)) in enumerate(matches):
+            bonus = LEADING_BONUS if i == 0 and weight >= STRONG_WEIGHT else 0.0
+            scores[intent] = scores.get(intent, 0.0) + weight + bonus
+
+        entities = {}
+        model_match = self._model_types.find(normalized)
+        if model_match:
+            entities["model_type"] = model_match[0][2]
+            scores["TRAIN_MODEL"] = scores.get("TRAIN_MODEL", 0.0) + MODEL_TYPE_WEIGHT
+
+        ranked = sorted(scores.items(), key=lambda item: -item[1])
+        if ranked:
+            intent, top = ranked[0]
+            second = ranked[1][1] if len(ranked) > 1 else 0.0
+            # Strength of the evidence times the margin over the runner-up
+            confidence = min(1.0, top) * (0.5 + 0.5 * (top - second) / top)
+        else:
+            intent, confidence = "UNKNOWN", 0.0
+
+        if intent in ("TRAIN_MODEL", "PREDICT"):
+            target, mentioned = self._match_target(text, normalized, columns or [])
+            if target:
+                entities["target_column"] = target
+            elif mentioned:
+                # A target was named but isn't a known column: let the LLM resolve it
+                confidence *= 0.6
+
+        confidence = round(min(confidence, 0.95), 2)
+        return {
+            "intent": intent,
+            "entities": entities,
+            "confidence": confidence,
+            "needs_clarification": confidence < 0.5,
+            "classifier_ms": round((time.perf_counter() - started) * 1000, 3),
+        }
+
+    @staticmethod
+    def _match_target(text: str, normalized: str, columns: List[str]) -> Tuple[Optional[str], bool]:
+        """
+        Find the target column in a command
+
+        Returns:
+            Tuple of (column or None, whether the command seems to name a target)
+        """
+        quoted = re.search(r'["\']([^"\']+)["\']', text)
+        if quoted and (not columns or quoted.group(1) in columns):
+            return quoted.group(1), True
+
+        words = normalized.split()
+        cue_positions = []
+        for i, word in enumerate(words):
+            if word in TARGET_CUES:
+                start = i + 1
+                while start < len(words) and words[start] in FILLER_WORDS:
+                    start += 1
+                if start < len(words):
+                    cue_positions.append(start)
+        mentioned = bool(cue_positions)
+        if not columns:
+            # No dataset to check against: take the words after the cue as spoken
+            if not mentioned:
+                return None, False
+            return ' '.join(words[cue_positions[0]:cue_positions[0] + 3]), True
+
+        index, word_index = _column_index(tuple(map(str, columns)))
+        names = list(index)
+        # Fuzzy matching is the costly part: only try spans right after a cue when there is one
+        fuzzy_starts = set(cue_positions) if cue_positions else set(range(len(words)))
+        best = None  # (after a cue, score, length, column)
+        for n in (3, 2, 1):
+            for start in range(len(words) - n + 1):
+                span = ' '.join(words[start:start + n])
+                for candidate in (span, span.replace(' ', '')):
+                    if candidate in index:
+                        column, score = index[candidate], 1.0
+                    elif n == 1 and candidate in word_index:
+                        column, score = word_index[candidate], COLUMN_WORD_SCORE
+                    elif start in fuzzy_starts:
+                        close = get_close_matches(candidate, names, n=1, cutoff=COLUMN_MATCH_CUTOFF)
+                        if not close:
+                            continue
+                        column, score = index[close[0]], SequenceMatcher(None, candidate, close[0]).ratio()
+                    else:
+                        continue
+                    key = (start in cue_positions, score, n, column)
+                    if best is None or key[:3] > best[:3]:
+                        best = key
+        return (best[3] if best else None), mentioned
+
+
+# Singleton instance
+local_intent_classifier = LocalIntentClassifier()
@@ -1,12 +1,23 @@
 from app.services.data_service import DataService
 from app.core.groq_client import groq_client
+from app.config import settings
+from app.core.sessions import get_session_id
+from app.core.shared_state import shared_state_enabled, model_registry
+from app.utils.memory import get_rss_bytes
 from ml_engine.engines.model_trainer import ModelTrainer
-from typing import Dict, Any, Optional, List
+from ml_engine.engines.onnx_engine import export_to_onnx, OnnxPredictor
+from ml_engine.engines.explainer import PredictionExplainer
+from typing import Dict, Any, Optional, List, Tuple
+from collections import OrderedDict
+import threading
 import logging
+import gc
 import uuid
 import json
 import datetime
 import os
+import numpy as np
+import pandas as pd
 
 logger = logging.getLogger(__name__)
 
@@ -27,7 +38,11 @@ class MLService:
         if not hasattr(self, '_initialized'):
             self.data_service = DataService()
             self.groq = groq_client
-            self.jobs = {}  # Store training jobs
+            self.jobs = OrderedDict()  # Store training jobs, oldest first
+            self.onnx_models = {}  # job_id -> serialized ONNX pipeline (for download)
+            self.onnx_predictors = {}  # job_id -> OnnxPredictor
+            self.explainers = {}  # job_id -> PredictionExplainer
+            self._training_slots = threading.BoundedSemaphore(max(1, settings.TRAINING_CONCURRENCY))
             self._initialized = True
     
     def _log_experiment(self, job_data: Dict[str, Any]):
@@ -66,10 +81,15 @@ class MLService:
         model_types: Optional[List[str]] = None,
         test_size: float = 0.2,
         cv_folds: int = 5,
-        enable_tuning: bool = False
+        enable_tuning: bool = False,
+        keep_models: Optional[bool] = None
     ) -> Dict[str, Any]:
         """
         Start model training job
+        
+        Args:
+            keep_models: Retain every trained estimator instead of only the best
+                (defaults to settings.KEEP_ALL_MODELS)
         """
         try:
             logger.info(f"Starting model training for target: {target_column}, test_size: {test_size}, cv_folds: {cv_folds}, enable_tuning: {enable_tuning}")
@@ -92,7 +112,10 @@ class MLService:
             logger.info(f"Created job ID: {job_id}")
             
             # Create trainer and train
-            trainer = ModelTrainer()
+            if keep_models is None:
+                keep_models = settings.KEEP_ALL_MODELS
+            rss_before = get_rss_bytes()
+            trainer = ModelTrainer(keep_all_models=keep_models)
             logger.info("Training models...")
             results = trainer.train_all(
                 df, target_column, model_types, 
@@ -101,6 +124,7 @@ class MLService:
                 enable_tuning=enable_tuning
             )
             logger.info(f"Training complete. Trained {len(results['results'])} models")
+            rss_delta = max(0, get_rss_bytes() - rss_before)
             
             # Generate AI explanation
             explanation = self._generate_model_explanation(results)
@@ -145,16 +169,26 @@ class MLService:
             # Store job results (including trainer for later use)
             job_result = {
                 'job_id': job_id,
+                'session_id': get_session_id(),
                 'status': 'completed',
                 'target_column': target_column,
                 'results': clean_results,
                 'suggestions': suggestions,
                 'explanation': explanation,
+                'retained': True,
+                'memory': {
+                    'rss_delta_bytes': rss_delta,
+                    'artifact_bytes': trainer.estimate_memory_bytes(),
+                    'retained_models': list(trainer.models.keys()),
+                },
                 'trainer': trainer,  # Store trainer for later use (not returned in response)
             }
             
             self.jobs[job_id] = job_result
+            if shared_state_enabled():
+                model_registry.save(job_id, job_result)
             self._log_experiment(job_result) # Log to history
+            self._enforce_job_cap()
             logger.info(f"Job {job_id} completed and stored")
             
             # Return JSON-safe response (without trainer)
@@ -171,12 +205,301 @@ class MLService:
             logger.error(f"Model training error: {str(e)}", exc_info=True)
             raise
     
+    def run_training(self, **params) -> Dict[str, Any]:
+        """
+        Train on the configured queue (blocking)
+
+        With TRAINING_QUEUE="celery" the job runs on a Celery worker and is
+        read back from the model registry; otherwise it runs in this process,
+        at most TRAINING_CONCURRENCY at a time.
+
+        Args:
+            params: Keyword arguments of train_models
+        """
+        if settings.TRAINING_QUEUE == "celery":
+            from app.core.task_queue import celery_enabled, submit_training
+            if celery_enabled():
+                return submit_training(get_session_id(), params)
+            logger.warning("TRAINING_QUEUE is 'celery' but Celery is not configured, training locally")
+        
+        with self._training_slots:
+            return self.train_models(**params)
+    
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Job record (with trainer if retained) if it belongs to the calling session
+
+        A job another worker trained is loaded from the model registry and
+        counts against the retained-job caps like one trained here.
+        """
+        session_id = get_session_id()
+        job = self.jobs.get(job_id)
+        if job is None and shared_state_enabled():
+            job = model_registry.load(job_id)
+            if job is not None and job.get('session_id') == session_id:
+                self.jobs[job_id] = job
+                logger.info(f"Loaded job {job_id} from model registry")
+                self._enforce_job_cap()
+        if job is None or job.get('session_id') != session_id:
+            return None
+        return job
+    
+    def _enforce_job_cap(self):
+        """
+        Release the oldest retained jobs beyond the caps: settings.MAX_RETAINED_JOBS
+        for the calling session and settings.MAX_RETAINED_JOBS_TOTAL across sessions
+        """
+        session_id = get_session_id()
+        retained = [job_id for job_id, job in self.jobs.items() if job.get('retained')]
+        own = [job_id for job_id in retained if self.jobs[job_id].get('session_id') == session_id]
+        for job_id in own[:max(0, len(own) - settings.MAX_RETAINED_JOBS)]:
+            logger.info(f"Session retained job cap ({settings.MAX_RETAINED_JOBS}) reached, releasing {job_id}")
+            self._release(job_id)
+        
+        retained = [job_id for job_id in retained if self.jobs[job_id].get('retained')]
+        for job_id in retained[:max(0, len(retained) - settings.MAX_RETAINED_JOBS_TOTAL)]:
+            logger.info(f"Total retained job cap ({settings.MAX_RETAINED_JOBS_TOTAL}) reached, releasing {job_id}")
+            self._release(job_id)
+    
+    def release_job(self, job_id: str) -> Dict[str, Any]:
+        """
+        Free the trainer and per-model artifacts of a job, keeping a compact
+        summary of its results for the leaderboard
+        """
+        if self.get_job(job_id) is None:
+            raise ValueError(f"Job {job_id} not found")
+        return self._release(job_id)
+    
+    def _release(self, job_id: str) -> Dict[str, Any]:
+        """release_job without the session check, for cap eviction of any session's job"""
+        job = self.jobs[job_id]
+        if job.get('retained'):
+            job.pop('trainer', None)
+            self.onnx_models.pop(job_id, None)
+            self.onnx_predictors.pop(job_id, None)
+            self.explainers.pop(job_id, None)
+            job['retained'] = False
+            job['results'] = self._compact_results(job['results'])
+            job['memory'] = {'rss_delta_bytes': 0, 'artifact_bytes': 0, 'retained_models': []}
+            gc.collect()
+            if shared_state_enabled():
+                model_registry.save(job_id, job)
+            logger.info(f"Released job {job_id}")
+        
+        return {k: v for k, v in job.items() if k != 'trainer'}
+    
+    @staticmethod
+    def _compact_results(results: Dict[str, Any]) -> Dict[str, Any]:
+        """Strip per-model chart payloads, keeping scores and metrics"""
+        summary_keys = ['server', 'model_name', 'test_score', 'cv_score', 'metric_name', 'metrics']
+        
+        def compact(result):
+            return {k: result.get(k) for k in summary_keys}
+        
+        return {
+            **results,
+            'results': [compact(r) for r in results.get('results', [])],
+            'best_model': compact(results['best_model']) if results.get('best_model') else None,
+        }
+    
+    def release_session_jobs(self, session_id: str) -> int:
+        """Drop every job trained in a session, returns how many were removed"""
+        job_ids = [job_id for job_id, job in self.jobs.items() if job.get('session_id') == session_id]
+        for job_id in job_ids:
+            self._release(job_id)
+            del self.jobs[job_id]
+        if shared_state_enabled():
+            # Include jobs this worker never loaded
+            return max(len(job_ids), model_registry.delete_session(session_id))
+        return len(job_ids)
+    
+    def get_memory_report(self) -> Dict[str, Any]:
+        """Memory instrumentation for the current session's jobs"""
+        session_id = get_session_id()
+        jobs = [
+            {
+                'job_id': job_id,
+                'target_column': job['target_column'],
+                'retained': job.get('retained', False),
+                **job.get('memory', {}),
+            }
+            for job_id, job in self.jobs.items()
+            if job.get('session_id') == session_id
+        ]
+        return {
+            'process_rss_bytes': get_rss_bytes(),
+            'max_retained_jobs': settings.MAX_RETAINED_JOBS,
+            'max_retained_jobs_total': settings.MAX_RETAINED_JOBS_TOTAL,
+            'retained_jobs': sum(1 for j in jobs if j['retained']),
+            'jobs': jobs,
+        }
+    
+    def _get_trainer(self, job_id: str) -> ModelTrainer:
+        """Get the retained trainer of a job"""
+        job = self.get_job(job_id)
+        if not job:
+            raise ValueError(f"Job {job_id} not found")
+        trainer = job.get('trainer')
+        if not trainer:
+            raise ValueError("No trainer found for this job")
+        return trainer
+    
+    def export_onnx(self, job_id: str) -> bytes:
+        """Export the best model of a job with its preprocessing as ONNX"""
+        if job_id not in self.onnx_models:
+            self.onnx_models[job_id] = export_to_onnx(self._get_trainer(job_id))
+        return self.onnx_models[job_id]
+    
+    def get_onnx_predictor(self, job_id: str) -> OnnxPredictor:
+        """Get (or build) the ONNX Runtime session for a job"""
+        if job_id not in self.onnx_predictors:
+            # Model-only graph: preprocessing stays in float64 numpy for exact parity
+            onnx_bytes = export_to_onnx(self._get_trainer(job_id), include_preprocessing=False)
+            self.onnx_predictors[job_id] = OnnxPredictor(
+                onnx_bytes,
+                intra_op_threads=settings.ONNX_INTRA_OP_THREADS
+            )
+        return self.onnx_predictors[job_id]
+    
+    def predict(
+        self,
+        job_id: str,
+        X: np.ndarray,
+        backend: Optional[str] = None
+    ) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """
+        Predict with the best model of a job
+        
+        Args:
+            job_id: Training job ID
+            X: Label-encoded, unscaled features in training column order
+            backend: 'native' or 'onnx' (defaults to settings.INFERENCE_BACKEND)
+            
+        Returns:
+            Tuple of (decoded predictions, class probabilities or None)
+        """
+        backend = backend or settings.INFERENCE_BACKEND
+        trainer = self._get_trainer(job_id)
+        X = np.atleast_2d(np.asarray(X, dtype=float))
+        
+        if backend == 'onnx':
+            predictions, probabilities = self.get_onnx_predictor(job_id).predict(trainer.preprocess(X))
+        elif backend == 'native':
+            model = trainer.get_best_model_server().trained_model
+            X_scaled = trainer.preprocess(X)
+            predictions = model.predict(X_scaled)
+            probabilities = None
+            if hasattr(model, 'predict_proba'):
+                try:
+                    probabilities = model.predict_proba(X_scaled)
+                except Exception:
+                    pass
+        else:
+            raise ValueError(f"Unknown inference backend: {backend}. Use 'native' or 'onnx'")
+        
+        # Decode labels if encoder exists
+        if trainer.label_encoder is not None:
+            try:
+                predictions = trainer.label_encoder.inverse_transform(np.asarray(predictions).astype(int))
+            except Exception:
+                pass
+        
+        return predictions, probabilities
+
+    def get_explainer(self, job_id: str) -> PredictionExplainer:
+        """Get (or build) the cached SHAP explainer for a job's best model"""
+        if job_id not in self.explainers:
+            trainer = self._get_trainer(job_id)
+            model = trainer.get_best_model_server().trained_model
+            self.explainers[job_id] = PredictionExplainer(model, trainer.background)
+            logger.info(f"Built {self.explainers[job_id].kind} SHAP explainer for job {job_id}")
+        return self.explainers[job_id]
+    
+    def explain_rows(self, job_id: str, X: np.ndarray, top_k: int = 10) -> List[Dict[str, Any]]:
+        """
+        Explain predictions for a block of rows
+        
+        Args:
+            job_id: Training job ID
+            X: Label-encoded, unscaled features in training column order
+            top_k: Number of features to return per row, by |SHAP value|
+            
+        Returns:
+            One dict per row with base_value and the top contributions
+        """
+        trainer = self._get_trainer(job_id)
+        X = np.atleast_2d(np.asarray(X, dtype=float))
+        if X.shape[1] != len(trainer.feature_names):
+            raise ValueError(f"Expected {len(trainer.feature_names)} features, got {X.shape[1]}")
+        
+        explanation = self.get_explainer(job_id).explain(trainer.preprocess(X))
+        shap_values = explanation['shap_values']
+        
+        rows = []
+        for i in range(len(X)):
+            order = np.argsort(-np.abs(shap_values[i]))[:top_k]
+            rows.append({
+                'base_value': float(explanation['base_values'][i]),
+                'explanations': [
+                    {
+                        'feature': trainer.feature_names[j],
+                        'value': float(X[i, j]),
+                        'shap_value': float(shap_values[i, j]),
+                        'contribution': 'positive' if shap_values[i, j] > 0 else 'negative'
+                    }
+                    for j in order
+                ]
+            })
+        return rows
+    
+    def predict_frame(
+        self,
+        job_id: str,
+        df: pd.DataFrame,
+        backend: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Predict a block of raw rows in one pass
+
+        Args:
+            job_id: Training job ID
+            df: Raw feature columns (categoricals as strings, any column order)
+            backend: 'native' or 'onnx' (defaults to settings.INFERENCE_BACKEND)
+
+        Returns:
+            Dict with predictions, probabilities, class labels and the
+            training features absent from df (imputed with training means)
+        """
+        trainer = self._get_trainer(job_id)
+
+        missing_columns = [c for c in trainer.feature_names if c not in df.columns]
+        if len(missing_columns) == len(trainer.feature_names):
+            raise ValueError(f"None of the training features were provided. Expected: {trainer.feature_names}")
+
+        X = trainer.encode_features(df)
+        predictions, probabilities = self.predict(job_id, X, backend)
+
+        classes = None
+        if probabilities is not None:
+            if trainer.label_encoder is not None:
+                classes = list(trainer.label_encoder.classes_)
+            else:
+                model = trainer.get_best_model_server().trained_model
+                classes = list(getattr(model, 'classes_', [])) or None
+
+        return {
+            'predictions': predictions,
+            'probabilities': probabilities,
+            'classes': classes,
+            'missing_columns': missing_columns
+        }
+
     def get_job_status(self, job_id: str) -> Dict[str, Any]:
         """Get training job status"""
-        if job_id not in self.jobs:
+        job = self.get_job(job_id)
+        if job is None:
             raise ValueError(f"Job {job_id} not found")
         
-        job = self.jobs[job_id]
         return {
             'job_id': job_id,
             'status': job['status'],
@@ -185,10 +508,10 @@ class MLService:
     
     def get_job_results(self, job_id: str) -> Dict[str, Any]:
         """Get complete job results"""
-        if job_id not in self.jobs:
+        job = self.get_job(job_id)
+        if job is None:
             raise ValueError(f"Job {job_id} not found")
         
-        job = self.jobs[job_id]
         
         # Remove trainer from response (not JSON serializable)
         response = {k: v for k, v in job.items() if k != 'trainer'}
@@ -220,7 +543,7 @@ Provide a brief explanation (3-4 sentences) covering:
 Be encouraging and helpful."""
 
             messages = [{"role": "user", "content": prompt}]
-            explanation = self.groq.chat_completion(messages, temperature=0.7)
+            explanation = self.groq.chat_completion(messages, temperature=0.7, cache=True)
             
             return explanation if explanation else "Model training completed successfully."
             
@@ -4,6 +4,8 @@ Handles intent parsing and execution for AutoML voice commands
 """
 
 from app.core.groq_client import groq_client
+from app.config import settings
+from app.services.intent_classifier import local_intent_classifier
 import logging
 import json
 import re
@@ -31,18 +33,6 @@ class NLUService:
         "UNKNOWN"
     ]
     
-    # Intent keywords for fallback parsing
-    INTENT_KEYWORDS = {
-        "ANALYZE_DATA": ["analyze", "analysis", "explore", "show", "display", "visualize", "statistics", "stats", "summary"],
-        "TRAIN_MODEL": ["train", "build", "create model", "fit", "learn", "develop model"],
-        "EXPLAIN_MODEL": ["explain", "why", "how does", "interpret", "feature importance", "what affects"],
-        "UPLOAD_DATA": ["upload", "load", "import", "add data", "bring data", "use dataset"],
-        "PREDICT": ["predict", "forecast", "estimate", "what will", "prediction"],
-        "HELP": ["help", "how to", "what can", "guide", "tutorial", "show me how"],
-        "VIEW_RESULTS": ["results", "show results", "what happened", "outcome", "performance"],
-        "COMPARE_MODELS": ["compare", "which is better", "best model", "difference between"]
-    }
-    
     def __init__(self):
         """Initialize NLU Service"""
         if groq_client is None:
@@ -52,7 +42,10 @@ class NLUService:
     
     def parse_intent(self, text: str) -> Dict[str, Any]:
         """
-        Parse user intent from text using LLM
+        Parse user intent from text
+        
+        Clear commands are classified locally (see intent_classifier); only
+        ambiguous ones are sent to the LLM.
         
         Args:
             text: User's transcribed speech
@@ -74,6 +67,11 @@ class NLUService:
                     "original_text": text
                 }
             
+            # Fast path: no LLM round trip for unambiguous commands
+            local_result = self._classify_locally(text)
+            if local_result is not None:
+                return local_result
+            
             # Use Groq LLM to parse intent
             prompt = self._build_intent_prompt(text)
             messages = [{"role": "user", "content": prompt}]
@@ -82,7 +80,9 @@ class NLUService:
             response = self.client.chat_completion(
                 messages=messages,
                 temperature=0.1,  # Low temperature for consistent parsing
-                max_tokens=500
+                max_tokens=500,
+                cache=True,
+                fuzzy_text=text
             )
             
             logger.info(f"LLM raw response: {response}")
@@ -92,6 +92,7 @@ class NLUService:
             
             # Validate and enrich the parsed data
             result = self._validate_intent_data(intent_data, text)
+            result["source"] = "llm"
             
             logger.info(f"✓ Parsed intent: {result['intent']} (confidence: {result['confidence']:.2f})")
             return result
@@ -100,6 +101,32 @@ class NLUService:
             logger.error(f"Intent parsing error: {e}", exc_info=True)
             return self._fallback_parse(text)
     
+    def _classify_locally(self, text: str) -> Optional[Dict[str, Any]]:
+        """Local classification if it is confident enough to skip the LLM, else None"""
+        if not settings.NLU_LOCAL_INTENT_ENABLED:
+            return None
+        
+        local = local_intent_classifier.classify(text, self._get_columns())
+        if local["confidence"] < settings.NLU_LOCAL_CONFIDENCE:
+            logger.info(f"Local intent {local['intent']} ({local['confidence']:.2f}) not confident, asking LLM")
+            return None
+        
+        result = self._validate_intent_data(local, text)
+        result["source"] = "local"
+        result["classifier_ms"] = local["classifier_ms"]
+        logger.info(f"✓ Parsed intent locally: {result['intent']} "
+                    f"(confidence: {result['confidence']:.2f}, {local['classifier_ms']:.2f} ms)")
+        return result
+    
+    @staticmethod
+    def _get_columns() -> List[str]:
+        """Columns of the current dataset, for target column matching"""
+        from app.services.data_service import DataService
+        try:
+            return DataService().get_columns()
+        except Exception:
+            return []
+    
     def _build_intent_prompt(self, text: str) -> str:
         """Build the LLM prompt for intent parsing"""
         return f"""You are an AI assistant for an AutoML platform that helps users analyze data and build machine learning models.
@@ -212,57 +239,24 @@ Return ONLY a valid JSON object in this exact format (no markdown, no explanatio
     
     def _fallback_parse(self, text: str) -> Dict[str, Any]:
         """
-        Fallback intent parsing using keyword matching
+        Fallback intent parsing with the local classifier
         Used when LLM parsing fails
         """
-        logger.info("Using fallback keyword-based intent parsing")
-        text_lower = text.lower()
-        
-        # Find matching intent based on keywords
-        best_intent = "UNKNOWN"
-        best_confidence = 0.0
-        
-        for intent, keywords in self.INTENT_KEYWORDS.items():
-            matches = sum(1 for keyword in keywords if keyword in text_lower)
-            if matches > 0:
-                confidence = min(0.7, 0.4 + (matches * 0.1))
-                if confidence > best_confidence:
-                    best_confidence = confidence
-                    best_intent = intent
-        
-        # Extract basic entities using regex
-        entities = self._extract_basic_entities(text)
+        logger.info("Using fallback local intent parsing")
+        local = local_intent_classifier.classify(text, self._get_columns())
         
         return {
-            "intent": best_intent,
-            "entities": entities,
-            "confidence": best_confidence,
-            "needs_clarification": best_confidence < 0.5,
+            "intent": local["intent"],
+            "entities": local["entities"],
+            "confidence": local["confidence"],
+            "needs_clarification": local["confidence"] < 0.5,
             "clarification_question": "I'm not quite sure what you want to do. Could you rephrase that?",
             "original_text": text,
             "fallback_used": True,
+            "source": "local",
             "timestamp": self._get_timestamp()
         }
     
-    def _extract_basic_entities(self, text: str) -> Dict[str, Any]:
-        """Extract basic entities using pattern matching"""
-        entities = {}
-        
-        # Look for column names in quotes
-        column_match = re.search(r'["\']([^"\']+)["\']', text)
-        if column_match:
-            entities["target_column"] = column_match.group(1)
-        
-        # Look for common model types
-        model_types = ["xgboost", "random forest", "linear regression", 
-                      "logistic regression", "neural network", "svm"]
-        for model in model_types:
-            if model in text.lower():
-                entities["model_type"] = model
-                break
-        
-        return entities
-    
     def execute_intent(self, intent_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Execute the parsed intent by calling appropriate services
@@ -292,7 +286,7 @@ Return ONLY a valid JSON object in this exact format (no markdown, no explanatio
             data_required_intents = ['ANALYZE_DATA', 'TRAIN_MODEL', 'PREDICT', 'VIEW_RESULTS']
             if intent in data_required_intents:
                 data_service = DataService()
-                if not data_service.has_data():
+                if not data_service.get_columns():
                     return {
                         'success': False,
                         'needs_input': True,
@@ -386,7 +380,7 @@ Return ONLY a valid JSON object in this exact format (no markdown, no explanatio
             try:
                 from app.services.data_service import DataService
                 data_service = DataService()
-                columns = data_service.get_column_names()
+                columns = data_service.get_columns()
                 
                 clarification = intent_data.get(
                     'clarification_question',
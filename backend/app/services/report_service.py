@@ -0,0 +1,337 @@
+"""
+EDA report jobs
+Reports are generated in the background and stored as PDFs under
+DATA_CACHE_DIR/reports. A report is identified by its session, dataset
+version and options, so repeated requests share one job and one file.
+"""
+from app.config import settings
+from app.core.groq_client import groq_client
+from app.core.sessions import get_session_id
+from app.services.analysis_service import AnalysisService
+from app.services.data_service import DataService
+from app.utils.pdf_generator import generate_eda_pdf, render_report_charts
+from ml_engine.engines.correlation import correlation_matrix, top_correlations
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Any, Optional
+import contextvars
+import threading
+import hashlib
+import logging
+import json
+import time
+import os
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Progress reached when each stage starts
+REPORT_STAGES = {"queued": 0.0, "summary": 0.05, "ai_analysis": 0.2, "charts": 0.5, "pdf": 0.85}
+
+# Reports are built on threads: the chart rendering itself runs in the chart
+# process pool and the AI analysis waits on the network
+_report_executor = None
+
+
+def _get_report_executor() -> ThreadPoolExecutor:
+    """Lazily start the report job threads"""
+    global _report_executor
+    if _report_executor is None:
+        _report_executor = ThreadPoolExecutor(
+            max_workers=settings.REPORT_WORKERS, thread_name_prefix="report"
+        )
+    return _report_executor
+
+
+def shutdown_report_executor():
+    """Stop the report job threads (called on app shutdown)"""
+    global _report_executor
+    if _report_executor is not None:
+        _report_executor.shutdown(wait=False, cancel_futures=True)
+        _report_executor = None
+
+
+def summarize_dataset(df: pd.DataFrame, corr: Optional[pd.DataFrame] = None) -> Dict[str, Any]:
+    """
+    Descriptive statistics, missing values and top correlations for the report
+
+    Args:
+        df: Dataset
+        corr: Correlation matrix of the numeric columns, when already computed
+    """
+    description = df.describe().to_dict()
+    missing = df.isnull().sum().to_dict()
+
+    # Calculate correlations for context
+    if corr is None:
+        corr = correlation_matrix(df, df.select_dtypes(include=[np.number]).columns)
+    # Top pairs, keyed by string for JSON serialization
+    correlations = {f"{col1} vs {col2}": abs(r) for col1, col2, r in top_correlations(corr, k=5)}
+
+    return {'description': description, 'missing': missing, 'correlations': correlations}
+
+
+def generate_ai_analysis(df: pd.DataFrame, summary: Dict[str, Any]) -> str:
+    """Executive summary written by the LLM from the dataset summary"""
+    try:
+        prompt = f"""
+        You are an expert Senior Data Scientist. Write a detailed Exploratory Data Analysis (EDA) report based on this dataset summary:
+
+        Dataset Info: {len(df)} rows, {len(df.columns)} columns.
+        Columns: {', '.join(map(str, df.columns))}
+
+        Descriptive Statistics:
+        {json.dumps(summary['description'], indent=2, default=str)}
+
+        Missing Values:
+        {json.dumps(summary['missing'], indent=2, default=str)}
+
+        Top Correlations (Absolute Values):
+        {json.dumps(summary['correlations'], indent=2, default=str)}
+
+        Instructions:
+        1. Write a comprehensive "Executive Summary" analyzing the data quality, distributions, and relationships.
+        2. Specifically explain what the charts (Distribution, Heatmap, Boxplots) would likely show based on these stats.
+        3. Highlight any anomalies, outliers, or strong relationships.
+        4. Use professional, markdown-free formatting (paragraphs only).
+        5. Keep it under 400 words.
+        """
+
+        response = groq_client.chat_completion([
+            {"role": "system", "content": "You are a helpful data science assistant."},
+            {"role": "user", "content": prompt}
+        ], cache=True)
+        return response or "AI Analysis unavailable."
+
+    except Exception as e:
+        logger.error(f"AI Report Generation Failed: {e}")
+        return f"Could not generate AI analysis due to an error: {str(e)}"
+
+
+class ReportService:
+    """
+    Background EDA report generation with deduplicated, downloadable artifacts
+
+    Each finished report is a PDF plus a JSON sidecar with its metadata, so
+    any worker process sharing DATA_CACHE_DIR can report its status and serve it.
+    """
+
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(ReportService, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        if not hasattr(self, '_initialized'):
+            self.data_service = DataService()
+            self.root = settings.DATA_CACHE_DIR / "reports"
+            self.root.mkdir(parents=True, exist_ok=True)
+            self.jobs: Dict[str, Dict[str, Any]] = {}  # report_id -> job, in this process
+            self._lock = threading.Lock()
+            self._initialized = True
+
+    @staticmethod
+    def report_id(session_id: str, version: int, options: Dict[str, Any]) -> str:
+        """Identifier shared by every request for the same dataset version and options"""
+        key = f"{session_id}|{version}|{json.dumps(options, sort_keys=True)}"
+        return hashlib.sha1(key.encode()).hexdigest()[:24]
+
+    def pdf_path(self, report_id: str) -> Path:
+        return self.root / f"{report_id}.pdf"
+
+    def _meta_path(self, report_id: str) -> Path:
+        return self.root / f"{report_id}.json"
+
+    def submit(self, include_ai_analysis: bool = True) -> Dict[str, Any]:
+        """
+        Start generating a report of the current dataset, or return the existing one
+
+        Args:
+            include_ai_analysis: Add the LLM-written executive summary
+
+        Returns:
+            Report status (see get_status)
+
+        Raises:
+            ValueError: If no dataset is loaded
+        """
+        df = self.data_service.get_dataframe(copy=False)
+        session_id = get_session_id()
+        version = self.data_service.get_version()
+        options = {'include_ai_analysis': bool(include_ai_analysis)}
+        report_id = self.report_id(session_id, version, options)
+
+        with self._lock:
+            job = self.jobs.get(report_id)
+            if job is not None and job['status'] != 'failed':
+                return self._public(job)
+            stored = self._load_meta(report_id)
+            if stored is not None:
+                return self._public(stored)
+
+            job = {
+                'report_id': report_id,
+                'session_id': session_id,
+                'dataset_version': version,
+                'options': options,
+                'status': 'queued',
+                'stage': 'queued',
+                'progress': 0.0,
+                'error': None,
+                'created_at': time.time(),
+                'completed_at': None,
+                'size_bytes': None,
+                'done': threading.Event(),
+            }
+            self.jobs[report_id] = job
+
+        # The job thread runs in the caller's session context
+        context = contextvars.copy_context()
+        _get_report_executor().submit(context.run, self._run, job, df)
+        logger.info(f"Queued report {report_id} for session {session_id} (dataset v{version})")
+        return self._public(job)
+
+    def get_status(self, report_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Status of a report of the calling session
+
+        Returns:
+            Dictionary with report_id, status (queued, running, completed or
+            failed), stage, progress, error and size_bytes, or None if unknown
+        """
+        job = self.jobs.get(report_id) or self._load_meta(report_id)
+        if job is None or job['session_id'] != get_session_id():
+            return None
+        return self._public(job)
+
+    def wait(self, report_id: str, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Block until a report finishes, returns its status"""
+        job = self.jobs.get(report_id)
+        if job is not None:
+            job['done'].wait(timeout)
+        return self.get_status(report_id)
+
+    def get_artifact(self, report_id: str) -> Path:
+        """
+        Path of a finished report of the calling session
+
+        Raises:
+            ValueError: If the report is unknown or not finished
+        """
+        status = self.get_status(report_id)
+        if status is None:
+            raise ValueError(f"Report {report_id} not found")
+        if status['status'] != 'completed':
+            raise ValueError(f"Report {report_id} is {status['status']}")
+        path = self.pdf_path(report_id)
+        if not path.exists():
+            raise ValueError(f"Report {report_id} not found")
+        return path
+
+    def delete_session(self, session_id: str) -> int:
+        """Delete every report of a session, returns how many were removed"""
+        removed = 0
+        with self._lock:
+            for report_id in [rid for rid, job in self.jobs.items() if job['session_id'] == session_id]:
+                if self.jobs[report_id]['status'] in ('completed', 'failed'):
+                    self.jobs.pop(report_id)
+            for meta_path in self.root.glob("*.json"):
+                meta = self._read_json(meta_path)
+                if meta and meta.get('session_id') == session_id:
+                    self.pdf_path(meta_path.stem).unlink(missing_ok=True)
+                    meta_path.unlink(missing_ok=True)
+                    removed += 1
+        return removed
+
+    def _run(self, job: Dict[str, Any], df: pd.DataFrame):
+        report_id = job['report_id']
+        started = time.perf_counter()
+        job['status'] = 'running'
+        try:
+            self._stage(job, 'summary')
+            # The correlation matrix is shared with the analysis endpoints
+            summary = summarize_dataset(df, AnalysisService().correlations(df))
+
+            analysis_results = {
+                'descriptive_stats': summary['description'],
+                'data_quality': {
+                    'quality_score': 'N/A',
+                    'missing_values': summary['missing']
+                },
+            }
+            if job['options']['include_ai_analysis']:
+                self._stage(job, 'ai_analysis')
+                analysis_results['ai_analysis'] = generate_ai_analysis(df, summary)
+
+            # Rendering first puts every chart in the chart cache, the PDF then reuses them
+            dataset_key = f"{job['session_id']}_v{job['dataset_version']}"
+            self._stage(job, 'charts')
+            render_report_charts(df, dataset_key)
+
+            self._stage(job, 'pdf')
+            pdf = generate_eda_pdf(df, analysis_results, dataset_key=dataset_key).getvalue()
+
+            path = self.pdf_path(report_id)
+            tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+            tmp_path.write_bytes(pdf)
+            os.replace(tmp_path, path)
+
+            job.update(status='completed', stage='done', progress=1.0,
+                       completed_at=time.time(), size_bytes=len(pdf))
+            self._write_meta(job)
+            self._prune()
+            logger.info(f"Report {report_id} ready ({len(pdf)} bytes) in {time.perf_counter() - started:.2f}s")
+        except Exception as e:
+            logger.error(f"Report {report_id} failed: {e}", exc_info=True)
+            job.update(status='failed', error=str(e), completed_at=time.time())
+        finally:
+            job['done'].set()
+
+    @staticmethod
+    def _stage(job: Dict[str, Any], stage: str):
+        job['stage'] = stage
+        job['progress'] = REPORT_STAGES[stage]
+
+    @staticmethod
+    def _public(job: Dict[str, Any]) -> Dict[str, Any]:
+        status = {k: v for k, v in job.items() if k not in ('done', 'session_id')}
+        if status['status'] == 'completed':
+            status['download_url'] = f"/api/data/reports/{job['report_id']}/download"
+        return status
+
+    def _write_meta(self, job: Dict[str, Any]):
+        meta = {k: v for k, v in job.items() if k != 'done'}
+        tmp_path = self._meta_path(job['report_id']).with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps(meta))
+        os.replace(tmp_path, self._meta_path(job['report_id']))
+
+    @staticmethod
+    def _read_json(path: Path) -> Optional[Dict[str, Any]]:
+        try:
+            return json.loads(path.read_text())
+        except (OSError, ValueError):
+            return None
+
+    def _load_meta(self, report_id: str) -> Optional[Dict[str, Any]]:
+        """Finished report stored by this or another worker process"""
+        meta = self._read_json(self._meta_path(report_id))
+        if meta is None or not self.pdf_path(report_id).exists():
+            return None
+        return meta
+
+    def _prune(self):
+        """Delete the oldest reports beyond REPORT_MAX_ARTIFACTS"""
+        reports = sorted(self.root.glob("*.pdf"), key=lambda p: p.stat().st_mtime)
+        for path in reports[:max(0, len(reports) - settings.REPORT_MAX_ARTIFACTS)]:
+            self._meta_path(path.stem).unlink(missing_ok=True)
+            path.unlink(missing_ok=True)
+            with self._lock:
+                self.jobs.pop(path.stem, None)
+
+
+# Singleton instance
+report_service = ReportService()
@@ -1,7 +1,10 @@
 import os
+import asyncio
 import logging
 import httpx
 
+from app.core.groq_client import groq_client
+
 logger = logging.getLogger(__name__)
 
 class VoiceService:
@@ -14,6 +17,7 @@ class VoiceService:
             raise ValueError("GROQ_API_KEY environment variable is required")
         
         self.api_url = "https://api.groq.com/openai/v1/audio/transcriptions"
+        self.http = httpx.Client(timeout=60.0)  # Reused so calls keep their connection
         logger.info("Voice service initialized with Groq Whisper API")
 
     def transcribe(self, audio_file_path: str) -> str:
@@ -77,13 +81,12 @@ class VoiceService:
             
             logger.info(f"Sending to Groq Whisper API...")
             
-            with httpx.Client(timeout=60.0) as client:
-                response = client.post(
-                    self.api_url,
-                    files=files,
-                    data=data,
-                    headers=headers
-                )
+            response = self.http.post(
+                self.api_url,
+                files=files,
+                data=data,
+                headers=headers
+            )
             
             if response.status_code != 200:
                 error_text = response.text
@@ -102,4 +105,34 @@ class VoiceService:
             raise Exception("Transcription request timed out. Please try again.")
         except Exception as e:
             logger.error(f"Transcription error: {e}", exc_info=True)
-            raise Exception(f"Transcription failed: {str(e)}")
\ No newline at end of file
+            raise Exception(f"Transcription failed: {str(e)}")
+    
+    async def atranscribe(self, audio_data: bytes, filename: str) -> str:
+        """
+        Transcribe uploaded audio straight from memory (no temp file)
+        Uses the pooled async Groq client, so the event loop is never blocked
+        
+        Args:
+            audio_data: Encoded audio bytes
+            filename: Original file name; its extension tells Whisper the format
+            
+        Returns:
+            Transcribed text
+        """
+        if not audio_data:
+            raise ValueError("Audio file is empty")
+        
+        if not os.path.splitext(filename or '')[1]:
+            filename = f"{filename or 'audio'}.webm"
+        
+        try:
+            logger.info(f"Transcribing {len(audio_data)} bytes of audio ({filename})")
+            transcription = await groq_client.atranscribe_audio(audio_data, filename)
+            logger.info(f"Transcription successful: {transcription}")
+            return transcription
+        except (asyncio.TimeoutError, httpx.TimeoutException):
+            logger.error("Transcription request timed out")
+            raise Exception("Transcription request timed out. Please try again.")
+        except Exception as e:
+            logger.error(f"Transcription error: {e}", exc_info=True)
+            raise Exception(f"Transcription failed: {str(e)}")
@@ -0,0 +1,199 @@
+"""
+Streaming speech input
+Energy-based voice activity detection splits a live PCM stream into speech
+segments, which are transcribed as soon as each one ends (partials are
+transcribed from the segment recorded so far)
+"""
+from app.config import settings
+from app.core.groq_client import groq_client
+from collections import deque
+from fastapi.concurrency import run_in_threadpool
+from typing import List, Optional, Tuple
+import threading
+import logging
+import wave
+import io
+
+import numpy as np
+
+try:
+    from faster_whisper import WhisperModel
+    FASTER_WHISPER_AVAILABLE = True
+except ImportError:
+    FASTER_WHISPER_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Audio frames are 16-bit little-endian mono PCM
+SAMPLE_WIDTH = 2
+FRAME_MS = 30
+# Consecutive loud frames that open a segment, and audio kept from before it
+START_FRAMES = 3
+PRE_ROLL_MS = 300
+# Speech must be this many times louder than the tracked noise floor
+SPEECH_RATIO = 3.0
+MIN_SPEECH_RMS = 300.0
+
+
+def pcm_to_wav(pcm: bytes, sample_rate: int) -> bytes:
+    """Wrap raw 16-bit mono PCM in a WAV container"""
+    buf = io.BytesIO()
+    with wave.open(buf, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(SAMPLE_WIDTH)
+        wav.setframerate(sample_rate)
+        wav.writeframes(pcm)
+    return buf.getvalue()
+
+
+class SpeechSegmenter:
+    """
+    Voice activity detector that turns a PCM stream into speech segments
+
+    A frame is speech when its RMS energy is SPEECH_RATIO times above the
+    noise floor, which adapts while nobody is speaking. A segment opens after
+    START_FRAMES speech frames (with PRE_ROLL_MS of audio before them) and
+    closes after end_silence_ms of silence or max_segment_seconds.
+    """
+
+    def __init__(
+        self,
+        sample_rate: int = 16000,
+        end_silence_ms: Optional[int] = None,
+        max_segment_seconds: Optional[float] = None
+    ):
+        self.sample_rate = sample_rate
+        self.frame_bytes = sample_rate * FRAME_MS // 1000 * SAMPLE_WIDTH
+        end_silence_ms = end_silence_ms or settings.VOICE_STREAM_END_SILENCE_MS
+        max_segment_seconds = max_segment_seconds or settings.VOICE_STREAM_MAX_SEGMENT_SECONDS
+        self.end_frames = max(1, end_silence_ms // FRAME_MS)
+        self.max_frames = max(1, int(max_segment_seconds * 1000 // FRAME_MS))
+
+        self._pending = b''
+        self._pre_roll = deque(maxlen=PRE_ROLL_MS // FRAME_MS)
+        self._noise = None
+        self._loud_run = 0
+        self._segment: Optional[List[bytes]] = None
+        self._silence = 0
+
+    @property
+    def in_speech(self) -> bool:
+        return self._segment is not None
+
+    @property
+    def current_bytes(self) -> int:
+        """Length of the segment being recorded"""
+        return len(self._segment) * self.frame_bytes if self._segment else 0
+
+    def current(self) -> bytes:
+        """Audio of the segment being recorded, empty when nobody is speaking"""
+        return b''.join(self._segment) if self._segment else b''
+
+    def feed(self, pcm: bytes) -> List[Tuple[str, bytes]]:
+        """
+        Add audio and run the detector over every complete frame
+
+        Returns:
+            Events in order: ("start", b"") when speech begins and
+            ("end", segment_pcm) when a segment is complete
+        """
+        data = self._pending + pcm
+        usable = len(data) - len(data) % self.frame_bytes
+        self._pending = data[usable:]
+        if not usable:
+            return []
+
+        samples = np.frombuffer(data[:usable], dtype='<i2').astype(np.float32)
+        energies = np.sqrt(np.mean(samples.reshape(-1, self.frame_bytes // SAMPLE_WIDTH) ** 2, axis=1))
+
+        events = []
+        for i, rms in enumerate(energies):
+            frame = data[i * self.frame_bytes:(i + 1) * self.frame_bytes]
+            if self._noise is None:
+                self._noise = float(rms)
+            is_speech = rms > max(MIN_SPEECH_RMS, self._noise * SPEECH_RATIO)
+
+            if self._segment is None:
+                self._noise = 0.95 * self._noise + 0.05 * float(rms)
+                self._pre_roll.append(frame)
+                self._loud_run = self._loud_run + 1 if is_speech else 0
+                if self._loud_run >= START_FRAMES:
+                    self._segment = list(self._pre_roll)
+                    self._pre_roll.clear()
+                    self._silence = 0
+                    events.append(("start", b''))
+                continue
+
+            self._segment.append(frame)
+            self._silence = 0 if is_speech else self._silence + 1
+            if self._silence >= self.end_frames or len(self._segment) >= self.max_frames:
+                events.append(("end", self._close()))
+        return events
+
+    def flush(self) -> Optional[bytes]:
+        """End the stream: the open segment (if any) is returned as complete"""
+        self._pending = b''
+        if self._segment is None:
+            return None
+        return self._close()
+
+    def _close(self) -> bytes:
+        # Keep a little trailing silence, Whisper cuts words short without it
+        keep = len(self._segment) - max(0, self._silence - 100 // FRAME_MS)
+        pcm = b''.join(self._segment[:keep])
+        self._segment = None
+        self._loud_run = 0
+        self._silence = 0
+        return pcm
+
+
+class SegmentTranscriber:
+    """
+    Transcribes speech segments with Groq Whisper, or with a local
+    faster-whisper model when VOICE_STREAM_TRANSCRIBER="local"
+    """
+
+    def __init__(self):
+        self._local_model = None
+        self._lock = threading.Lock()
+
+    @property
+    def backend(self) -> str:
+        if settings.VOICE_STREAM_TRANSCRIBER == "local" and FASTER_WHISPER_AVAILABLE:
+            return "local"
+        return "groq"
+
+    def _get_local_model(self):
+        with self._lock:
+            if self._local_model is None:
+                logger.info(f"Loading local Whisper model {settings.VOICE_STREAM_LOCAL_MODEL}")
+                self._local_model = WhisperModel(
+                    settings.VOICE_STREAM_LOCAL_MODEL, device="cpu", compute_type="int8"
+                )
+            return self._local_model
+
+    def _transcribe_local(self, pcm: bytes) -> str:
+        audio = np.frombuffer(pcm, dtype='<i2').astype(np.float32) / 32768.0
+        segments, _ = self._get_local_model().transcribe(audio, language="en", beam_size=1)
+        return ' '.join(segment.text.strip() for segment in segments).strip()
+
+    async def transcribe(self, pcm: bytes, sample_rate: int) -> str:
+        """
+        Transcribe raw PCM audio
+
+        Args:
+            pcm: 16-bit mono PCM (the local model expects 16 kHz)
+            sample_rate: Sample rate of pcm
+
+        Returns:
+            Transcribed text
+        """
+        if not pcm:
+            return ''
+        if self.backend == "local" and sample_rate == 16000:
+            return await run_in_threadpool(self._transcribe_local, pcm)
+        return await groq_client.atranscribe_audio(pcm_to_wav(pcm, sample_rate), "segment.wav")
+
+
+# Singleton instance
+segment_transcriber = SegmentTranscriber()
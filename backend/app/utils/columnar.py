@@ -0,0 +1,139 @@
+"""
+Columnar payload helpers for multi-row prediction
+Supports a JSON column map and Arrow IPC streams, plus on-disk frame files
+that other processes can memory-map
+"""
+from typing import Dict, Any, List
+import io
+import os
+import logging
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# pyarrow is optional - JSON payloads work without it
+try:
+    import pyarrow as pa
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+
+def is_arrow_media_type(value: str) -> bool:
+    """Check whether a Content-Type / Accept header names an Arrow IPC stream"""
+    return ARROW_STREAM_MEDIA_TYPE in (value or "")
+
+
+def columns_to_dataframe(columns: Dict[str, List[Any]]) -> pd.DataFrame:
+    """
+    Build a DataFrame from a {column: [values]} mapping
+
+    Raises:
+        ValueError: If the mapping is empty or column lengths differ
+    """
+    if not isinstance(columns, dict) or not columns:
+        raise ValueError("'columns' must be a non-empty object of column name -> list of values")
+
+    lengths = {name: len(values) for name, values in columns.items() if isinstance(values, list)}
+    if len(lengths) != len(columns):
+        raise ValueError("Every column must be a list of values")
+    if len(set(lengths.values())) != 1:
+        raise ValueError(f"All columns must have the same length, got {lengths}")
+
+    return pd.DataFrame(columns)
+
+
+def arrow_to_dataframe(payload: bytes) -> pd.DataFrame:
+    """
+    Read an Arrow IPC stream into a DataFrame
+
+    Raises:
+        ImportError: If pyarrow is not installed
+        ValueError: If the payload is not a valid Arrow stream
+    """
+    if not PYARROW_AVAILABLE:
+        raise ImportError("Arrow payloads require pyarrow. Run: pip install pyarrow")
+
+    try:
+        table = pa.ipc.open_stream(pa.py_buffer(payload)).read_all()
+    except pa.ArrowInvalid as e:
+        raise ValueError(f"Invalid Arrow IPC stream: {e}")
+
+    return table.to_pandas()
+
+
+def dataframe_to_arrow(df: pd.DataFrame) -> bytes:
+    """Serialize a DataFrame as an Arrow IPC stream"""
+    if not PYARROW_AVAILABLE:
+        raise ImportError("Arrow payloads require pyarrow. Run: pip install pyarrow")
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
+
+
+def write_frame_file(df: pd.DataFrame, base_path: str) -> str:
+    """
+    Write a DataFrame for other processes to read with read_frame_file
+
+    Uses an uncompressed Arrow IPC file (memory-mappable) and falls back to
+    pickle for frames Arrow can't represent, e.g. mixed-type object columns.
+    The file is written under a temporary name and renamed into place.
+
+    Args:
+        df: Frame to write
+        base_path: Path without extension
+
+    Returns:
+        Path of the written file
+    """
+    if PYARROW_AVAILABLE:
+        try:
+            table = pa.Table.from_pandas(df, preserve_index=None)
+            path = f"{base_path}.arrow"
+            with pa.OSFile(f"{path}.tmp", 'wb') as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+            os.replace(f"{path}.tmp", path)
+            return path
+        except (pa.ArrowException, TypeError, ValueError) as e:
+            logger.info(f"Arrow file unavailable ({e}), using pickle")
+
+    path = f"{base_path}.pkl"
+    df.to_pickle(f"{path}.tmp", compression=None)
+    os.replace(f"{path}.tmp", path)
+    return path
+
+
+def read_frame_file(path: str) -> pd.DataFrame:
+    """Read a frame written by write_frame_file (Arrow files are memory-mapped)"""
+    if path.endswith('.arrow'):
+        with pa.memory_map(path, 'r') as source:
+            return pa.ipc.open_file(source).read_all().to_pandas()
+    return pd.read_pickle(path, compression=None)
+
+
+def prediction_frame(
+    predictions: np.ndarray,
+    probabilities: np.ndarray = None,
+    classes: List[Any] = None
+) -> pd.DataFrame:
+    """
+    Lay out predictions (and per-class probabilities) as columns
+
+    Probability columns are named probability_<class>.
+    """
+    result = pd.DataFrame({'prediction': np.asarray(predictions)})
+    if probabilities is not None:
+        probabilities = np.asarray(probabilities)
+        if classes is None or len(classes) != probabilities.shape[1]:
+            classes = list(range(probabilities.shape[1]))
+        for i, cls in enumerate(classes):
+            result[f"probability_{cls}"] = probabilities[:, i]
+    return result
@@ -0,0 +1,33 @@
+"""
+Process memory helpers used for job instrumentation
+"""
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+# psutil is optional - fall back to /proc on Linux
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+
+def get_rss_bytes() -> int:
+    """
+    Get the current resident set size of this process
+
+    Returns:
+        RSS in bytes, or 0 if it cannot be determined
+    """
+    try:
+        if PSUTIL_AVAILABLE:
+            return int(psutil.Process(os.getpid()).memory_info().rss)
+
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE")
+    except Exception as e:
+        logger.debug(f"RSS lookup failed: {e}")
+        return 0
@@ -3,7 +3,15 @@ from reportlab.lib.pagesizes import letter
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image, PageBreak
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from io import BytesIO
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+import multiprocessing
+import hashlib
+import logging
+import os
 import pandas as pd
 import numpy as np
 import matplotlib
@@ -12,6 +20,40 @@ from matplotlib.figure import Figure
 from matplotlib.backends.backend_agg import FigureCanvasAgg as FigureCanvas
 import seaborn as sns
 
+from app.config import settings
+from ml_engine.engines.correlation import correlation_matrix
+
+logger = logging.getLogger(__name__)
+
+# Bump when chart styling changes so cached PNGs are re-rendered
+CHART_STYLE_VERSION = 1
+HIST_MAX_BINS = 50
+KDE_GRID_POINTS = 200
+
+# Charts render in worker processes from pre-aggregated data (bin counts,
+# correlation matrix, category counts), so the work per chart is constant
+_chart_executor = None
+
+
+def _get_chart_executor() -> ProcessPoolExecutor:
+    """Lazily start the chart rendering pool"""
+    global _chart_executor
+    if _chart_executor is None:
+        _chart_executor = ProcessPoolExecutor(
+            max_workers=settings.REPORT_CHART_WORKERS,
+            mp_context=multiprocessing.get_context('spawn')
+        )
+    return _chart_executor
+
+
+def shutdown_chart_executor():
+    """Stop the chart rendering pool (called on app shutdown)"""
+    global _chart_executor
+    if _chart_executor is not None:
+        _chart_executor.shutdown(wait=False, cancel_futures=True)
+        _chart_executor = None
+
+
 def generate_plot_buffer(fig):
     """Save matplotlib figure to BytesIO buffer"""
     buf = BytesIO()
@@ -19,10 +61,203 @@ def generate_plot_buffer(fig):
     buf.seek(0)
     return buf
 
-def generate_eda_pdf(df: pd.DataFrame, analysis_results: dict) -> BytesIO:
+
+def _histogram_spec(series: pd.Series, rng: np.random.Generator) -> Dict[str, Any]:
+    """
+    Bin counts over every value plus a KDE fitted on a sample
+
+    np.histogram is a single vectorized pass; the KDE (O(sample x grid)) only
+    sees REPORT_KDE_SAMPLE values, scaled to the count axis like seaborn's.
+    """
+    values = series.dropna().to_numpy(dtype=np.float64)
+    values = values[np.isfinite(values)]
+    if values.size == 0:
+        return {'kind': 'hist', 'column': str(series.name), 'edges': None}
+
+    sample = values
+    if values.size > settings.REPORT_KDE_SAMPLE:
+        sample = rng.choice(values, settings.REPORT_KDE_SAMPLE, replace=False)
+    edges = np.histogram_bin_edges(sample, bins='auto', range=(values.min(), values.max()))
+    if len(edges) - 1 > HIST_MAX_BINS:
+        edges = np.linspace(values.min(), values.max(), HIST_MAX_BINS + 1)
+    counts, edges = np.histogram(values, bins=edges)
+
+    kde_x = kde_y = None
+    std = sample.std()
+    if sample.size > 1 and std > 0:
+        # Gaussian KDE with Scott's bandwidth, scaled to counts per bin
+        bandwidth = std * sample.size ** (-1 / 5)
+        kde_x = np.linspace(edges[0], edges[-1], KDE_GRID_POINTS)
+        z = (kde_x[:, None] - sample[None, :]) / bandwidth
+        density = np.exp(-0.5 * z ** 2).sum(axis=1) / (sample.size * bandwidth * np.sqrt(2 * np.pi))
+        kde_y = density * values.size * np.diff(edges).mean()
+
+    return {
+        'kind': 'hist', 'column': str(series.name),
+        'edges': edges, 'counts': counts, 'kde_x': kde_x, 'kde_y': kde_y,
+    }
+
+
+def render_chart(spec: Dict[str, Any]) -> bytes:
+    """Render one pre-aggregated chart spec to PNG bytes (runs in a worker process)"""
+    if spec['kind'] == 'heatmap':
+        fig = Figure(figsize=(6, 5))
+        ax = fig.add_subplot(111)
+        corr = pd.DataFrame(spec['corr'], index=spec['labels'], columns=spec['labels'])
+        sns.heatmap(corr, annot=False, cmap='coolwarm', cbar=True, ax=ax)
+        ax.set_title('Feature Correlation')
+    elif spec['kind'] == 'hist':
+        fig = Figure(figsize=(6, 3))
+        ax = fig.add_subplot(111)
+        if spec['edges'] is not None:
+            edges = spec['edges']
+            ax.bar(edges[:-1], spec['counts'], width=np.diff(edges), align='edge',
+                   color='skyblue', edgecolor='white', alpha=0.75)
+            if spec['kde_x'] is not None:
+                ax.plot(spec['kde_x'], spec['kde_y'], color='skyblue', linewidth=1.5)
+        ax.set_ylabel('Count')
+        ax.set_title(f"Distribution: {spec['column']}")
+    else:
+        fig = Figure(figsize=(6, 3))
+        ax = fig.add_subplot(111)
+        sns.barplot(x=spec['values'], y=spec['labels'], hue=spec['labels'],
+                    palette='viridis', legend=False, ax=ax)
+        ax.set_title(f"Top Categories: {spec['column']}")
+        ax.set_xlabel('Count')
+    fig.tight_layout()
+    return generate_plot_buffer(fig).getvalue()
+
+
+class ChartCache:
+    """Rendered chart PNGs on disk, keyed by dataset version and chart"""
+
+    def __init__(self, root: Path):
+        self.root = root
+
+    def path(self, dataset_key: str, chart_id: str) -> Path:
+        digest = hashlib.sha1(f"{dataset_key}|{chart_id}|{CHART_STYLE_VERSION}".encode()).hexdigest()
+        return self.root / f"{digest}.png"
+
+    def get(self, path: Path) -> Optional[bytes]:
+        try:
+            data = path.read_bytes()
+            os.utime(path)  # Recently used charts survive pruning
+            return data
+        except OSError:
+            return None
+
+    def put(self, path: Path, png: bytes):
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix('.tmp')
+        tmp.write_bytes(png)
+        os.replace(tmp, path)
+        self._prune()
+
+    def _prune(self):
+        files = list(self.root.glob('*.png'))
+        excess = len(files) - settings.REPORT_CHART_CACHE_MAX_FILES
+        if excess > 0:
+            files.sort(key=lambda f: f.stat().st_mtime)
+            for old in files[:excess]:
+                old.unlink(missing_ok=True)
+
+
+chart_cache = ChartCache(settings.DATA_CACHE_DIR / "charts")
+
+
+def build_chart_specs(df: pd.DataFrame) -> List[Tuple[str, str, Any]]:
+    """
+    Charts of the report as (section, chart id, lazy spec builder)
+
+    Builders only run for charts that aren't cached yet.
+    """
+    charts = []
+    numeric_df = df.select_dtypes(include=[np.number])
+    rng = np.random.default_rng(0)
+
+    # 1. Correlation Heatmap (only if > 1 numeric cols)
+    if numeric_df.shape[1] > 1:
+        def heatmap():
+            corr = correlation_matrix(numeric_df)
+            return {'kind': 'heatmap', 'corr': corr.to_numpy(), 'labels': [str(c) for c in corr.columns]}
+        charts.append(("heatmap", "heatmap", heatmap))
+
+    # 2. Distribution Plots (Top 4 Numeric Cols)
+    for col in numeric_df.columns[:4]:
+        charts.append(("hist", f"hist:{col}", lambda col=col: _histogram_spec(numeric_df[col], rng)))
+
+    # 3. Categorical Counts (Top 2 Categorical Cols)
+    cat_df = df.select_dtypes(include=['object', 'category'])
+    for col in cat_df.columns[:2]:
+        def bars(col=col):
+            # Top 10 categories only
+            top_cats = cat_df[col].value_counts().nlargest(10)
+            return {'kind': 'bar', 'column': str(col),
+                    'labels': [str(v) for v in top_cats.index], 'values': top_cats.to_numpy()}
+        charts.append(("bar", f"bar:{col}", bars))
+
+    return charts
+
+
+def render_report_charts(df: pd.DataFrame, dataset_key: Optional[str] = None) -> List[Tuple[str, Optional[bytes], Optional[str]]]:
+    """
+    PNGs of the report's charts, from the cache or rendered in parallel
+
+    Args:
+        df: Dataset
+        dataset_key: Identifies this dataset version; without it nothing is cached
+
+    Returns:
+        List of (section, PNG bytes or None, error message or None) in report order
+    """
+    charts = build_chart_specs(df)
+    results: List[Any] = [None] * len(charts)
+    pending = []
+
+    for i, (section, chart_id, build) in enumerate(charts):
+        path = chart_cache.path(dataset_key, chart_id) if dataset_key else None
+        png = chart_cache.get(path) if path else None
+        if png is not None:
+            results[i] = (section, png, None)
+            continue
+        try:
+            pending.append((i, path, build()))
+        except Exception as e:
+            results[i] = (section, None, str(e))
+
+    if pending:
+        try:
+            executor = _get_chart_executor()
+            futures = [(i, path, executor.submit(render_chart, spec)) for i, path, spec in pending]
+            rendered = [(i, path, future.result()) for i, path, future in futures]
+        except BrokenProcessPool:
+            logger.warning("Chart worker died, rendering report charts in-process")
+            shutdown_chart_executor()
+            rendered = [(i, path, render_chart(spec)) for i, path, spec in pending]
+        except Exception as e:
+            logger.error(f"Chart rendering failed: {e}")
+            rendered = []
+            for i, path, spec in pending:
+                try:
+                    rendered.append((i, path, render_chart(spec)))
+                except Exception as chart_error:
+                    results[i] = (charts[i][0], None, str(chart_error))
+
+        for i, path, png in rendered:
+            results[i] = (charts[i][0], png, None)
+            if path is not None:
+                chart_cache.put(path, png)
+        logger.info(f"Rendered {len(rendered)} report chart(s), {len(charts) - len(pending)} from cache")
+
+    return results
+
+def generate_eda_pdf(df: pd.DataFrame, analysis_results: dict, dataset_key: Optional[str] = None) -> BytesIO:
     """
     Generate a PDF report for Exploratory Data Analysis with Charts.
     Returns a BytesIO object containing the PDF.
+    
+    Charts are rendered in parallel worker processes and, when dataset_key
+    identifies the dataset version, reused from the chart cache.
     """
     buffer = BytesIO()
     doc = SimpleDocTemplate(buffer, pagesize=letter)
@@ -141,69 +376,25 @@ def generate_eda_pdf(df: pd.DataFrame, analysis_results: dict) -> BytesIO:
     story.append(Paragraph("Visual Insights", styles['Title']))
     story.append(Spacer(1, 12))
 
-    # 1. Correlation Heatmap (only if > 1 numeric cols)
-    numeric_df = df.select_dtypes(include=[np.number])
-    if numeric_df.shape[1] > 1:
-        story.append(Paragraph("Correlation Heatmap", styles['Heading2']))
-        try:
-            fig = Figure(figsize=(6, 5))
-            ax = fig.add_subplot(111)
-            corr = numeric_df.corr()
-            sns.heatmap(corr, annot=False, cmap='coolwarm', cbar=True, ax=ax)
-            ax.set_title('Feature Correlation')
-            fig.tight_layout()
-            
-            img_buffer = generate_plot_buffer(fig)
-            img = Image(img_buffer, width=6*inch, height=5*inch)
-            story.append(img)
-            story.append(Spacer(1, 12))
-        except Exception as e:
-            story.append(Paragraph(f"Could not generate heatmap: {str(e)}", styles['Normal']))
-
-    # 2. Distribution Plots (Top 4 Numeric Cols)
-    if not numeric_df.empty:
-        story.append(Paragraph("Distributions (Top Features)", styles['Heading2']))
-        cols_to_plot = numeric_df.columns[:4]
-        
-        for col in cols_to_plot:
-            try:
-                fig = Figure(figsize=(6, 3))
-                ax = fig.add_subplot(111)
-                sns.histplot(numeric_df[col].dropna(), kde=True, color='skyblue', ax=ax)
-                ax.set_title(f'Distribution: {col}')
-                fig.tight_layout()
-                
-                img_buffer = generate_plot_buffer(fig)
-                img = Image(img_buffer, width=6*inch, height=3*inch)
-                story.append(img)
-                story.append(Spacer(1, 8))
-            except Exception as e:
-                pass
+    charts = render_report_charts(df, dataset_key)
+    headings = {
+        'heatmap': "Correlation Heatmap",
+        'hist': "Distributions (Top Features)",
+        'bar': "Categorical Distributions",
+    }
+    sizes = {'heatmap': (6*inch, 5*inch), 'hist': (6*inch, 3*inch), 'bar': (6*inch, 3*inch)}
     
-    # 3. Categorical Counts (Top 2 Categorical Cols)
-    cat_df = df.select_dtypes(include=['object', 'category'])
-    if not cat_df.empty:
-        story.append(Paragraph("Categorical Distributions", styles['Heading2']))
-        cols_to_plot = cat_df.columns[:2]
-        
-        for col in cols_to_plot:
-            try:
-                # Top 10 categories only
-                top_cats = cat_df[col].value_counts().nlargest(10)
-                
-                fig = Figure(figsize=(6, 3))
-                ax = fig.add_subplot(111)
-                sns.barplot(x=top_cats.values, y=top_cats.index, palette='viridis', ax=ax)
-                ax.set_title(f'Top Categories: {col}')
-                ax.set_xlabel('Count')
-                fig.tight_layout()
-                
-                img_buffer = generate_plot_buffer(fig)
-                img = Image(img_buffer, width=6*inch, height=3*inch)
-                story.append(img)
-                story.append(Spacer(1, 8))
-            except Exception as e:
-                pass
+    current_section = None
+    for section, png, error in charts:
+        if section != current_section:
+            story.append(Paragraph(headings[section], styles['Heading2']))
+            current_section = section
+        if png is not None:
+            width, height = sizes[section]
+            story.append(Image(BytesIO(png), width=width, height=height))
+            story.append(Spacer(1, 12 if section == 'heatmap' else 8))
+        elif section == 'heatmap':
+            story.append(Paragraph(f"Could not generate heatmap: {error}", styles['Normal']))
 
     doc.build(story)
     buffer.seek(0)
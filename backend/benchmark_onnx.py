@@ -0,0 +1,109 @@
+"""
+ONNX Runtime parity check and throughput benchmark
+Trains each model family on synthetic data, exports it to ONNX and compares
+predictions and rows/second against the native model
+"""
+import sys
+import time
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import numpy as np
+import pandas as pd
+
+from ml_engine.engines.model_trainer import ModelTrainer
+from ml_engine.engines.onnx_engine import export_to_onnx, OnnxPredictor
+
+N_ROWS = 3000
+BATCH_SIZES = [1, 100, 10000]
+REPEATS = 20
+
+def make_dataset(problem_type: str) -> pd.DataFrame:
+    """Synthetic dataset with a categorical column and missing values"""
+    rng = np.random.default_rng(42)
+    df = pd.DataFrame({
+        'x1': rng.normal(size=N_ROWS),
+        'x2': rng.normal(size=N_ROWS) * 10,
+        'x3': rng.uniform(size=N_ROWS),
+        'segment': rng.choice(['a', 'b', 'c'], N_ROWS),
+    })
+    signal = df['x1'] + df['x2'] / 10 + (df['segment'] == 'b') * 0.5
+    df.loc[rng.choice(N_ROWS, 50, replace=False), 'x3'] = np.nan
+    if problem_type == 'classification':
+        df['target'] = np.where(signal > 0, 'yes', 'no')
+    else:
+        df['target'] = signal * 100 + rng.normal(size=N_ROWS)
+    return df
+
+
+def throughput(predict_fn, X: np.ndarray) -> float:
+    """Rows per second over REPEATS calls"""
+    predict_fn(X)  # warm up
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        predict_fn(X)
+    return len(X) * REPEATS / (time.perf_counter() - start)
+
+
+def run(problem_type: str) -> bool:
+    """Benchmark every model family; False if any export or parity check failed"""
+    print(f"\n{'='*80}")
+    print(f"{problem_type.upper()}")
+    print(f"{'='*80}")
+    print(f"{'Model':<28} {'Parity':<22}" + "".join(f"{'n=' + str(b):>10}" for b in BATCH_SIZES))
+
+    df = make_dataset(problem_type)
+    trainer = ModelTrainer(keep_all_models=True)
+    trainer.train_all(df, 'target', cv_folds=3)
+    X = trainer.encode_features(df.drop(columns=['target']))
+    X_scaled = trainer.preprocess(X)
+
+    all_ok = True
+    for model_name, model in trainer.models.items():
+        try:
+            predictor = OnnxPredictor(export_to_onnx(trainer, model, include_preprocessing=False))
+        except Exception as e:
+            print(f"{model_name:<28} ✗ export failed: {e}")
+            all_ok = False
+            continue
+
+        native_pred = model.predict(X_scaled)
+        onnx_pred, onnx_proba = predictor.predict(X_scaled)
+
+        if problem_type == 'classification':
+            agreement = float(np.mean(native_pred == onnx_pred))
+            parity = f"{agreement:.2%} labels"
+            if onnx_proba is not None and hasattr(model, 'predict_proba'):
+                max_diff = float(np.abs(model.predict_proba(X_scaled) - onnx_proba).max())
+                parity += f", p±{max_diff:.0e}"
+            ok = agreement >= 0.995
+        else:
+            rel_diff = float(np.abs(native_pred - onnx_pred).max() / (np.abs(native_pred).max() + 1e-12))
+            parity = f"rel±{rel_diff:.0e}"
+            ok = rel_diff < 1e-3
+
+        cells = []
+        for batch_size in BATCH_SIZES:
+            X_batch = np.resize(X, (batch_size, X.shape[1]))
+            native_rps = throughput(lambda b: model.predict(trainer.preprocess(b)), X_batch)
+            onnx_rps = throughput(lambda b: predictor.predict(trainer.preprocess(b)), X_batch)
+            cells.append(f"{onnx_rps / native_rps:>9.1f}x")
+
+        status = "✓" if ok else "✗"
+        print(f"{model_name:<28} {status} {parity:<20}" + "".join(cells))
+        all_ok = all_ok and ok
+
+    return all_ok
+
+
+def main():
+    print("ONNX Runtime vs native inference (speedup = onnx rows/s ÷ native rows/s)")
+    results = [run('classification'), run('regression')]
+    if not all(results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,4 +7,11 @@ sys.path.insert(0, str(project_root))
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
+    from app.config import settings
+    uvicorn.run(
+        "app.main:app",
+        host=settings.HOST,
+        port=settings.PORT,
+        reload=settings.RELOAD and settings.WORKERS == 1,
+        workers=settings.WORKERS,
+    )
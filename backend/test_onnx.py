@@ -0,0 +1,95 @@
+"""
+ONNX Export Parity Test
+Exports every trained model family both ways and checks the ONNX Runtime
+predictions against the native model:
+- model-only graph fed with trainer.preprocess() output (used for serving)
+- graph with imputer and scaler embedded, fed raw encoded features (the
+  downloadable export)
+Exits with status 1 if any export fails or any check is out of tolerance.
+"""
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import numpy as np
+
+from benchmark_onnx import make_dataset
+from ml_engine.engines.model_trainer import ModelTrainer
+from ml_engine.engines.onnx_engine import export_to_onnx, OnnxPredictor
+
+# Both graphs must match the native model up to float32 rounding of the output
+MIN_LABEL_AGREEMENT = 0.995
+MAX_REL_DIFF = 1e-3
+
+
+def compare(model, problem_type: str, X_scaled: np.ndarray, onnx_pred: np.ndarray):
+    """
+    Compare ONNX predictions with the native model
+
+    Returns:
+        Tuple of (passed, description)
+    """
+    native_pred = model.predict(X_scaled)
+    if problem_type == 'classification':
+        agreement = float(np.mean(native_pred == onnx_pred))
+        return agreement >= MIN_LABEL_AGREEMENT, f"{agreement:.2%} labels agree"
+
+    rel_diff = float(np.abs(native_pred - onnx_pred).max() / (np.abs(native_pred).max() + 1e-12))
+    return rel_diff < MAX_REL_DIFF, f"rel±{rel_diff:.0e}"
+
+
+def test_problem(problem_type: str) -> bool:
+    """Train every model family and check both ONNX graphs"""
+    print(f"\n{'='*60}")
+    print(f"Testing: {problem_type}")
+    print(f"{'='*60}")
+
+    df = make_dataset(problem_type)
+    trainer = ModelTrainer(keep_all_models=True)
+    trainer.train_all(df, 'target', cv_folds=3)
+    X = trainer.encode_features(df.drop(columns=['target']))
+    X_scaled = trainer.preprocess(X)
+
+    all_passed = True
+    for model_name, model in trainer.models.items():
+        for embedded in (False, True):
+            graph = "embedded preprocessing" if embedded else "model only"
+            try:
+                predictor = OnnxPredictor(export_to_onnx(trainer, model, include_preprocessing=embedded))
+                onnx_pred, _ = predictor.predict(X if embedded else X_scaled)
+            except Exception as e:
+                print(f"✗ {model_name} ({graph}): export failed: {e}")
+                all_passed = False
+                continue
+
+            passed, detail = compare(model, problem_type, X_scaled, onnx_pred)
+            print(f"{'✓' if passed else '✗'} {model_name} ({graph}): {detail}")
+            all_passed = all_passed and passed
+
+    return all_passed
+
+
+def main():
+    print("\n" + "="*60)
+    print("IntelliML ONNX Export Parity")
+    print("="*60)
+
+    results = {
+        'classification': test_problem('classification'),
+        'regression': test_problem('regression'),
+    }
+
+    print("\n" + "="*60)
+    print("SUMMARY")
+    print("="*60)
+    for name, passed in results.items():
+        print(f"{name:<20} {'✓ PASS' if passed else '✗ FAIL'}")
+
+    if not all(results.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Correlation engine
+Pearson correlations of many numeric columns without pandas' pairwise loop.
+Rows are read in chunks, standardized with statistics gathered in a first
+pass, and multiplied as float32 matrices (one GEMM per chunk, accumulated in
+float64), so memory stays at one chunk of rows plus the p x p result.
+Strong pairs are extracted with a vectorized partial sort instead of a
+Python loop over the matrix.
+"""
+from typing import List, Optional, Sequence, Tuple
+import logging
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Rows standardized and multiplied per chunk
+CHUNK_ROWS = 16384
+
+
+def _chunks(df: pd.DataFrame, positions: np.ndarray, chunk_rows: int):
+    """Row chunks of the selected columns as float64 arrays, +/-inf read as missing (as pandas does)"""
+    for start in range(0, len(df), chunk_rows):
+        chunk = df.iloc[start:start + chunk_rows, positions].to_numpy(dtype=np.float64, na_value=np.nan)
+        infinite = np.isinf(chunk)
+        # Not in place: to_numpy may return a view of the frame
+        yield np.where(infinite, np.nan, chunk) if infinite.any() else chunk
+
+
+def correlation_matrix(
+    df: pd.DataFrame,
+    columns: Optional[Sequence] = None,
+    chunk_rows: int = CHUNK_ROWS
+) -> pd.DataFrame:
+    """
+    Pearson correlation matrix, same semantics as DataFrame.corr()
+
+    Missing and infinite values are excluded pairwise, as pandas does: columns with gaps
+    take three more GEMMs per chunk for the per-pair counts and sums.
+    Constant columns and pairs with fewer than two rows give NaN.
+
+    Args:
+        df: Dataframe holding the columns
+        columns: Numeric columns to correlate (default: every column of df)
+        chunk_rows: Rows per chunk
+
+    Returns:
+        Correlation matrix indexed by column on both axes
+    """
+    columns = list(df.columns if columns is None else columns)
+    positions = df.columns.get_indexer(columns)
+    p = len(columns)
+    if p == 0:
+        return pd.DataFrame(index=columns, columns=columns, dtype=float)
+
+    # Pass 1: per-column count, mean and standard deviation
+    count = np.zeros(p)
+    total = np.zeros(p)
+    for chunk in _chunks(df, positions, chunk_rows):
+        count += np.sum(~np.isnan(chunk), axis=0)
+        total += np.nansum(chunk, axis=0)
+    mean = np.divide(total, count, out=np.zeros(p), where=count > 0)
+    squares = np.zeros(p)
+    for chunk in _chunks(df, positions, chunk_rows):
+        squares += np.nansum((chunk - mean) ** 2, axis=0)
+    std = np.sqrt(np.divide(squares, count, out=np.zeros(p), where=count > 0))
+    # Constant columns are left unscaled, their correlations are NaN below
+    scale = np.where(std > 0, std, 1.0)
+    has_missing = bool((count < len(df)).any())
+
+    # Pass 2: products of standardized chunks
+    products = np.zeros((p, p))
+    if has_missing:
+        pair_count = np.zeros((p, p))
+        pair_sum = np.zeros((p, p))      # [i, j]: sum of column i over rows where j is present
+        pair_squares = np.zeros((p, p))
+    for chunk in _chunks(df, positions, chunk_rows):
+        z = ((chunk - mean) / scale).astype(np.float32)
+        if has_missing:
+            present = ~np.isnan(z)
+            z[~present] = 0.0
+            mask = present.astype(np.float32)
+            pair_count += mask.T @ mask
+            pair_sum += z.T @ mask
+            pair_squares += (z * z).T @ mask
+        products += z.T @ z
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if has_missing:
+            # Centered over the rows both columns share
+            n = np.where(pair_count >= 2, pair_count, np.nan)
+            cov = products - pair_sum * pair_sum.T / n
+            var = pair_squares - pair_sum ** 2 / n
+            # Rounding leaves a tiny variance where a column is constant over the shared rows
+            var = np.where(var > 1e-6 * n, var, np.nan)
+            corr = cov / np.sqrt(var * var.T)
+        else:
+            n = float(len(df)) if len(df) >= 2 else np.nan
+            diag = np.diag(products) / n
+            corr = (products / n) / np.sqrt(np.outer(diag, diag))
+    corr[:, std == 0] = np.nan
+    corr[std == 0, :] = np.nan
+    corr = np.clip(corr, -1.0, 1.0)
+    # Exact ones on the diagonal, as pandas returns
+    defined = np.isfinite(np.diag(corr))
+    corr[np.arange(p)[defined], np.arange(p)[defined]] = 1.0
+    return pd.DataFrame(corr, index=columns, columns=columns)
+
+
+def top_correlations(
+    corr: pd.DataFrame,
+    k: Optional[int] = None,
+    threshold: Optional[float] = None
+) -> List[Tuple[str, str, float]]:
+    """
+    Strongest pairs of a correlation matrix, by absolute value
+
+    Args:
+        corr: Square correlation matrix
+        k: Number of pairs to return (default: every pair)
+        threshold: Only pairs with |r| above this
+
+    Returns:
+        List of (column 1, column 2, correlation), strongest first
+    """
+    values = corr.to_numpy()
+    i, j = np.triu_indices(len(corr.columns), k=1)
+    pairs = values[i, j]
+    keep = np.isfinite(pairs)
+    if threshold is not None:
+        keep &= np.abs(pairs) > threshold
+    i, j, pairs = i[keep], j[keep], pairs[keep]
+
+    strength = -np.abs(pairs)
+    if k is not None and k < len(pairs):
+        # Partial sort: only the k strongest are ordered
+        candidates = np.argpartition(strength, k)[:k]
+        order = candidates[np.argsort(strength[candidates], kind='stable')]
+    else:
+        order = np.argsort(strength, kind='stable')
+    names = [str(c) for c in corr.columns]
+    return [(names[a], names[b], float(r)) for a, b, r in zip(i[order], j[order], pairs[order])]
@@ -0,0 +1,176 @@
+"""
+Downsampling of chart data
+Time series are reduced with Largest-Triangle-Three-Buckets, which keeps
+peaks and troughs, and scatters are summarized over every row as a 2D density
+grid plus one real point per occupied cell, so sparse regions and outliers
+stay visible while dense regions cost a fixed number of points.
+"""
+from typing import Dict, Any, List, Optional
+import logging
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Points per time series line
+TIME_SERIES_MAX_POINTS = 1000
+# Cells per axis of the scatter density grid
+DENSITY_GRID_SIZE = 24
+# Cells per axis of the grid that picks representative scatter points
+SCATTER_POINT_GRID = 16
+# Significant digits of downsampled values sent as JSON
+VALUE_DIGITS = 5
+
+
+def round_values(values: np.ndarray, digits: int = VALUE_DIGITS) -> List[Optional[float]]:
+    """JSON-safe list of values rounded to significant digits (NaN/inf -> None)"""
+    values = np.asarray(values, dtype=float)
+    finite = np.isfinite(values)
+    rounded = np.zeros_like(values)
+    if finite.any():
+        magnitude = np.floor(np.log10(np.abs(np.where(finite & (values != 0), values, 1.0))))
+        scale = 10.0 ** (digits - 1 - magnitude)
+        rounded[finite] = np.round(values[finite] * scale[finite]) / scale[finite]
+    return [float(v) if ok else None for v, ok in zip(rounded, finite)]
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Indices of the points kept by Largest-Triangle-Three-Buckets
+
+    The first and last points are always kept; each bucket in between keeps
+    the point forming the largest triangle with the previously kept point and
+    the average of the next bucket. Bucket averages and triangle areas are
+    computed with numpy; only the walk from bucket to bucket is sequential.
+
+    Args:
+        x: Sorted x coordinates (numeric)
+        y: Values
+        n_out: Number of points to keep
+
+    Returns:
+        Sorted array of indices into x/y
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n) if n_out >= n else np.linspace(0, n - 1, max(n_out, 0)).astype(int)
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    # Bucket boundaries over the points between the first and the last
+    edges = (np.linspace(1, n - 1, n_out - 1)).astype(int)
+    starts, ends = edges[:-1], edges[1:]
+    counts = ends - starts
+    avg_x = np.add.reduceat(x[1:n - 1], starts - 1) / counts
+    avg_y = np.add.reduceat(y[1:n - 1], starts - 1) / counts
+    # The "next bucket" of the last bucket is the last point
+    next_x = np.append(avg_x[1:], x[-1])
+    next_y = np.append(avg_y[1:], y[-1])
+
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    prev = 0
+    for b in range(n_out - 2):
+        lo, hi = starts[b], ends[b]
+        bx, by = x[lo:hi], y[lo:hi]
+        # Twice the triangle area, the constant factor doesn't change the argmax
+        area = np.abs((x[prev] - next_x[b]) * (by - y[prev]) - (x[prev] - bx) * (next_y[b] - y[prev]))
+        prev = lo + int(np.argmax(area))
+        selected[b + 1] = prev
+    return selected
+
+
+def downsample_time_series(dates: pd.Series, values: pd.Series, max_points: int = TIME_SERIES_MAX_POINTS) -> Dict[str, Any]:
+    """
+    Time series reduced to max_points with LTTB
+
+    Args:
+        dates: Datetime values, sorted, without missing values
+        values: Numeric values aligned with dates
+
+    Returns:
+        Dictionary with dates (YYYY-MM-DD strings), values, original_points and sampled
+    """
+    if dates.dt.tz is not None:
+        dates = dates.dt.tz_convert(None)
+    x = dates.to_numpy(dtype='datetime64[ns]').astype(np.int64)
+    y = values.to_numpy(dtype=float)
+    idx = lttb_indices(x, y, max_points)
+    kept = dates.iloc[idx]
+    return {
+        "dates": [str(d) for d in kept.dt.strftime('%Y-%m-%d').tolist()],
+        "values": round_values(y[idx]),
+        "original_points": int(len(y)),
+        "sampled": bool(len(idx) < len(y)),
+    }
+
+
+def _grid_cells(values: np.ndarray, lo: float, hi: float, size: int) -> np.ndarray:
+    """Cell index of each value on a regular grid over [lo, hi]"""
+    if hi <= lo:
+        return np.zeros(len(values), dtype=np.int64)
+    cells = ((values - lo) / (hi - lo) * size).astype(np.int64)
+    return np.clip(cells, 0, size - 1)
+
+
+def downsample_scatter(
+    x: np.ndarray,
+    y: np.ndarray,
+    grid_size: int = DENSITY_GRID_SIZE,
+    point_grid: int = SCATTER_POINT_GRID
+) -> Dict[str, Any]:
+    """
+    Scatter summary computed over every (x, y) pair
+
+    Args:
+        x, y: Numeric values; rows with a missing or infinite value are dropped
+        grid_size: Cells per axis of the density grid
+        point_grid: Cells per axis of the representative point grid (at most
+            point_grid**2 points are returned)
+
+    Returns:
+        Dictionary with x_values/y_values (one real point per occupied cell,
+        in row order), weights (rows in each point's cell), density
+        ({grid_size, x_range, y_range, cells: [[x_cell, y_cell, count], ...]}
+        with only non-empty cells), original_points (finite rows) and sampled
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    # One inf would stretch the ranges and collapse every other row into cell 0
+    finite = np.isfinite(x) & np.isfinite(y)
+    if not finite.all():
+        x, y = x[finite], y[finite]
+    n = len(x)
+    if n == 0:
+        return {"x_values": [], "y_values": [], "weights": [], "density": None,
+                "original_points": 0, "sampled": False}
+
+    x_lo, x_hi = float(x.min()), float(x.max())
+    y_lo, y_hi = float(y.min()), float(y.max())
+
+    # Representative points: the first row falling in each occupied cell
+    cell = _grid_cells(x, x_lo, x_hi, point_grid) * point_grid + _grid_cells(y, y_lo, y_hi, point_grid)
+    _, first, weights = np.unique(cell, return_index=True, return_counts=True)
+    order = np.argsort(first)
+    first, weights = first[order], weights[order]
+
+    # Density over every row, sent sparsely
+    gx = _grid_cells(x, x_lo, x_hi, grid_size)
+    gy = _grid_cells(y, y_lo, y_hi, grid_size)
+    counts = np.bincount(gx * grid_size + gy, minlength=grid_size * grid_size)
+    nonzero = np.flatnonzero(counts)
+
+    return {
+        "x_values": round_values(x[first]),
+        "y_values": round_values(y[first]),
+        "weights": weights.astype(int).tolist(),
+        "density": {
+            "grid_size": int(grid_size),
+            "x_range": round_values(np.array([x_lo, x_hi])),
+            "y_range": round_values(np.array([y_lo, y_hi])),
+            "cells": np.column_stack([nonzero // grid_size, nonzero % grid_size, counts[nonzero]]).tolist(),
+        },
+        "original_points": int(n),
+        "sampled": bool(len(first) < n),
+    }
@@ -0,0 +1,120 @@
+"""
+Row-hash duplicate index
+Every column is hashed once (pd.util.hash_pandas_object, vectorized) and the
+hashes of any column subset are combined into one 64-bit value per row.
+Duplicate counts, drop_duplicates masks and near-duplicate groups are then
+found on the row hashes instead of re-hashing the rows for each question.
+With 64-bit hashes, a collision between two distinct rows is negligible
+(about n^2 / 2^65).
+"""
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+import logging
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Multiplier combining column hashes (as in CPython's tuple hash)
+_COMBINE_PRIME = np.uint64(1000003)
+# Float digits kept when near-duplicates are compared
+NEAR_DUPLICATE_DECIMALS = 6
+
+
+def _normalized(series: pd.Series, decimals: int) -> pd.Series:
+    """Values compared for near-duplicates: trimmed lowercase text, rounded floats"""
+    if pd.api.types.is_float_dtype(series):
+        return series.round(decimals)
+    if pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series):
+        return series.astype(str).str.strip().str.lower().where(series.notna())
+    return series
+
+
+class RowHashIndex:
+    """
+    Row hashes of a dataframe, per column subset
+    Column hashes are cached, so a new subset only combines arrays.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.df = df
+        self._column_hashes: Dict[Tuple[Any, bool], np.ndarray] = {}
+        self._duplicated: Dict[Tuple, np.ndarray] = {}
+
+    def _column_hash(self, col, normalize: bool) -> np.ndarray:
+        key = (col, normalize)
+        if key not in self._column_hashes:
+            series = self.df[col]
+            if normalize:
+                series = _normalized(series, NEAR_DUPLICATE_DECIMALS)
+            if pd.api.types.is_float_dtype(series):
+                # -0.0 and 0.0 are equal values with different bits
+                series = series + 0.0
+            elif pd.api.types.is_object_dtype(series):
+                # Hashing stringifies objects, so 1 and "1" would match; factorize
+                # groups by value and type as DataFrame.duplicated does
+                series = pd.Series(pd.factorize(series, use_na_sentinel=False)[0])
+            self._column_hashes[key] = pd.util.hash_pandas_object(series, index=False).to_numpy()
+        return self._column_hashes[key]
+
+    def hashes(self, columns: Optional[Sequence] = None, normalize: bool = False) -> np.ndarray:
+        """
+        One uint64 hash per row over the given columns
+
+        Args:
+            columns: Columns to hash (default: every column)
+            normalize: Compare text case- and whitespace-insensitively and
+                floats rounded to NEAR_DUPLICATE_DECIMALS
+        """
+        columns = list(self.df.columns) if columns is None else list(columns)
+        combined = np.zeros(len(self.df), dtype=np.uint64)
+        for col in columns:
+            combined = combined * _COMBINE_PRIME ^ self._column_hash(col, normalize)
+        return combined
+
+    def duplicated(self, columns: Optional[Sequence] = None, keep: str = "first", normalize: bool = False) -> np.ndarray:
+        """
+        Boolean mask of repeated rows, as DataFrame.duplicated()
+
+        Args:
+            columns: Columns that must match (default: every column)
+            keep: "first", "last" or False (mark every copy)
+            normalize: Match near-duplicates (see hashes)
+        """
+        key = (tuple(self.df.columns if columns is None else columns), keep, normalize)
+        if key not in self._duplicated:
+            self._duplicated[key] = pd.Series(self.hashes(columns, normalize)).duplicated(keep=keep).to_numpy()
+        return self._duplicated[key]
+
+    def duplicate_count(self, columns: Optional[Sequence] = None, normalize: bool = False) -> int:
+        """Rows repeating an earlier row"""
+        return int(self.duplicated(columns, normalize=normalize).sum())
+
+    def duplicate_groups(
+        self,
+        columns: Optional[Sequence] = None,
+        normalize: bool = False,
+        max_groups: int = 10,
+        max_rows: int = 5
+    ) -> List[Dict[str, Any]]:
+        """
+        Largest groups of matching rows
+
+        Returns:
+            List of {"size", "rows": first max_rows row positions}, largest first
+        """
+        hashes = self.hashes(columns, normalize)
+        mask = self.duplicated(columns, keep=False, normalize=normalize)
+        positions = np.flatnonzero(mask)
+        if len(positions) == 0:
+            return []
+        # Stable sort groups each hash's rows in row order
+        order = positions[np.argsort(hashes[positions], kind='stable')]
+        sorted_hashes = hashes[order]
+        starts = np.flatnonzero(np.r_[True, sorted_hashes[1:] != sorted_hashes[:-1]])
+        sizes = np.diff(np.r_[starts, len(order)])
+        largest = np.argsort(-sizes, kind='stable')[:max_groups]
+        return [
+            {"size": int(sizes[g]), "rows": order[starts[g]:starts[g] + min(sizes[g], max_rows)].tolist()}
+            for g in largest
+        ]
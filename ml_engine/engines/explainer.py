@@ -2,6 +2,7 @@ import shap
 import numpy as np
 from typing import Dict, Any, Optional
 import logging
+import time
 import matplotlib
 matplotlib.use('Agg')  # Non-interactive backend
 import matplotlib.pyplot as plt
@@ -13,58 +14,92 @@ logger = logging.getLogger(__name__)
 class ModelExplainer:
     """
     SHAP-based model explanation engine
-    Generates interpretable explanations for ML models
+    Generates interpretable explanations for ML models. Stateless: one
+    instance serves concurrent requests.
     """
     
-    def __init__(self):
-        self.explainer = None
-        self.shap_values = None
+    # Rows explained per step while checking the time budget
+    CHUNK_SIZE = 256
+    SLOW_CHUNK_SIZE = 8  # permutation / kernel explainers
+    # Permutation SHAP costs many model calls per row, so cap its sample
+    PERMUTATION_MAX_SAMPLES = 100
     
     def explain_model(
-        self, 
-        model, 
+        self,
+        model,
         X: np.ndarray,
         feature_names: list,
-        max_samples: int = 100
+        max_samples: int = 100,
+        background: Optional[np.ndarray] = None,
+        time_budget: Optional[float] = None,
+        render_plots: bool = True
     ) -> Dict[str, Any]:
         """
         Generate SHAP explanations for model
         
         Args:
             model: Trained model with predict method
-            X: Feature data
+            X: Feature data (scaled as during training)
             feature_names: List of feature names
             max_samples: Max samples to use for explanation
-            
+            background: Background sample for linear/permutation SHAP
+                (defaults to the first rows of X)
+            time_budget: Stop explaining further chunks after this many
+                seconds (at least one chunk is always explained)
+            render_plots: Render plots inline; when False 'plots' is empty and
+                the caller can pass 'shap_values'/'sample' to render_shap_plots
+        
         Returns:
             Dictionary with SHAP values and plots
         """
         try:
             logger.info("Generating SHAP explanations")
             
-            # Use subset of data for speed
+            # Random subset so a budget-truncated pass is still representative
             if len(X) > max_samples:
-                indices = np.random.choice(len(X), max_samples, replace=False)
+                indices = np.random.default_rng(42).choice(len(X), max_samples, replace=False)
                 X_sample = X[indices]
             else:
                 X_sample = X
             
-            # Create SHAP explainer
-            self.explainer = shap.Explainer(model.predict, X_sample)
-            self.shap_values = self.explainer(X_sample)
+            if background is None:
+                background = X_sample[:100]
+            
+            # Family-aware SHAP: tree / linear, permutation only as fallback
+            explainer = PredictionExplainer(model, background, fallback='permutation')
+            if explainer.kind == 'permutation':
+                X_sample = X_sample[:self.PERMUTATION_MAX_SAMPLES]
+            
+            chunk_size = self.CHUNK_SIZE if explainer.kind in ('tree', 'linear') else self.SLOW_CHUNK_SIZE
+            start = time.perf_counter()
+            chunks = []
+            for offset in range(0, len(X_sample), chunk_size):
+                chunks.append(explainer.explain(X_sample[offset:offset + chunk_size])['shap_values'])
+                if time_budget is not None and time.perf_counter() - start > time_budget:
+                    break
+            shap_values = np.vstack(chunks)
+            X_sample = X_sample[:len(shap_values)]
+            
+            logger.info(
+                f"{explainer.kind} SHAP on {len(X_sample)} rows "
+                f"in {time.perf_counter() - start:.2f}s"
+            )
             
             # Generate feature importance
-            feature_importance = self._get_feature_importance(feature_names)
+            feature_importance = self._get_feature_importance(shap_values, feature_names)
             
             # Generate plots
-            plots = self._generate_plots(feature_names)
+            plots = render_shap_plots(shap_values, X_sample, feature_names) if render_plots else {}
             
             return {
                 'feature_importance': feature_importance,
                 'plots': plots,
                 'num_samples_explained': len(X_sample),
+                'explainer': explainer.kind,
+                'shap_values': shap_values,
+                'sample': X_sample,
             }
-            
+        
         except Exception as e:
             logger.error(f"SHAP explanation error: {str(e)}")
             # Return basic feature importance if SHAP fails
@@ -80,10 +115,10 @@ class ModelExplainer:
                 }
             raise
     
-    def _get_feature_importance(self, feature_names: list) -> list:
+    def _get_feature_importance(self, shap_values: np.ndarray, feature_names: list) -> list:
         """Extract feature importance from SHAP values"""
         # Mean absolute SHAP value per feature
-        importance = np.abs(self.shap_values.values).mean(axis=0)
+        importance = np.abs(shap_values).mean(axis=0)
         
         # Sort by importance
         feature_importance = [
@@ -93,43 +128,157 @@ class ModelExplainer:
         feature_importance.sort(key=lambda x: x['importance'], reverse=True)
         
         return feature_importance
+
+
+def render_shap_plots(shap_values: np.ndarray, X: np.ndarray, feature_names: list) -> Dict[str, str]:
+    """
+    Generate SHAP summary and bar plots as base64 encoded images
+    Module-level so it can run in a worker process
+    """
+    plots = {}
     
-    def _generate_plots(self, feature_names: list) -> Dict[str, str]:
-        """Generate SHAP plots as base64 encoded images"""
-        plots = {}
+    try:
+        # Summary plot
+        plt.figure(figsize=(10, 6))
+        shap.summary_plot(
+            shap_values,
+            features=X,
+            feature_names=feature_names,
+            show=False
+        )
+        plots['summary'] = _plot_to_base64()
+        plt.close()
         
+        # Bar plot
+        plt.figure(figsize=(10, 6))
+        shap.summary_plot(
+            shap_values,
+            feature_names=feature_names,
+            plot_type='bar',
+            show=False
+        )
+        plots['bar'] = _plot_to_base64()
+        plt.close()
+    
+    except Exception as e:
+        logger.error(f"Plot generation error: {str(e)}")
+    finally:
+        plt.close('all')
+    
+    return plots
+
+
+def _plot_to_base64() -> str:
+    """Convert matplotlib plot to base64 string"""
+    buffer = BytesIO()
+    plt.savefig(buffer, format='png', bbox_inches='tight', dpi=100)
+    buffer.seek(0)
+    image_base64 = base64.b64encode(buffer.read()).decode()
+    buffer.close()
+    return f"data:image/png;base64,{image_base64}"
+
+
+class PredictionExplainer:
+    """
+    Per-row SHAP explainer built once per trained model and reused
+    Picks the cheapest exact algorithm the model supports: TreeExplainer for
+    tree ensembles, closed-form LinearExplainer for linear models, and
+    otherwise KernelExplainer over a k-means summarized background (or
+    PermutationExplainer when fallback='permutation')
+    """
+    
+    KMEANS_CLUSTERS = 10
+    KERNEL_NSAMPLES = 100
+    PERMUTATIONS = 10  # forward + backward passes per row for PermutationExplainer
+    
+    def __init__(self, model, background: np.ndarray, fallback: str = 'kernel'):
+        """
+        Args:
+            model: Trained estimator
+            background: Scaled training sample (ModelTrainer.background)
+            fallback: 'kernel' or 'permutation' for models without a fast path
+        """
+        self.model = model
+        self.kind = None
+        self.explainer = self._build(model, background, fallback)
+    
+    def _build(self, model, background: np.ndarray, fallback: str):
+        """Create the underlying SHAP explainer"""
         try:
-            # Summary plot
-            plt.figure(figsize=(10, 6))
-            shap.summary_plot(
-                self.shap_values.values, 
-                feature_names=feature_names,
-                show=False
-            )
-            plots['summary'] = self._plot_to_base64()
-            plt.close()
-            
-            # Bar plot
-            plt.figure(figsize=(10, 6))
-            shap.summary_plot(
-                self.shap_values.values,
-                feature_names=feature_names,
-                plot_type='bar',
-                show=False
-            )
-            plots['bar'] = self._plot_to_base64()
-            plt.close()
-            
-        except Exception as e:
-            logger.error(f"Plot generation error: {str(e)}")
+            explainer = shap.TreeExplainer(model)
+            self.kind = 'tree'
+            return explainer
+        except Exception:
+            pass
+        
+        if background is None or len(background) == 0:
+            raise ValueError("No background data available for SHAP")
+        
+        if hasattr(model, 'coef_') and hasattr(model, 'intercept_'):
+            try:
+                explainer = shap.LinearExplainer(model, background)
+                self.kind = 'linear'
+                return explainer
+            except Exception as e:
+                logger.debug(f"LinearExplainer unavailable for {type(model).__name__}: {e}")
+        
+        # Every model evaluation runs over the whole background, so summarize it
+        predict_fn = model.predict_proba if hasattr(model, 'predict_proba') else model.predict
+        summary = shap.kmeans(background, min(self.KMEANS_CLUSTERS, len(background)))
+        if fallback == 'permutation':
+            self.kind = 'permutation'
+            return shap.PermutationExplainer(predict_fn, summary.data)
+        
+        self.kind = 'kernel'
+        return shap.KernelExplainer(predict_fn, summary)
+    
+    def explain(self, X_scaled: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        Explain a block of scaled rows
+        
+        Returns:
+            Dict with 'shap_values' (rows x features) and 'base_values' (rows),
+            both for each row's predicted class when the output is per-class
+        """
+        X_scaled = np.atleast_2d(X_scaled)
+        rows = np.arange(len(X_scaled))
+        
+        if self.kind == 'permutation':
+            result = self.explainer(X_scaled, max_evals=self.PERMUTATIONS * (2 * X_scaled.shape[1] + 1), silent=True)
+            values = result.values
+            base = np.asarray(result.base_values, dtype=float)
+        else:
+            if self.kind == 'kernel':
+                values = self.explainer.shap_values(X_scaled, nsamples=self.KERNEL_NSAMPLES, silent=True)
+            else:
+                values = self.explainer.shap_values(X_scaled)
+            expected = np.atleast_1d(np.asarray(self.explainer.expected_value, dtype=float))
+            base = np.tile(expected, (len(rows), 1))
+        
+        # Older shap returns one array per class instead of a trailing class axis
+        if isinstance(values, list):
+            values = np.stack(values, axis=-1)
+        values = np.asarray(values)
+        if base.ndim == 1:
+            base = base[:, None]
+        
+        if values.ndim == 3:
+            classes = self._predicted_class_index(X_scaled, values.shape[2])
+            return {
+                'shap_values': values[rows, :, classes],
+                'base_values': base[rows, classes] if base.shape[1] > 1 else base[:, 0],
+            }
         
-        return plots
+        return {
+            'shap_values': values,
+            'base_values': base[:, 0],
+        }
     
-    def _plot_to_base64(self) -> str:
-        """Convert matplotlib plot to base64 string"""
-        buffer = BytesIO()
-        plt.savefig(buffer, format='png', bbox_inches='tight', dpi=100)
-        buffer.seek(0)
-        image_base64 = base64.b64encode(buffer.read()).decode()
-        buffer.close()
-        return f"data:image/png;base64,{image_base64}"
\ No newline at end of file
+    def _predicted_class_index(self, X_scaled: np.ndarray, num_outputs: int) -> np.ndarray:
+        """Column index of each row's predicted class in the SHAP output"""
+        predictions = self.model.predict(X_scaled)
+        classes = getattr(self.model, 'classes_', None)
+        if classes is not None and len(classes) == num_outputs:
+            lookup = {cls: i for i, cls in enumerate(classes)}
+            return np.array([lookup.get(p, 0) for p in predictions])
+        return np.clip(np.asarray(predictions, dtype=int), 0, num_outputs - 1)
@@ -0,0 +1,304 @@
+"""
+Feature engineering engine
+A batch of operations over many columns is planned first, then every new
+column is computed with vectorized NumPy straight into one preallocated
+block per dtype: float32 for transforms, int8/int16 for bins and date parts.
+The blocks are attached to the dataset without copying its existing columns.
+
+Operations are dicts: {"operation": name, "columns": [...], "params": {...}}
+    polynomial          {col}_pow{degree}   params: degree (default 2)
+    log                 {col}_log           log1p of the value clipped at 0
+    interaction         {a}_x_{b}           product of every pair of the columns
+    ratio               {a}_div_{b}         a / b for every pair (NaN where b is 0)
+    binning             {col}_binned        equal-width bin index, params: bins (default 5)
+    date_parts          {col}_{part}        params: parts (default year, month, day, dayofweek)
+    frequency_encoding  {col}_freq          share of rows holding the value
+    target_encoding     {col}_te            out-of-fold smoothed target mean of the value,
+                                            params: target (required), folds (5), smoothing (10)
+"""
+from typing import Dict, Any, List, Optional, Tuple
+from itertools import combinations
+import logging
+
+import numpy as np
+import pandas as pd
+
+from ml_engine.engines.type_inference import detect_datetime_format, parse_datetime
+
+logger = logging.getLogger(__name__)
+
+FEATURE_OPERATIONS = (
+    "polynomial", "log", "interaction", "ratio", "binning",
+    "date_parts", "frequency_encoding", "target_encoding",
+)
+DATE_PARTS = ("year", "month", "day", "dayofweek", "hour")
+DEFAULT_DATE_PARTS = ("year", "month", "day", "dayofweek")
+
+# pandas < 3 copies every column on concat unless told not to; pandas 3 shares
+# them lazily (copy-on-write) and deprecates the keyword
+_CONCAT_NO_COPY = {"copy": False} if int(pd.__version__.split(".")[0]) < 3 else {}
+
+
+def _is_numeric(series: pd.Series) -> bool:
+    return pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series)
+
+
+def _bin_dtype(bins: int) -> np.dtype:
+    """Smallest integer dtype holding bin indices"""
+    for dtype in (np.int8, np.int16, np.int32):
+        if bins <= np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+
+def encoding_target(y: pd.Series) -> Optional[np.ndarray]:
+    """
+    Target values a target encoding averages
+
+    Numeric targets are used as they are, binary targets as 0/1 (1 = the
+    second class in sorted order). Multi-class targets have no single mean to
+    encode and give None.
+    """
+    present = y.dropna()
+    if _is_numeric(y) and present.nunique() > 2:
+        return y.to_numpy(dtype=np.float64, na_value=np.nan)
+    classes = np.sort(present.unique())
+    if len(classes) != 2:
+        return None
+    return np.where(y.isna().to_numpy(), np.nan, (y == classes[1]).to_numpy(dtype=np.float64))
+
+
+def _dates(df: pd.DataFrame, col, parsed: Dict[Any, Optional[pd.Series]]) -> Optional[pd.Series]:
+    """A column as datetimes (None when it doesn't hold dates), parsed once per batch"""
+    if col not in parsed:
+        series = df[col]
+        if pd.api.types.is_datetime64_any_dtype(series):
+            parsed[col] = series
+        elif _is_numeric(series) or pd.api.types.is_bool_dtype(series):
+            parsed[col] = None
+        else:
+            fmt = detect_datetime_format(series)
+            parsed[col] = parse_datetime(series, fmt) if fmt is not None else None
+    return parsed[col]
+
+
+def plan_features(
+    df: pd.DataFrame,
+    operations: List[Dict[str, Any]],
+    parsed: Optional[Dict[Any, Optional[pd.Series]]] = None
+) -> List[Dict[str, Any]]:
+    """
+    New columns of a batch of operations, before anything is computed
+
+    Columns that are missing or of the wrong kind for an operation are
+    skipped, as are repeated output names (the first one wins).
+
+    Args:
+        df: Dataset
+        operations: List of {"operation", "columns", "params"}
+        parsed: Date columns parsed so far (filled in, shared with the build)
+
+    Returns:
+        List of {"name", "kind", "inputs", "params", "dtype"}
+    """
+    parsed = {} if parsed is None else parsed
+    planned: Dict[str, Dict[str, Any]] = {}
+
+    def add(name: str, kind: str, inputs: Tuple, params: Dict[str, Any], dtype):
+        planned.setdefault(name, {"kind": kind, "inputs": inputs, "params": params, "dtype": np.dtype(dtype)})
+
+    for op in operations:
+        kind = op.get("operation")
+        if kind not in FEATURE_OPERATIONS:
+            raise ValueError(f"Unknown feature operation: {kind}. Use one of {', '.join(FEATURE_OPERATIONS)}")
+        params = op.get("params") or {}
+        cols = [c for c in op.get("columns") or [] if c in df.columns]
+        numeric = [c for c in cols if _is_numeric(df[c])]
+
+        if kind in ("interaction", "ratio"):
+            suffix = "x" if kind == "interaction" else "div"
+            for a, b in combinations(numeric, 2):
+                add(f"{a}_{suffix}_{b}", kind, (a, b), {}, np.float32)
+        elif kind == "polynomial":
+            degree = int(params.get("degree", 2))
+            if degree < 1:
+                raise ValueError("degree must be at least 1")
+            for col in numeric:
+                add(f"{col}_pow{degree}", kind, (col,), {"degree": degree}, np.float32)
+        elif kind == "log":
+            for col in numeric:
+                add(f"{col}_log", kind, (col,), {}, np.float32)
+        elif kind == "binning":
+            bins = int(params.get("bins", 5))
+            if bins < 1:
+                raise ValueError("bins must be at least 1")
+            for col in numeric:
+                # Missing values stay NaN, which integer bins can't hold
+                dtype = np.float32 if df[col].hasnans else _bin_dtype(bins)
+                add(f"{col}_binned", kind, (col,), {"bins": bins}, dtype)
+        elif kind == "date_parts":
+            parts = params.get("parts") or DEFAULT_DATE_PARTS
+            unknown = [p for p in parts if p not in DATE_PARTS]
+            if unknown:
+                raise ValueError(f"Unknown date parts: {unknown}. Use {', '.join(DATE_PARTS)}")
+            for col in cols:
+                dates = _dates(df, col, parsed)
+                if dates is None:
+                    continue
+                has_missing = bool(dates.isna().any())
+                for part in parts:
+                    dtype = np.float32 if has_missing else (np.int16 if part == "year" else np.int8)
+                    add(f"{col}_{part}", kind, (col,), {"part": part}, dtype)
+        elif kind == "frequency_encoding":
+            for col in cols:
+                add(f"{col}_freq", kind, (col,), {}, np.float32)
+        else:
+            target = params.get("target")
+            if target not in df.columns:
+                raise ValueError("target_encoding needs an existing target column in params.target")
+            if encoding_target(df[target]) is None:
+                raise ValueError(f"Target '{target}' has more than two classes, it can't be target-encoded")
+            encoded = {"target": target, "folds": int(params.get("folds", 5)),
+                       "smoothing": float(params.get("smoothing", 10.0))}
+            for col in cols:
+                if col != target:
+                    add(f"{col}_te", kind, (col,), encoded, np.float32)
+    return [{"name": name, **spec} for name, spec in planned.items()]
+
+
+def _bin_indices(x: np.ndarray, bins: int) -> np.ndarray:
+    """Equal-width bin of each value, with the edges pd.cut(x, bins) uses"""
+    lo, hi = np.nanmin(x), np.nanmax(x)
+    if lo == hi:
+        pad = 0.001 * abs(lo) if lo != 0 else 0.001
+        edges = np.linspace(lo - pad, hi + pad, bins + 1)
+    else:
+        edges = np.linspace(lo, hi, bins + 1)
+        edges[0] -= 0.001 * (hi - lo)
+    # Right-closed intervals: a value on an edge belongs to the bin below
+    return np.searchsorted(edges[1:-1], x, side='left')
+
+
+def _target_encode(codes: np.ndarray, y: np.ndarray, folds: int, smoothing: float) -> np.ndarray:
+    """
+    Out-of-fold smoothed mean of y per code
+
+    Each row is encoded from the other folds only, so the feature doesn't
+    leak its own target. Sums per (code, fold) come from one bincount.
+    """
+    n = len(codes)
+    n_codes = int(codes.max()) + 1 if n else 0
+    fold = np.random.default_rng(0).permutation(n) % folds
+    known = ~np.isnan(y)
+    weight = known.astype(np.float64)
+    values = np.where(known, y, 0.0)
+    prior = values.sum() / weight.sum() if weight.sum() else 0.0
+
+    slot = codes * folds + fold
+    fold_sum = np.bincount(slot, values, minlength=n_codes * folds).reshape(n_codes, folds)
+    fold_count = np.bincount(slot, weight, minlength=n_codes * folds).reshape(n_codes, folds)
+    other_sum = fold_sum.sum(axis=1)[codes] - fold_sum[codes, fold]
+    other_count = fold_count.sum(axis=1)[codes] - fold_count[codes, fold]
+    return (other_sum + prior * smoothing) / (other_count + smoothing)
+
+
+def _compute(df: pd.DataFrame, spec: Dict[str, Any], out: np.ndarray, parsed: Dict[Any, Optional[pd.Series]]):
+    """Write one planned feature into out (a column of its block)"""
+    kind, params = spec["kind"], spec["params"]
+
+    if kind == "date_parts":
+        dates = _dates(df, spec["inputs"][0], parsed)
+        if dates.dt.tz is not None:
+            dates = dates.dt.tz_localize(None)
+        part = getattr(dates.dt, params["part"])
+        out[:] = part.to_numpy(dtype=np.float64, na_value=np.nan) if np.issubdtype(out.dtype, np.floating) else part.to_numpy()
+        return
+    if kind in ("frequency_encoding", "target_encoding"):
+        # Missing values form their own category
+        codes, _ = pd.factorize(df[spec["inputs"][0]], use_na_sentinel=False)
+        if kind == "frequency_encoding":
+            counts = np.bincount(codes)
+            np.divide(counts[codes], max(len(codes), 1), out=out, casting='same_kind')
+        else:
+            y = encoding_target(df[params["target"]])
+            out[:] = _target_encode(codes, y, max(params["folds"], 2), params["smoothing"])
+        return
+
+    values = [df[c].to_numpy(dtype=np.float64, na_value=np.nan) for c in spec["inputs"]]
+    with np.errstate(over='ignore', invalid='ignore', divide='ignore'):
+        if kind == "polynomial":
+            np.power(values[0], params["degree"], out=out, casting='same_kind')
+        elif kind == "log":
+            np.log1p(np.clip(values[0], 0, None), out=out, casting='same_kind')
+        elif kind == "interaction":
+            np.multiply(values[0], values[1], out=out, casting='same_kind')
+        elif kind == "ratio":
+            np.divide(values[0], np.where(values[1] == 0, np.nan, values[1]), out=out, casting='same_kind')
+        else:
+            x = values[0]
+            present = ~np.isnan(x)
+            if not present.any():
+                out[:] = np.nan
+                return
+            indices = _bin_indices(x, params["bins"])
+            if np.issubdtype(out.dtype, np.floating):
+                out[:] = np.where(present, indices, np.nan)
+            else:
+                out[:] = indices
+
+
+def build_features(
+    df: pd.DataFrame,
+    operations: List[Dict[str, Any]],
+    plan: Optional[List[Dict[str, Any]]] = None
+) -> pd.DataFrame:
+    """
+    Compute a batch of feature operations
+
+    Args:
+        df: Dataset
+        operations: List of {"operation", "columns", "params"}
+        plan: Result of plan_features, when the caller already planned the batch
+
+    Returns:
+        Dataframe of the new columns (index aligned with df), one block per
+        dtype, columns grouped by dtype
+    """
+    parsed: Dict[Any, Optional[pd.Series]] = {}
+    if plan is None:
+        plan = plan_features(df, operations, parsed)
+    if not plan:
+        return pd.DataFrame(index=df.index)
+
+    frames = []
+    by_dtype: Dict[np.dtype, List[Dict[str, Any]]] = {}
+    for spec in plan:
+        by_dtype.setdefault(spec["dtype"], []).append(spec)
+    for dtype, specs in by_dtype.items():
+        # Fortran order keeps each feature contiguous and is pandas' block layout
+        block = np.empty((len(df), len(specs)), dtype=dtype, order='F')
+        for j, spec in enumerate(specs):
+            _compute(df, spec, block[:, j], parsed)
+        frames.append(pd.DataFrame(block, index=df.index, columns=[s["name"] for s in specs], copy=False))
+
+    return pd.concat(frames, axis=1, **_CONCAT_NO_COPY) if len(frames) > 1 else frames[0]
+
+
+def add_features(df: pd.DataFrame, features: pd.DataFrame) -> pd.DataFrame:
+    """
+    df with the new columns appended
+
+    Existing columns are shared with df, not copied; a feature with the name
+    of an existing column replaces it.
+    """
+    replaced = [c for c in features.columns if c in df.columns]
+    if replaced:
+        df = df.drop(columns=replaced)
+    return pd.concat([df, features], axis=1, **_CONCAT_NO_COPY)
+
+
+def engineer(df: pd.DataFrame, operations: List[Dict[str, Any]]) -> Tuple[pd.DataFrame, List[str]]:
+    """Apply a batch of feature operations: (new dataset, new column names)"""
+    features = build_features(df, operations)
+    logger.info(f"Engineered {features.shape[1]} feature(s) over {len(df)} rows")
+    return add_features(df, features), [str(c) for c in features.columns]
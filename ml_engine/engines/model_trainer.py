@@ -14,22 +14,30 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# Rows of scaled training data kept for explainers
+BACKGROUND_SAMPLE_SIZE = 100
+
 class ModelTrainer:
     """
     Orchestrates training across multiple MCP model servers
     """
     
-    def __init__(self):
+    def __init__(self, keep_all_models: bool = False):
         self.servers = {
             'linear': LinearModelsServer(),
             'tree': TreeModelsServer(),
             'boosting': BoostingModelsServer(),
         }
+        self.keep_all_models = keep_all_models
+        self.models = {}  # model_name -> fitted estimator
         self.results = []
         self.best_model = None
         self.problem_type = None
         self.feature_names = None
         self.label_encoder = None
+        self.feature_encoders = {}  # column -> LabelEncoder for categorical features
+        self.fill_values = None  # per-feature means used to impute missing values
+        self.background = None  # scaled training sample used as SHAP background
         self.scaler = StandardScaler()
         logger.info("ModelTrainer initialized")
     
@@ -73,6 +81,11 @@ class ModelTrainer:
             
             logger.info(f"Train size: {X_train.shape[0]}, Test size: {X_test.shape[0]}")
             
+            # Keep a small training sample so explainers don't need the dataset
+            rng = np.random.default_rng(42)
+            sample_size = min(BACKGROUND_SAMPLE_SIZE, X_train.shape[0])
+            self.background = X_train[rng.choice(X_train.shape[0], sample_size, replace=False)]
+            
             # Determine which models to train
             if model_types is None:
                 # Classification-specific models
@@ -141,6 +154,12 @@ class ModelTrainer:
                 'model_name': best_result['model_name'],
             }
             
+            # Servers only hold the last model of each family, so point the
+            # best server back at the best estimator before releasing the rest
+            self.servers[best_result['server']].trained_model = self.models[best_result['model_name']]
+            if not self.keep_all_models:
+                self.release_models()
+            
             return {
                 'results': results,
                 'best_model': results[0],
@@ -178,15 +197,19 @@ class ModelTrainer:
             logger.info("Detected regression problem")
         
         # Handle categorical features
+        self.feature_encoders = {}
         for col in X.select_dtypes(include=['object']).columns:
             logger.info(f"Encoding categorical column: {col}")
             le = LabelEncoder()
             X[col] = le.fit_transform(X[col].astype(str))
+            self.feature_encoders[col] = le
         
-        # Fill missing values
+        # Fill missing values (means are kept so inference imputes the same way)
+        means = X.mean()
+        self.fill_values = means.values.astype(float)
         if X.isnull().any().any():
             logger.info("Filling missing values")
-            X = X.fillna(X.mean())
+            X = X.fillna(means)
         
         # Convert to numpy
         X = X.values
@@ -198,6 +221,28 @@ class ModelTrainer:
         
         return X, y, problem_type
     
+    def encode_features(self, df: pd.DataFrame) -> np.ndarray:
+        """
+        Encode raw feature columns with the training encoders
+        
+        Columns are reordered to the training order, missing columns become NaN
+        and unseen categories become NaN so they are imputed downstream.
+        """
+        X = df.reindex(columns=self.feature_names)
+        for col, le in self.feature_encoders.items():
+            mapping = {cls: code for code, cls in enumerate(le.classes_)}
+            X[col] = X[col].astype(str).map(mapping)
+        return X.apply(pd.to_numeric, errors='coerce').values.astype(float)
+    
+    def preprocess(self, X: np.ndarray) -> np.ndarray:
+        """Impute and scale encoded features exactly as during training"""
+        X = np.asarray(X, dtype=float)
+        if self.fill_values is not None:
+            missing = np.isnan(X)
+            if missing.any():
+                X = np.where(missing, self.fill_values, X)
+        return self.scaler.transform(X)
+    
     def _train_single_model(
         self, 
         server_name: str, 
@@ -228,6 +273,9 @@ class ModelTrainer:
                 train_info['cv_score_mean'] = float(cv_scores.mean())
                 train_info['cv_score_std'] = float(cv_scores.std())
         
+        # Keep a handle on this estimator before the next model of the same family replaces it
+        self.models[train_info['model_name']] = server.trained_model
+        
         # Predict on test set
         y_pred = server.predict(X_test)
         
@@ -333,6 +381,38 @@ class ModelTrainer:
             return None
         return self.servers[self.best_model['server']]
     
+    def get_model(self, model_name: str):
+        """Get a retained fitted estimator by model name"""
+        if model_name not in self.models:
+            raise ValueError(f"Model '{model_name}' is not retained for this job")
+        return self.models[model_name]
+    
+    def release_models(self):
+        """Drop every fitted estimator except the best one"""
+        best_name = self.best_model['model_name'] if self.best_model else None
+        best_server = self.best_model['server'] if self.best_model else None
+        
+        self.models = {name: model for name, model in self.models.items() if name == best_name}
+        for server_name, server in self.servers.items():
+            if server_name != best_server:
+                server.trained_model = None
+        
+        logger.info(f"Released non-best models, retained: {list(self.models.keys())}")
+    
+    def estimate_memory_bytes(self) -> int:
+        """Approximate size of retained artifacts (pickled models + preprocessing)"""
+        import pickle
+        
+        total = 0
+        for obj in [*self.models.values(), self.scaler, self.label_encoder]:
+            if obj is None:
+                continue
+            try:
+                total += len(pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL))
+            except Exception as e:
+                logger.warning(f"Could not size artifact {type(obj).__name__}: {e}")
+        return total
+    
     def _train_with_tuning(
         self,
         server,
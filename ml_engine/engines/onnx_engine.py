@@ -0,0 +1,236 @@
+import numpy as np
+from typing import Dict, Any, Optional, Tuple
+import logging
+
+# ONNX conversion and runtime are optional dependencies
+try:
+    from skl2onnx import convert_sklearn, update_registered_converter
+    from skl2onnx.common.data_types import FloatTensorType
+    from skl2onnx.common.shape_calculator import (
+        calculate_linear_classifier_output_shapes,
+        calculate_linear_regressor_output_shapes,
+    )
+    SKL2ONNX_AVAILABLE = True
+except ImportError:
+    SKL2ONNX_AVAILABLE = False
+
+try:
+    import onnxruntime as ort
+    ONNXRUNTIME_AVAILABLE = True
+except ImportError:
+    ONNXRUNTIME_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# onnxmltools' tree converters only emit ai.onnx.ml up to opset 3
+DEFAULT_TARGET_OPSET = {'': 15, 'ai.onnx.ml': 3}
+
+_boosting_converters_registered = False
+
+
+def _register_boosting_converters():
+    """Register onnxmltools converters for XGBoost and LightGBM with skl2onnx"""
+    global _boosting_converters_registered
+    if _boosting_converters_registered:
+        return
+
+    try:
+        import xgboost as xgb
+        from onnxmltools.convert.xgboost.operator_converters.XGBoost import convert_xgboost
+
+        update_registered_converter(
+            xgb.XGBClassifier, 'XGBoostXGBClassifier',
+            calculate_linear_classifier_output_shapes, convert_xgboost,
+            options={'nocl': [True, False], 'zipmap': [True, False, 'columns']},
+        )
+        update_registered_converter(
+            xgb.XGBRegressor, 'XGBoostXGBRegressor',
+            calculate_linear_regressor_output_shapes, convert_xgboost,
+        )
+    except ImportError as e:
+        logger.warning(f"XGBoost ONNX converter not available: {e}")
+
+    try:
+        from lightgbm import LGBMClassifier, LGBMRegressor
+        from onnxmltools.convert.lightgbm.operator_converters.LightGbm import convert_lightgbm
+
+        update_registered_converter(
+            LGBMClassifier, 'LightGbmLGBMClassifier',
+            calculate_linear_classifier_output_shapes, convert_lightgbm,
+            options={'nocl': [True, False], 'zipmap': [True, False, 'columns']},
+        )
+        update_registered_converter(
+            LGBMRegressor, 'LightGbmLGBMRegressor',
+            calculate_linear_regressor_output_shapes, convert_lightgbm,
+            options={'split': None},
+        )
+    except ImportError as e:
+        logger.warning(f"LightGBM ONNX converter not available: {e}")
+
+    _boosting_converters_registered = True
+
+
+def _with_xgboost_base_score(model):
+    """
+    XGBoost >= 2 leaves base_score unset on the sklearn wrapper and keeps the
+    fitted value in the booster config; the converter would otherwise assume 0.5
+    """
+    if type(model).__module__.split('.')[0] != 'xgboost' or model.get_params().get('base_score') is not None:
+        return model
+
+    import copy
+    import json
+
+    config = json.loads(model.get_booster().save_config())
+    raw = config['learner']['learner_model_param']['base_score']
+    values = [float(v) for v in raw.strip('[]').split(',') if v.strip()]
+    if len(values) != 1:
+        # Vector base scores (multi-target) are not supported by the converter
+        return model
+
+    model = copy.deepcopy(model)
+    model.set_params(base_score=values[0])
+    return model
+
+
+def _preprocessing_model(trainer, num_features: int, opset_import, ir_version: int):
+    """
+    Training-time mean imputation and standard scaling as an ONNX graph
+
+    Takes and computes float64 and casts the result to float32 once, the same
+    values trainer.preprocess() feeds the model-only graph. Rounding raw or
+    scaled values to float32 earlier moves values sitting exactly on a tree
+    split (label codes, boosting histogram cuts) to the other side.
+    """
+    from onnx import TensorProto, helper, numpy_helper
+
+    fill_values = trainer.fill_values if trainer.fill_values is not None else np.zeros(num_features)
+    scaler = trainer.scaler
+    mean = scaler.mean_ if scaler.with_mean else np.zeros(num_features)
+    scale = scaler.scale_ if getattr(scaler, 'scale_', None) is not None else np.ones(num_features)
+
+    initializers = [
+        numpy_helper.from_array(np.asarray(values, dtype=np.float64).reshape(1, -1), name)
+        for name, values in (('pre_fill', fill_values), ('pre_mean', mean), ('pre_scale', scale))
+    ]
+    nodes = [
+        helper.make_node('IsNaN', ['input'], ['pre_missing']),
+        helper.make_node('Where', ['pre_missing', 'pre_fill', 'input'], ['pre_imputed']),
+        helper.make_node('Sub', ['pre_imputed', 'pre_mean'], ['pre_centered']),
+        helper.make_node('Div', ['pre_centered', 'pre_scale'], ['pre_scaled']),
+        helper.make_node('Cast', ['pre_scaled'], ['scaled'], to=TensorProto.FLOAT),
+    ]
+    graph = helper.make_graph(
+        nodes, 'preprocessing',
+        [helper.make_tensor_value_info('input', TensorProto.DOUBLE, [None, num_features])],
+        [helper.make_tensor_value_info('scaled', TensorProto.FLOAT, [None, num_features])],
+        initializer=initializers,
+    )
+    return helper.make_model(graph, opset_imports=opset_import, ir_version=ir_version)
+
+
+def export_to_onnx(
+    trainer,
+    model=None,
+    target_opset: Optional[Dict[str, int]] = None,
+    include_preprocessing: bool = True
+) -> bytes:
+    """
+    Export a trained model (optionally with imputation + scaling) as ONNX
+
+    Args:
+        trainer: Fitted ModelTrainer (provides fill values and scaler)
+        model: Estimator to export (defaults to the best model)
+        target_opset: Opset per ONNX domain (defaults to DEFAULT_TARGET_OPSET)
+        include_preprocessing: Embed imputer and scaler in the graph (in
+            float64, so predictions match the model-only graph fed with
+            trainer.preprocess() output)
+
+    Returns:
+        Serialized ONNX model taking an 'input' tensor in
+        trainer.feature_names order: label-encoded float64 features, or
+        already preprocessed float32 features when include_preprocessing
+        is False.
+    """
+    if not SKL2ONNX_AVAILABLE:
+        raise ImportError("ONNX export requires skl2onnx and onnxmltools. Run: pip install skl2onnx onnxmltools")
+
+    if model is None:
+        model = trainer.get_best_model_server().trained_model
+    if model is None:
+        raise ValueError("No trained model to export")
+
+    _register_boosting_converters()
+    model = _with_xgboost_base_score(model)
+
+    num_features = len(trainer.feature_names)
+
+    options = {}
+    if hasattr(model, 'predict_proba'):
+        # Plain probability tensor instead of a list of dicts
+        options[id(model)] = {'zipmap': False}
+
+    try:
+        onnx_model = convert_sklearn(
+            model,
+            initial_types=[('features' if include_preprocessing else 'input', FloatTensorType([None, num_features]))],
+            options=options,
+            target_opset=target_opset or DEFAULT_TARGET_OPSET,
+        )
+    except Exception as e:
+        raise ValueError(f"{type(model).__name__} cannot be exported to ONNX: {e}")
+
+    if include_preprocessing:
+        from onnx import compose
+
+        preprocessing = _preprocessing_model(trainer, num_features, onnx_model.opset_import, onnx_model.ir_version)
+        onnx_model = compose.merge_models(preprocessing, onnx_model, io_map=[('scaled', 'features')])
+
+    logger.info(
+        f"Exported {type(model).__name__} to ONNX ({num_features} features, "
+        f"preprocessing {'embedded' if include_preprocessing else 'external'})"
+    )
+    return onnx_model.SerializeToString()
+
+
+class OnnxPredictor:
+    """
+    ONNX Runtime CPU inference for an exported pipeline
+    The session releases the GIL while running, so concurrent requests scale
+    """
+
+    def __init__(self, onnx_bytes: bytes, intra_op_threads: int = 0):
+        if not ONNXRUNTIME_AVAILABLE:
+            raise ImportError("ONNX Runtime is not installed. Run: pip install onnxruntime")
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+
+        self.session = ort.InferenceSession(
+            onnx_bytes, sess_options=options, providers=['CPUExecutionProvider']
+        )
+        self.input_name = self.session.get_inputs()[0].name
+        self.input_dtype = np.float64 if self.session.get_inputs()[0].type == 'tensor(double)' else np.float32
+        self.output_names = [o.name for o in self.session.get_outputs()]
+
+    def predict(self, X: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """
+        Run the exported graph on a feature matrix
+
+        Returns:
+            Tuple of (predictions, probabilities or None)
+        """
+        outputs = self.session.run(None, {self.input_name: np.asarray(X, dtype=self.input_dtype)})
+        predictions = outputs[0].ravel() if outputs[0].ndim > 1 and outputs[0].shape[1] == 1 else outputs[0]
+        probabilities = outputs[1] if len(outputs) > 1 else None
+        return predictions, probabilities
+
+    def info(self) -> Dict[str, Any]:
+        """Describe the session inputs and outputs"""
+        return {
+            'input': self.input_name,
+            'outputs': self.output_names,
+            'providers': self.session.get_providers(),
+        }
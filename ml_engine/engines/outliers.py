@@ -0,0 +1,160 @@
+"""
+Outlier detection
+Univariate methods (IQR, z-score) compute every column's bounds in one call
+and flag values with a single broadcast comparison, giving a rows x columns
+mask. Multivariate methods (IsolationForest, robust covariance) are fitted on
+a subsample and then score every row in chunks.
+"""
+from typing import Dict, Any, List, Optional, Sequence
+import logging
+
+import numpy as np
+import pandas as pd
+from sklearn.covariance import EllipticEnvelope
+from sklearn.ensemble import IsolationForest
+
+logger = logging.getLogger(__name__)
+
+UNIVARIATE_METHODS = ("iqr", "zscore")
+MULTIVARIATE_METHODS = ("isolation_forest", "robust_covariance")
+OUTLIER_METHODS = UNIVARIATE_METHODS + MULTIVARIATE_METHODS
+
+# Rows the multivariate models are fitted on
+FIT_SAMPLE_ROWS = 20000
+# Rows scored per chunk by a fitted model
+SCORE_CHUNK_ROWS = 100000
+# Flagged values returned per column
+SAMPLE_VALUES = 5
+
+
+def iqr_bounds(df: pd.DataFrame, threshold: float = 1.5) -> pd.DataFrame:
+    """Lower and upper IQR fences of every column, from one quantile call"""
+    quartiles = df.quantile([0.25, 0.75])
+    q1, q3 = quartiles.iloc[0], quartiles.iloc[1]
+    iqr = q3 - q1
+    return pd.DataFrame({"lower": q1 - threshold * iqr, "upper": q3 + threshold * iqr})
+
+
+def univariate_mask(values: pd.DataFrame, method: str = "iqr", threshold: float = 1.5) -> np.ndarray:
+    """
+    Outlying values of every column at once
+
+    Args:
+        values: Numeric columns
+        method: "iqr" (threshold = IQR multiplier) or "zscore" (threshold = |z|)
+        threshold: Method threshold
+
+    Returns:
+        Boolean rows x columns mask (missing values are never outliers)
+    """
+    data = values.to_numpy(dtype=np.float64, na_value=np.nan)
+    with np.errstate(invalid='ignore'):
+        if method == "zscore":
+            # Population standard deviation, as scipy.stats.zscore
+            mean = np.nanmean(data, axis=0)
+            std = np.nanstd(data, axis=0)
+            return np.abs(data - mean) > threshold * std
+        bounds = iqr_bounds(values, threshold)
+        return (data < bounds["lower"].to_numpy()) | (data > bounds["upper"].to_numpy())
+
+
+def multivariate_mask(
+    values: pd.DataFrame,
+    method: str = "isolation_forest",
+    contamination: float = 0.05,
+    random_state: int = 42
+) -> np.ndarray:
+    """
+    Outlying rows under a model of all columns jointly
+
+    The model is fitted on up to FIT_SAMPLE_ROWS rows, then every row is
+    scored. Missing values are filled with the column median.
+
+    Args:
+        values: Numeric columns
+        method: "isolation_forest" or "robust_covariance"
+        contamination: Expected share of outlying rows
+        random_state: Seed of the subsample and the model
+
+    Returns:
+        Boolean mask over rows
+    """
+    data = values.to_numpy(dtype=np.float64, na_value=np.nan)
+    n = len(data)
+    if n == 0 or data.shape[1] == 0:
+        return np.zeros(n, dtype=bool)
+    median = np.nanmedian(data, axis=0)
+    median = np.where(np.isnan(median), 0.0, median)
+    missing = np.isnan(data)
+    if missing.any():
+        data = np.where(missing, median, data)
+    # Standardized, so the covariance fit is well conditioned
+    scale = data.std(axis=0)
+    data = (data - median) / np.where(scale > 0, scale, 1.0)
+
+    rng = np.random.default_rng(random_state)
+    fit_rows = rng.choice(n, FIT_SAMPLE_ROWS, replace=False) if n > FIT_SAMPLE_ROWS else slice(None)
+    if method == "robust_covariance":
+        model = EllipticEnvelope(contamination=contamination, random_state=random_state)
+    else:
+        model = IsolationForest(contamination=contamination, random_state=random_state, n_jobs=1)
+    model.fit(data[fit_rows])
+
+    mask = np.empty(n, dtype=bool)
+    for start in range(0, n, SCORE_CHUNK_ROWS):
+        chunk = data[start:start + SCORE_CHUNK_ROWS]
+        mask[start:start + len(chunk)] = model.decision_function(chunk) < 0
+    return mask
+
+
+def detect_outliers(
+    df: pd.DataFrame,
+    columns: Optional[Sequence] = None,
+    method: str = "iqr",
+    threshold: float = 1.5,
+    contamination: float = 0.05
+) -> Dict[str, Any]:
+    """
+    Outliers of the numeric columns of a dataframe
+
+    Args:
+        df: Dataset
+        columns: Columns to check (default: every numeric column; others are ignored)
+        method: One of OUTLIER_METHODS
+        threshold: IQR multiplier or |z| for univariate methods
+        contamination: Expected outlier share for multivariate methods
+
+    Returns:
+        Dictionary with columns (checked), row_mask (rows with any outlier),
+        and details (per column: outlier_count, percentage of non-missing
+        values, sample_values)
+    """
+    if method not in OUTLIER_METHODS:
+        raise ValueError(f"Unknown outlier method: {method}. Use one of {', '.join(OUTLIER_METHODS)}")
+    numeric_cols = df.select_dtypes(include=[np.number]).columns.tolist()
+    columns = [c for c in (columns or numeric_cols) if c in numeric_cols]
+    if not columns:
+        return {"columns": [], "row_mask": np.zeros(len(df), dtype=bool), "details": []}
+    values = df[columns]
+    present = values.notna().to_numpy()
+
+    if method in MULTIVARIATE_METHODS:
+        row_mask = multivariate_mask(values, method, contamination)
+        # A flagged row counts against each column it has a value in
+        mask = row_mask[:, None] & present
+    else:
+        mask = univariate_mask(values, method, threshold)
+        row_mask = mask.any(axis=1)
+
+    counts = mask.sum(axis=0)
+    non_missing = present.sum(axis=0)
+    details: List[Dict[str, Any]] = []
+    for j, col in enumerate(columns):
+        flagged = np.flatnonzero(mask[:, j])[:SAMPLE_VALUES]
+        details.append({
+            "column": col,
+            "outlier_count": int(counts[j]),
+            "percentage": round(float(counts[j] / non_missing[j] * 100), 2) if non_missing[j] else 0.0,
+            "sample_values": values.iloc[flagged, j].tolist(),
+        })
+    return {"columns": columns, "row_mask": row_mask, "details": details}
@@ -0,0 +1,564 @@
+"""
+Dataset profiler
+One engine behind every analysis endpoint. A DatasetProfile computes each
+shared fact (null counts, duplicates, unique counts, numeric summary,
+correlations, value counts) at most once, vectorized over all columns, and
+builds the sections a caller asks for from them.
+
+Callers describe what they need with a spec:
+    {"sections": [...], "charts": [...], "limits": {...}}
+where sections/charts are names from SECTIONS/CHARTS and limits override
+DEFAULT_LIMITS. Results are memoized per spec.
+"""
+from typing import Dict, Any, List, Optional
+import json
+import logging
+
+import numpy as np
+import pandas as pd
+
+from ml_engine.engines.correlation import correlation_matrix, top_correlations
+from ml_engine.engines.downsampling import downsample_scatter, downsample_time_series
+from ml_engine.engines.duplicates import RowHashIndex
+from ml_engine.engines.type_inference import infer_column_types, parse_datetime
+
+logger = logging.getLogger(__name__)
+
+SECTIONS = (
+    "basic_info", "numeric_stats", "categorical_stats", "missing_values", "data_quality",
+    "correlations", "descriptive_stats", "recommendations", "insights", "chart_data",
+)
+CHARTS = (
+    "distributions", "categorical_counts", "correlation_heatmap", "missing_values_chart",
+    "box_plots", "scatter_matrix", "time_series",
+)
+
+DEFAULT_LIMITS = {
+    "distribution_columns": 6,
+    "distribution_bins": 20,
+    "categorical_columns": 6,
+    "top_categories": 10,
+    "heatmap_columns": None,  # None = every numeric column
+    "box_plot_columns": 6,
+    "box_plot_outliers": 50,
+    "scatter_columns": 4,
+    "scatter_min_abs_corr": None,  # None = every pair
+    "scatter_max_pairs": None,
+    "time_series_columns": 3,
+    "time_series_points": 1000,
+    "strong_correlation": 0.7,
+    "strong_correlation_pairs": 100,  # Strongest pairs listed, None = every pair
+}
+
+# /api/data/analyze (the Data Insights dashboard)
+DASHBOARD_PROFILE = {
+    "sections": ["basic_info", "data_quality", "missing_values", "descriptive_stats",
+                 "chart_data", "recommendations", "insights"],
+    "charts": list(CHARTS),
+    "limits": {
+        "distribution_columns": 8,
+        "categorical_columns": 8,
+        "heatmap_columns": 10,
+        "scatter_columns": 8,
+        "scatter_min_abs_corr": 0.3,
+        "scatter_max_pairs": 6,
+        "time_series_points": 300,  # About one point per pixel of the dashboard chart
+    },
+}
+
+# /api/analysis/analyze and voice analysis
+ANALYSIS_PROFILE = {
+    "sections": ["basic_info", "numeric_stats", "categorical_stats", "missing_values",
+                 "data_quality", "correlations", "recommendations", "chart_data"],
+    "charts": list(CHARTS),
+    "limits": {},
+}
+
+
+def _safe_float(value) -> Optional[float]:
+    """JSON-safe float (NaN/inf -> None)"""
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return value if np.isfinite(value) else None
+
+
+def _safe_list(values) -> List[Optional[float]]:
+    return [_safe_float(v) for v in values]
+
+
+def _round(value, digits: int = 4) -> Optional[float]:
+    value = _safe_float(value)
+    return round(value, digits) if value is not None else None
+
+
+class DatasetProfile:
+    """
+    Profile of one dataset version
+
+    Shared facts are computed lazily and kept, so profiling several specs
+    (or the same spec twice) never repeats the work.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.df = df
+        self.rows, self.cols = df.shape
+        self._facts: Dict[str, Any] = {}
+        self._value_counts: Dict[str, pd.Series] = {}
+        self._corr_subsets: Dict[tuple, pd.DataFrame] = {}
+        self._parsed_dates: Dict[str, pd.Series] = {}
+        self._results: Dict[str, Dict[str, Any]] = {}
+
+    def profile(self, spec: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Build the sections named in a spec
+
+        Args:
+            spec: {"sections": [...], "charts": [...], "limits": {...}}
+
+        Returns:
+            Dictionary of section name -> section data, in spec order
+        """
+        key = json.dumps(spec, sort_keys=True, default=str)
+        if key not in self._results:
+            limits = {**DEFAULT_LIMITS, **spec.get("limits", {})}
+            result = {}
+            for section in spec.get("sections", []):
+                if section not in SECTIONS:
+                    raise ValueError(f"Unknown profile section: {section}")
+                if section == "chart_data":
+                    result[section] = self._chart_data(spec.get("charts", CHARTS), limits)
+                else:
+                    result[section] = getattr(self, f"_{section}")(limits)
+            self._results[key] = result
+        return self._results[key]
+
+    # ---------- shared facts ----------
+
+    def _fact(self, name: str, compute):
+        if name not in self._facts:
+            self._facts[name] = compute()
+        return self._facts[name]
+
+    @property
+    def numeric_cols(self) -> List[str]:
+        return self._fact("numeric_cols", lambda: self.df.select_dtypes(include=[np.number]).columns.tolist())
+
+    @property
+    def categorical_cols(self) -> List[str]:
+        """Text and category columns, except text columns holding dates"""
+        def compute():
+            dates = set(self.datetime_cols)
+            return [c for c in self.df.select_dtypes(include=['object', 'category', 'string']).columns
+                    if c not in dates]
+        return self._fact("categorical_cols", compute)
+
+    @property
+    def null_counts(self) -> pd.Series:
+        return self._fact("null_counts", lambda: self.df.isnull().sum())
+
+    @property
+    def total_missing(self) -> int:
+        return int(self.null_counts.sum())
+
+    @property
+    def duplicate_count(self) -> int:
+        return self._fact("duplicate_count", lambda: self.row_index.duplicate_count())
+
+    @property
+    def row_index(self) -> RowHashIndex:
+        """Row hashes behind duplicate counts and drop_duplicates"""
+        return self._fact("row_index", lambda: RowHashIndex(self.df))
+
+    @property
+    def nunique(self) -> pd.Series:
+        return self._fact("nunique", lambda: self.df.nunique())
+
+    @property
+    def numeric_summary(self) -> pd.DataFrame:
+        """One row per numeric column: count, mean, std, min, 25%, 50%, 75%, max, skew, kurtosis, zeros"""
+        def compute():
+            numeric = self.df[self.numeric_cols]
+            quartiles = numeric.quantile([0.25, 0.5, 0.75])
+            return pd.DataFrame({
+                "count": numeric.count(),
+                "mean": numeric.mean(),
+                "std": numeric.std(),
+                "min": numeric.min(),
+                "25%": quartiles.loc[0.25],
+                "50%": quartiles.loc[0.5],
+                "75%": quartiles.loc[0.75],
+                "max": numeric.max(),
+                "skew": numeric.skew(),
+                "kurtosis": numeric.kurtosis(),
+                "zeros": (numeric == 0).sum(),
+            }, index=self.numeric_cols)
+        return self._fact("numeric_summary", compute)
+
+    @property
+    def corr(self) -> pd.DataFrame:
+        """Pairwise correlation of every numeric column (subsets are slices of it)"""
+        return self._fact("corr", lambda: correlation_matrix(self.df, self.numeric_cols))
+
+    def corr_of(self, cols: List[str]) -> pd.DataFrame:
+        """Correlation of a few columns: a slice of the full matrix once it exists"""
+        if "corr" in self._facts:
+            return self.corr.loc[cols, cols]
+        key = tuple(cols)
+        if key not in self._corr_subsets:
+            self._corr_subsets[key] = correlation_matrix(self.df, cols)
+        return self._corr_subsets[key]
+
+    @property
+    def column_types(self) -> Dict[str, Dict[str, Any]]:
+        """Semantic type (and date format) of every column, inferred from samples"""
+        return self._fact("column_types", lambda: infer_column_types(self.df))
+
+    @property
+    def datetime_cols(self) -> List[str]:
+        """Datetime columns and text columns holding dates, in column order"""
+        types = self.column_types
+        return self._fact("datetime_cols", lambda: [
+            c for c in self.df.columns if types[str(c)]["kind"] == "datetime"
+        ])
+
+    def datetime_column(self, col: str) -> pd.Series:
+        """A column converted to datetimes, parsed once with its detected format"""
+        if col not in self._parsed_dates:
+            self._parsed_dates[col] = parse_datetime(
+                self.df[col], self.column_types.get(str(col), {}).get("format")
+            )
+        return self._parsed_dates[col]
+
+    def value_counts(self, col: str) -> pd.Series:
+        if col not in self._value_counts:
+            self._value_counts[col] = self.df[col].value_counts()
+        return self._value_counts[col]
+
+    def _missing_pct(self) -> float:
+        return (self.total_missing / (self.rows * self.cols)) * 100 if self.rows * self.cols > 0 else 0.0
+
+    # ---------- sections ----------
+
+    def _basic_info(self, limits: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "num_rows": int(self.rows),
+            "num_columns": int(self.cols),
+            "numeric_columns": len(self.numeric_cols),
+            "categorical_columns": len(self.categorical_cols),
+            "column_names": [str(c) for c in self.df.columns],
+            "column_types": {str(col): str(dtype) for col, dtype in self.df.dtypes.items()},
+            "datetime_columns": [str(c) for c in self.datetime_cols],
+            "memory_usage_mb": float(self.df.memory_usage(deep=True).sum() / 1024**2),
+            "duplicate_rows": self.duplicate_count,
+        }
+
+    def _numeric_stats(self, limits: Dict[str, Any]) -> Dict[str, Any]:
+        summary = self.numeric_summary
+        nunique = self.nunique
+        return {
+            str(col): {
+                "mean": _safe_float(row["mean"]),
+                "median": _safe_float(row["50%"]),
+                "std": _safe_float(row["std"]),
+                "min": _safe_float(row["min"]),
+                "max": _safe_float(row["max"]),
+                "q25": _safe_float(row["25%"]),
+                "q75": _safe_float(row["75%"]),
+                "skewness": _safe_float(row["skew"]),
+                "kurtosis": _safe_float(row["kurtosis"]),
+                "unique_values": int(nunique[col]),
+                "zeros_count": int(row["zeros"]),
+            }
+            for col, row in summary.iterrows()
+        }
+
+    def _categorical_stats(self, limits: Dict[str, Any]) -> Dict[str, Any]:
+        stats = {}
+        for col in self.categorical_cols:
+            value_counts = self.value_counts(col)
+            stats[str(col)] = {
+                "unique_values": int(self.nunique[col]),
+                "most_common": str(value_counts.index[0]) if len(value_counts) > 0 else None,
+                "most_common_count": int(value_counts.iloc[0]) if len(value_counts) > 0 else 0,
+                "top_10_values": {str(k): int(v) for k, v in value_counts.head(10).items()},
+            }
+        return stats
+
+    def _missing_values(self, limits: Dict[str, Any]) -> Dict[str, Any]:
+        missing = self.null_counts[self.null_counts > 0]
+        return {
+            "total_missing": self.total_missing,
+            "missing_percentage": round(self._missing_pct(), 2),
+            "per_column": {str(col): int(count) for col, count in missing.items()},
+            "per_column_percentage": {
+                str(col): round(count / self.rows * 100, 2) for col, count in missing.items()
+            },
+        }
+
+    def _data_quality(self, limits: Dict[str, Any]) -> Dict[str, Any]:
+        # Start with 100 and deduct for issues
+        quality_score = 100
+        issues = []
+
+        # Check for missing values
+        if self.total_missing > 0:
+            missing_pct = self._missing_pct()
+            if missing_pct > 20:
+                quality_score -= 30
+                issues.append(f"High missing values: {missing_pct:.1f}% of data is missing")
+            elif missing_pct > 5:
+                quality_score -= 15
+                issues.append(f"Moderate missing values: {missing_pct:.1f}% of data is missing")
+            else:
+                quality_score -= 5
+                issues.append(f"Low missing values: {missing_pct:.1f}% of data is missing")
+
+        mostly_missing = [str(c) for c in self.null_counts.index[self.null_counts > 0.5 * self.rows]]
+        if mostly_missing:
+            quality_score -= 5
+            issues.append(f"Columns more than half empty: {mostly_missing}")
+
+        # Check for duplicates
+        if self.duplicate_count > 0:
+            dup_pct = (self.duplicate_count / self.rows) * 100
+            if dup_pct > 10:
+                quality_score -= 20
+                issues.append(f"High duplicates: {self.duplicate_count} duplicate rows ({dup_pct:.1f}%)")
+            else:
+                quality_score -= 10
+                issues.append(f"{self.duplicate_count} duplicate rows found ({dup_pct:.1f}%)")
+
+        # Check for columns with single value
+        for col in self.nunique.index[self.nunique == 1]:
+            quality_score -= 5
+            issues.append(f"Column '{col}' has only one unique value")
+
+        # Check for identifier-like text columns
+        for col in self.categorical_cols:
+            if self.rows and self.nunique[col] > 0.9 * self.rows:
+                issues.append(f"High cardinality in {col}")
+
+        return {
+            "quality_score": max(0, quality_score),  # Don't go below 0
+            "issues": issues,
+            "duplicate_rows": self.duplicate_count,
+            "completeness": round(100 - self._missing_pct(), 2) if self.rows * self.cols > 0 else 100,
+        }
+
+    def _correlations(self, limits: Dict[str, Any]) -> Dict[str, Any]:
+        if len(self.numeric_cols) < 2:
+            return {}
+        corr = self.corr
+        names = [str(c) for c in corr.columns]
+        # Strong correlations: strongest pairs beyond the threshold
+        strong = top_correlations(corr, limits["strong_correlation_pairs"], limits["strong_correlation"])
+        return {
+            "correlation_matrix": {
+                c1: dict(zip(names, _safe_list(row))) for c1, row in zip(names, corr.to_numpy())
+            },
+            "strong_correlations": [
+                {"col1": col1, "col2": col2, "correlation": r} for col1, col2, r in strong
+            ],
+        }
+
+    def _descriptive_stats(self, limits: Dict[str, Any]) -> Dict[str, Any]:
+        summary = self.numeric_summary
+        columns = ["count", "mean", "std", "min", "25%", "50%", "75%", "max", "skew", "kurtosis"]
+        return {
+            str(col): {name: _round(row[name]) for name in columns}
+            for col, row in summary.iterrows()
+        }
+
+    def _recommendations(self, limits: Dict[str, Any]) -> List[str]:
+        recommendations = []
+
+        if self.total_missing > 0:
+            recommendations.append("Consider handling missing values using imputation or removal")
+
+        if self.duplicate_count > 0:
+            recommendations.append("Review and remove duplicate rows if they are not intentional")
+
+        if len(self.categorical_cols) > 0:
+            recommendations.append("Encode categorical variables before training ML models")
+
+        # Check for high cardinality categorical columns
+        for col in self.categorical_cols:
+            if self.nunique[col] > 50:
+                recommendations.append(f"Column '{col}' has high cardinality ({self.nunique[col]} unique values) - consider binning")
+                break
+
+        # Check for potential target detection
+        for col in self.numeric_cols:
+            if self.rows and self.nunique[col] / self.rows < 0.05 and self.nunique[col] <= 10:
+                recommendations.append(f"Column '{col}' appears suitable for classification (low cardinality)")
+                break
+
+        # Scaling recommendation
+        if len(self.numeric_cols) > 0:
+            ranges = self.numeric_summary["max"] - self.numeric_summary["min"]
+            if ranges.max() > 100 * ranges.min():
+                recommendations.append("Consider feature scaling due to different value ranges")
+
+        if len(recommendations) == 0:
+            recommendations.append("Dataset looks well-prepared for analysis!")
+
+        return recommendations
+
+    def _insights(self, limits: Dict[str, Any]) -> List[str]:
+        insights = [f"Dataset contains {self.rows:,} rows and {self.cols} columns"]
+
+        if self.total_missing > 0:
+            insights.append(f"Found {self.total_missing:,} missing values ({self._missing_pct():.1f}% of total data)")
+        else:
+            insights.append("No missing values detected - data is complete!")
+
+        if len(self.numeric_cols) > 0:
+            insights.append(f"Found {len(self.numeric_cols)} numeric columns suitable for modeling")
+
+        if len(self.categorical_cols) > 0:
+            insights.append(f"Found {len(self.categorical_cols)} categorical columns that may need encoding")
+
+        # Check for potential target variables
+        for col in self.numeric_cols:
+            if self.rows and self.nunique[col] / self.rows < 0.1 and self.nunique[col] < 20:
+                insights.append(f"Column '{col}' might be a good classification target (low cardinality)")
+
+        if self.duplicate_count > 0:
+            insights.append(f"Warning: Found {self.duplicate_count} duplicate rows")
+
+        return insights
+
+    # ---------- charts ----------
+
+    def _chart_data(self, charts: List[str], limits: Dict[str, Any]) -> Dict[str, Any]:
+        chart_data = {}
+        for chart in charts:
+            if chart not in CHARTS:
+                raise ValueError(f"Unknown profile chart: {chart}")
+            try:
+                chart_data[chart] = getattr(self, f"_chart_{chart}")(limits)
+            except Exception as e:
+                logger.warning(f"Could not generate {chart} chart data: {e}")
+                chart_data[chart] = None if chart in ("correlation_heatmap", "missing_values_chart") else []
+        return chart_data
+
+    def _chart_distributions(self, limits: Dict[str, Any]) -> List[Dict]:
+        distributions = []
+        summary = self.numeric_summary
+        for col in self.numeric_cols[:limits["distribution_columns"]]:
+            col_data = self.df[col].dropna()
+            if len(col_data) == 0:
+                continue
+            hist_counts, bin_edges = np.histogram(col_data, bins=limits["distribution_bins"])
+            distributions.append({
+                "column": str(col),
+                "bins": _safe_list(bin_edges[:-1]),  # Left edges of bins
+                "counts": [int(c) for c in hist_counts],
+                "mean": _safe_float(summary.at[col, "mean"]),
+                "median": _safe_float(summary.at[col, "50%"]),
+            })
+        return distributions
+
+    def _chart_categorical_counts(self, limits: Dict[str, Any]) -> List[Dict]:
+        categorical_counts = []
+        for col in self.categorical_cols[:limits["categorical_columns"]]:
+            value_counts = self.value_counts(col).head(limits["top_categories"])
+            categorical_counts.append({
+                "column": str(col),
+                "categories": [str(x) for x in value_counts.index],
+                "counts": [int(c) for c in value_counts.values],
+            })
+        return categorical_counts
+
+    def _chart_correlation_heatmap(self, limits: Dict[str, Any]) -> Optional[Dict]:
+        if len(self.numeric_cols) < 2:
+            return {"columns": [], "values": []}
+        cols = self.numeric_cols[:limits["heatmap_columns"]]
+        # Replace NaN with 0 for JSON
+        values = self.corr_of(cols).fillna(0).to_numpy()
+        return {
+            "columns": [str(c) for c in cols],
+            "values": [_safe_list(row) for row in values],
+        }
+
+    def _chart_missing_values_chart(self, limits: Dict[str, Any]) -> Optional[Dict]:
+        missing = self.null_counts[self.null_counts > 0].sort_values(ascending=False)
+        if len(missing) == 0:
+            return None
+        return {
+            "columns": [str(c) for c in missing.index],
+            "counts": [int(c) for c in missing.values],
+            "percentages": [round(c / self.rows * 100, 2) for c in missing.values],
+        }
+
+    def _chart_box_plots(self, limits: Dict[str, Any]) -> List[Dict]:
+        box_plots = []
+        summary = self.numeric_summary
+        for col in self.numeric_cols[:limits["box_plot_columns"]]:
+            if summary.at[col, "count"] == 0:
+                continue
+            q1, q3 = summary.at[col, "25%"], summary.at[col, "75%"]
+            iqr = q3 - q1
+            col_data = self.df[col]
+            outliers = col_data[(col_data < q1 - 1.5 * iqr) | (col_data > q3 + 1.5 * iqr)]
+            box_plots.append({
+                "column": str(col),
+                "min": _safe_float(summary.at[col, "min"]),
+                "q1": _safe_float(q1),
+                "median": _safe_float(summary.at[col, "50%"]),
+                "q3": _safe_float(q3),
+                "max": _safe_float(summary.at[col, "max"]),
+                "outliers": _safe_list(outliers.head(limits["box_plot_outliers"]).tolist()),  # Limit outliers
+            })
+        return box_plots
+
+    def _chart_scatter_matrix(self, limits: Dict[str, Any]) -> List[Dict]:
+        cols = self.numeric_cols[:limits["scatter_columns"]]
+        min_corr = limits["scatter_min_abs_corr"]
+        max_pairs = limits["scatter_max_pairs"]
+        corr = self.corr_of(cols)
+        scatter_matrix = []
+        for i, col1 in enumerate(cols):
+            for col2 in cols[i + 1:]:
+                corr_val = corr.at[col1, col2]
+                if min_corr is not None and not (pd.notna(corr_val) and abs(corr_val) > min_corr):
+                    continue
+                # Density over every row plus one point per occupied cell
+                pair_df = self.df[[col1, col2]].dropna()
+                scatter_matrix.append({
+                    "x_column": str(col1),
+                    "y_column": str(col2),
+                    **downsample_scatter(pair_df[col1].to_numpy(), pair_df[col2].to_numpy()),
+                    "correlation": _safe_float(corr_val) or 0,
+                })
+                if max_pairs is not None and len(scatter_matrix) >= max_pairs:
+                    return scatter_matrix
+        return scatter_matrix
+
+    def _chart_time_series(self, limits: Dict[str, Any]) -> List[Dict]:
+        if not self.datetime_cols:
+            return []
+        time_series = []
+        date_col = self.datetime_cols[0]  # Use first datetime column
+        # Parse and sort once, every value column reuses the order
+        dates = self.datetime_column(date_col)
+        valid = np.flatnonzero(dates.notna().to_numpy())
+        order = valid[np.argsort(dates.to_numpy()[valid], kind='stable')]
+        sorted_dates = dates.iloc[order]
+        for num_col in self.numeric_cols[:limits["time_series_columns"]]:
+            values = self.df[num_col].iloc[order]
+            present = values.notna().to_numpy()
+            # Largest-Triangle-Three-Buckets keeps the peaks a stride sample drops
+            time_series.append({
+                "date_column": str(date_col),
+                "value_column": str(num_col),
+                **downsample_time_series(sorted_dates[present], values[present], limits["time_series_points"]),
+            })
+        return time_series
+
+
+def profile_dataframe(df: pd.DataFrame, spec: Dict[str, Any]) -> Dict[str, Any]:
+    """Profile a dataframe once, without keeping shared facts for later specs"""
+    return DatasetProfile(df).profile(spec)
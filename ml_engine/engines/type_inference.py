@@ -0,0 +1,176 @@
+"""
+Column type inference
+Text columns are classified from a small sample. Date formats are detected
+from the sample and cached per value shape (e.g. "dddd-dd-dd"), so each date
+column is converted a single time with an explicit format instead of pandas
+guessing per element.
+"""
+from typing import Dict, Any, Optional
+import logging
+import re
+import warnings
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Values sampled per column
+SAMPLE_SIZE = 200
+# Share of sampled values that must parse for a column to count as dates
+DATETIME_MIN_PARSED = 0.95
+
+# Tried in order; the first format that parses the sample wins
+DATETIME_FORMATS = (
+    "%Y-%m-%d", "%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%dT%H:%M:%S",
+    "%Y-%m-%d %H:%M:%S.%f", "%Y-%m-%dT%H:%M:%S.%f", "%Y/%m/%d", "%Y/%m/%d %H:%M:%S",
+    "%m/%d/%Y", "%d/%m/%Y", "%m/%d/%Y %H:%M", "%d/%m/%Y %H:%M", "%m/%d/%Y %H:%M:%S",
+    "%d/%m/%Y %H:%M:%S", "%d-%m-%Y", "%m-%d-%Y", "%d-%m-%Y %H:%M:%S", "%d.%m.%Y",
+    "%d.%m.%Y %H:%M", "%d.%m.%Y %H:%M:%S",
+    "%b %d, %Y", "%d %b %Y", "%B %d, %Y", "%d %B %Y", "%Y-%m",
+)
+
+# Day/month-first date prefixes rewritten to ISO order before parsing: pandas
+# parses ISO dates natively, about 20x faster than its strptime path
+_ISO_REWRITES = {
+    "%m/%d/%Y": (r'^(\d{1,2})/(\d{1,2})/(\d{4})', r'\3-\1-\2'),
+    "%d/%m/%Y": (r'^(\d{1,2})/(\d{1,2})/(\d{4})', r'\3-\2-\1'),
+    "%m-%d-%Y": (r'^(\d{1,2})-(\d{1,2})-(\d{4})', r'\3-\1-\2'),
+    "%d-%m-%Y": (r'^(\d{1,2})-(\d{1,2})-(\d{4})', r'\3-\2-\1'),
+    "%d.%m.%Y": (r'^(\d{1,2})\.(\d{1,2})\.(\d{4})', r'\3-\2-\1'),
+    "%Y/%m/%d": (r'^(\d{4})/(\d{1,2})/(\d{1,2})', r'\1-\2-\3'),
+}
+
+# Cheap pre-check: dates are short, have digits and a separator (bare digit
+# strings are ids and codes far more often than compact dates)
+_DATE_LIKE = re.compile(r'^(?=.*\d)(?=.*[\s:/.,\-])[\w\s:/.,+\-]{6,35}$')
+
+
+# Value shape -> the format that last parsed it (bounded by MAX_CACHED_SHAPES).
+# Only dates are cached: an id like "SK10-AB-C0" can share the shape of a date
+_shape_formats: Dict[str, str] = {}
+MAX_CACHED_SHAPES = 256
+
+
+def value_shape(value: str) -> str:
+    """Shape of a value: letters -> a, digits -> d ("2024-01-31" -> "dddd-dd-dd")"""
+    return re.sub(r'\d', 'd', re.sub(r'[A-Za-z]', 'a', value))
+
+
+def sample_values(values: pd.Series, size: int = SAMPLE_SIZE) -> pd.Series:
+    """
+    Up to size non-missing values spread evenly over a column
+
+    Spread rather than the head: the first rows of a sorted column are all
+    early in the month, where day-first and month-first dates look the same.
+    Only the candidate rows are checked for missing values, not the column.
+    """
+    n = len(values)
+    if n == 0:
+        return values
+    positions = np.unique(np.linspace(0, n - 1, min(n, size * 2)).astype(np.int64))
+    return values.iloc[positions].dropna().iloc[:size]
+
+
+def _parse_share(sample: pd.Series, fmt: str) -> float:
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        parsed = pd.to_datetime(sample, format=fmt, errors='coerce')
+    return float(parsed.notna().mean())
+
+
+def _search_format(sample: pd.Series) -> Optional[str]:
+    # Month-first fails on days above 12, so day-first data falls through to %d/%m
+    for fmt in DATETIME_FORMATS:
+        if _parse_share(sample, fmt) >= DATETIME_MIN_PARSED:
+            return fmt
+    # Timezones and other ISO 8601 variants
+    if _parse_share(sample, "ISO8601") >= DATETIME_MIN_PARSED:
+        return "ISO8601"
+    return None
+
+
+def detect_datetime_format(values: pd.Series) -> Optional[str]:
+    """
+    Date format of a text column, from a sample of its values
+
+    A detected format is cached per value shape: later columns of the same
+    shape only verify the cached format against their sample. Columns that
+    aren't dates always get the full search, so one of them can't hide the
+    dates of another column with the same shape.
+
+    Args:
+        values: Text values (missing values are ignored)
+
+    Returns:
+        A strftime format, "ISO8601", or None when the values aren't dates
+    """
+    sample = sample_values(values)
+    if sample.empty:
+        return None
+    sample = sample.astype(str).str.strip()
+    if not sample.str.match(_DATE_LIKE).all():
+        return None
+
+    shape = value_shape(sample.iloc[0])
+    cached = _shape_formats.get(shape)
+    if cached is not None and _parse_share(sample, cached) >= DATETIME_MIN_PARSED:
+        return cached
+
+    fmt = _search_format(sample)
+    if fmt is not None and (shape in _shape_formats or len(_shape_formats) < MAX_CACHED_SHAPES):
+        _shape_formats[shape] = fmt
+    return fmt
+
+
+def parse_datetime(values: pd.Series, fmt: Optional[str] = None) -> pd.Series:
+    """Convert a column to datetimes in one pass (unparseable values become NaT)"""
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+    if fmt is None:
+        fmt = detect_datetime_format(values)
+
+    # Mostly distinct values defeat pandas' per-unique-value cache: reorder to ISO
+    rewrite = next((item for item in _ISO_REWRITES.items() if fmt and fmt.startswith(item[0])), None)
+    if rewrite is not None:
+        sample = sample_values(values)
+        if len(sample) and sample.nunique() > len(sample) // 2:
+            prefix, (pattern, replacement) = rewrite
+            values = values.str.replace(pattern, replacement, regex=True)
+            fmt = "%Y-%m-%d" + fmt[len(prefix):]
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        return pd.to_datetime(values, format=fmt, errors='coerce')
+
+
+def infer_column_types(df: pd.DataFrame) -> Dict[str, Dict[str, Any]]:
+    """
+    Semantic type of every column
+
+    Returns:
+        Column -> {"kind": "numeric" | "boolean" | "datetime" | "categorical" | "text",
+        "format": date format or None}
+    """
+    types = {}
+    for col in df.columns:
+        series = df[col]
+        kind, fmt = "text", None
+        if pd.api.types.is_bool_dtype(series):
+            kind = "boolean"
+        elif pd.api.types.is_numeric_dtype(series):
+            kind = "numeric"
+        elif pd.api.types.is_datetime64_any_dtype(series):
+            kind = "datetime"
+        elif isinstance(series.dtype, pd.CategoricalDtype):
+            kind = "categorical"
+        else:
+            fmt = detect_datetime_format(series)
+            if fmt is not None:
+                kind = "datetime"
+            else:
+                # Values repeat within the sample -> categorical
+                sample = sample_values(series)
+                if len(sample) and sample.nunique() <= max(1, len(sample) // 2):
+                    kind = "categorical"
+        types[str(col)] = {"kind": kind, "format": fmt}
+    return types